@@ -1,10 +1,19 @@
+import copy
+import cPickle
 import gettext
+import threading
 import __builtin__
 
 __builtin__._ = gettext.gettext
 
+from shadowcraft.core import caching
 from shadowcraft.core import exceptions
 from shadowcraft.calcs import armor_mitigation
+from shadowcraft.calcs import dual_numbers
+from shadowcraft.calcs import telemetry
+from shadowcraft.objects import buffs
+from shadowcraft.objects import race
+from shadowcraft.objects import stats
 from shadowcraft.objects.procs import InvalidProcException
 
 class DamageCalculator(object):
@@ -35,6 +44,14 @@ class DamageCalculator(object):
     default_ep_stats = []
     # normalize_ep_stat is the stat with value 1 EP, override in your subclass
     normalize_ep_stat = None
+    # The classes from_wire_form rebuilds inputs as; subclasses name the
+    # class specific ones.
+    stats_class = stats.Stats
+    buffs_class = buffs.Buffs
+    race_class = race.Race
+    talents_class = None
+    glyphs_class = None
+    settings_class = None
 
     def __init__(self, stats, talents, glyphs, buffs, race, settings=None, level=85):
         self.stats = stats
@@ -58,8 +75,73 @@ class DamageCalculator(object):
         # Any status we haven't assigned a value to, we don't have.
         if name == 'calculating_ep':
             return False
+        if name in ('telemetry', 'perturbation_cache'):
+            return None
         object.__getattribute__(self, name)
 
+    def get_modeled_procs(self):
+        # The names of the equipped procs the model reads; override this to
+        # leave out any it ignores.
+        return self.stats.procs.equipped_proc_names
+
+    def canonical_form(self):
+        # A hashable description of everything that goes into the results:
+        # two calculators with the same canonical form give the same numbers,
+        # however their inputs were written out.
+        forms = []
+        for inputs in (self.glyphs, self.settings):
+            if inputs is None:
+                forms.append(None)
+            else:
+                forms.append(inputs.canonical_form())
+        glyphs, settings = forms
+        return (self.__class__.__name__, self.level, self.stats.canonical_form(), tuple(self.get_modeled_procs()),
+            self.talents.canonical_form(), glyphs, self.buffs.canonical_form(), self.race.canonical_form(), settings)
+
+    def wire_form(self):
+        # A compact, picklable description of our inputs - numbers, bitmasks
+        # and talent strings - that from_wire_form rebuilds an equivalent
+        # calculator from.  It's a fraction of the size of a pickled
+        # calculator, so it's what gets shipped to other processes.
+        forms = []
+        for inputs in (self.glyphs, self.settings):
+            if inputs is None:
+                forms.append(None)
+            else:
+                forms.append(inputs.wire_form())
+        glyphs, settings = forms
+        return (self.stats.wire_form(), self.talents.wire_form(), glyphs, self.buffs.wire_form(), self.race.wire_form(), settings, self.level)
+
+    @classmethod
+    def from_wire_form(cls, form):
+        stats_form, talents_form, glyphs_form, buffs_form, race_form, settings_form, level = form
+        # The stats are taken as they were, gear buff bonuses included, so
+        # they don't go through __init__ again.
+        calculator = cls.__new__(cls)
+        calculator.stats = cls.stats_class.from_wire_form(stats_form)
+        calculator.talents = cls.talents_class.from_wire_form(talents_form)
+        calculator.glyphs = None
+        if glyphs_form is not None:
+            calculator.glyphs = cls.glyphs_class.from_wire_form(glyphs_form)
+        calculator.buffs = cls.buffs_class.from_wire_form(buffs_form)
+        calculator.race = cls.race_class.from_wire_form(race_form)
+        calculator.settings = None
+        if settings_form is not None:
+            calculator.settings = cls.settings_class.from_wire_form(settings_form)
+        calculator.level = level
+        return calculator
+
+    def canonical_key(self):
+        # canonical_form, hashed down to a string.
+        return caching.request_key(self.canonical_form())
+
+    def timed(self, stage):
+        # Wrap a stage of the calculation in 'with self.timed(stage):' to have
+        # its wall time recorded when telemetry is on.
+        if self.telemetry is None:
+            return telemetry.null_timer
+        return self.telemetry.timer(stage)
+
     def _set_constants_for_level(self):
         self.buffs.level = self.level
         self.stats.level = self.level
@@ -67,20 +149,63 @@ class DamageCalculator(object):
         # calculate and cache the level-dependent armor mitigation parameter
         self.armor_mitigation_parameter = armor_mitigation.parameter(self.level)
 
-    def ep_helper(self, stat):
-        if stat not in ('dodge_exp', 'white_hit', 'spell_hit', 'yellow_hit', 'parry_exp', 'mh_dodge_exp', 'oh_dodge_exp', 'mh_parry_exp', 'oh_parry_exp'):
-            setattr(self.stats, stat, getattr(self.stats, stat) + 1.)
-        else:
-            setattr(self, 'calculating_ep', stat)
-        dps = self.get_dps()
-        if stat not in ('dodge_exp', 'white_hit', 'spell_hit', 'yellow_hit', 'parry_exp', 'mh_dodge_exp', 'oh_dodge_exp', 'mh_parry_exp', 'oh_parry_exp'):
-            setattr(self.stats, stat, getattr(self.stats, stat) - 1.)
-        else:
-            setattr(self, 'calculating_ep', False)
-
-        return dps
+    # EP stats that aren't raw stats; these are valued by having the hit
+    # chance functions knock a rating point's worth off the relevant attacks.
+    ep_perturbed_stats = ('dodge_exp', 'white_hit', 'spell_hit', 'yellow_hit', 'parry_exp', 'mh_dodge_exp', 'oh_dodge_exp', 'mh_parry_exp', 'oh_parry_exp')
+
+    def ep_perturbation(self, *ep_stats):
+        # How much of a rating point the hit chance functions should take off
+        # for the given EP stats: 1 while ep_helper is valuing one of them,
+        # 0 otherwise, and the seeded Dual for them when computing gradients.
+        if isinstance(self.calculating_ep, dict):
+            return sum([self.calculating_ep.get(stat, 0) for stat in ep_stats])
+        if self.calculating_ep in ep_stats:
+            return 1
+        return 0
+
+    def expertise_perturbation(self, hand, dodgeable, parryable):
+        perturbation = 0
+        if dodgeable:
+            perturbation += self.ep_perturbation(hand + '_dodge_exp')
+        if parryable:
+            perturbation += self.ep_perturbation(hand + '_parry_exp')
+        return perturbation
 
-    def get_ep(self, ep_stats=None, normalize_ep_stat=None):
+    def ep_helper(self, stat):
+        self.apply_perturbation(('stat', stat))
+        try:
+            return self.get_dps()
+        finally:
+            self.revert_perturbation(('stat', stat))
+
+    def get_dps_gradient(self, ep_stats):
+        # Runs get_dps once with dual number stats; returns the dps and a
+        # dictionary of its partial derivatives with respect to each of
+        # ep_stats.  Perturbed stats are differentiated in the same direction
+        # ep_helper perturbs them, i.e. with respect to losing rating.
+        size = len(ep_stats)
+        seeds = {}
+        stats = copy.copy(self.stats)
+        for index, stat in enumerate(ep_stats):
+            if stat in self.ep_perturbed_stats:
+                seeds[stat] = dual_numbers.Dual.variable(0., index, size)
+            else:
+                setattr(stats, stat, dual_numbers.Dual.variable(getattr(stats, stat), index, size))
+        unperturbed_stats = self.stats
+        self.stats = stats
+        self.calculating_ep = seeds
+        try:
+            dps = self.get_dps()
+        finally:
+            self.stats = unperturbed_stats
+            self.calculating_ep = False
+
+        return dual_numbers.value(dps), dict(zip(ep_stats, dual_numbers.gradient(dps, size)))
+
+    def get_ep(self, ep_stats=None, normalize_ep_stat=None, analytic=False, executor=None):
+        # With analytic=True, EP values are the ratios of the derivatives of
+        # dps, computed in a single run, instead of finite differences over a
+        # rating point; the two agree to within the model's curvature.
         if not normalize_ep_stat:
             normalize_ep_stat = self.normalize_ep_stat
         if not ep_stats:
@@ -88,60 +213,77 @@ class DamageCalculator(object):
         ep_values = {}
         for stat in ep_stats:
             ep_values[stat] = 0
-        baseline_dps = self.get_dps()
-        normalize_dps = self.ep_helper(normalize_ep_stat)
+        if analytic:
+            gradient_stats = list(ep_values)
+            if normalize_ep_stat not in ep_values:
+                gradient_stats.append(normalize_ep_stat)
+            gradient = self.get_dps_gradient(gradient_stats)[1]
+            for stat in ep_values:
+                ep_values[stat] = abs(gradient[stat]) / gradient[normalize_ep_stat]
+            return ep_values
+        stats = list(ep_values)
+        perturbations = [('baseline',), ('stat', normalize_ep_stat)] + [('stat', stat) for stat in stats]
+        results = self.get_perturbed_dps(perturbations, executor)
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+        baseline_dps, normalize_dps = results[:2]
         normalize_dps_difference = normalize_dps - baseline_dps
-        for stat in ep_values:
-            dps = self.ep_helper(stat)
+        for stat, dps in zip(stats, results[2:]):
             ep_values[stat] = abs(dps - baseline_dps) / normalize_dps_difference
 
         return ep_values
 
-    def get_weapon_ep(self, speed_list=None, dps=False, enchants=False, normalize_ep_stat=None):
+    def get_weapon_ep(self, speed_list=None, dps=False, enchants=False, normalize_ep_stat=None, executor=None):
         if not normalize_ep_stat:
             normalize_ep_stat = self.normalize_ep_stat
         weapons = ('mh', 'oh')
+        perturbations = []
+        if speed_list is not None or dps:
+            perturbations += [('baseline',), ('stat', normalize_ep_stat)]
+        for hand in weapons:
+            if dps:
+                perturbations.append(('weapon_dps', hand))
+            if enchants:
+                no_enchant = ('enchant', hand, None)
+                perturbations += [no_enchant, ('combined', no_enchant, ('stat', normalize_ep_stat))]
+                perturbations += [('enchant', hand, enchant) for enchant in getattr(self.stats, hand).allowed_melee_enchants]
+            if speed_list is not None:
+                perturbations += [('weapon_speed', hand, speed) for speed in speed_list]
+        results = dict(zip(perturbations, self.get_perturbed_dps(perturbations, executor)))
+        for result in results.values():
+            if isinstance(result, Exception):
+                raise result
         if speed_list is not None or dps:
-            baseline_dps = self.get_dps()
-            normalize_dps = self.ep_helper(normalize_ep_stat)
+            baseline_dps = results[('baseline',)]
+            normalize_dps = results[('stat', normalize_ep_stat)]
 
         for hand in weapons:
             ep_values = {}
 
             # Weapon dps EP
             if dps:
-                getattr(self.stats, hand).weapon_dps += 1.
-                new_dps = self.get_dps()
+                new_dps = results[('weapon_dps', hand)]
                 ep = abs(new_dps - baseline_dps) / (normalize_dps - baseline_dps)
                 ep_values[hand + '_dps'] = ep
-                getattr(self.stats, hand).weapon_dps -= 1.
 
             # Enchant EP
             if enchants:
-                old_enchant = None
-                for enchant in getattr(self.stats, hand).allowed_melee_enchants:
-                    if getattr(getattr(self.stats, hand), enchant):
-                        old_enchant = enchant
+                no_enchant = ('enchant', hand, None)
+                no_enchant_dps = results[no_enchant]
+                no_enchant_normalize_dps = results[('combined', no_enchant, ('stat', normalize_ep_stat))]
                 for enchant in getattr(self.stats, hand).allowed_melee_enchants:
-                    getattr(self.stats, hand).del_enchant()
-                    no_enchant_dps = self.get_dps()
-                    no_enchant_normalize_dps = self.ep_helper(normalize_ep_stat)
-                    getattr(self.stats, hand).set_enchant(enchant)
-                    new_dps = self.get_dps()
+                    new_dps = results[('enchant', hand, enchant)]
                     if new_dps != no_enchant_dps:
                         ep = abs(new_dps - no_enchant_dps) / (no_enchant_normalize_dps - no_enchant_dps)
                         ep_values[hand + '_' + enchant] = ep
-                    getattr(self.stats, hand).set_enchant(old_enchant)
 
             # Weapon speed EP
             if speed_list is not None:
-                old_speed = getattr(self.stats, hand).speed
                 for speed in speed_list:
-                    getattr(self.stats, hand).speed = speed
-                    new_dps = self.get_dps()
+                    new_dps = results[('weapon_speed', hand, speed)]
                     ep = (new_dps - baseline_dps) / (normalize_dps - baseline_dps)
                     ep_values[hand + '_' + str(speed)] = ep
-                    getattr(self.stats, hand).speed = old_speed
 
             if hand == 'mh':
                 mh_ep_values = ep_values
@@ -150,15 +292,13 @@ class DamageCalculator(object):
 
         return mh_ep_values, oh_ep_values
 
-    def get_other_ep(self, list, normalize_ep_stat=None):
+    def get_other_ep(self, list, normalize_ep_stat=None, executor=None):
         if not normalize_ep_stat:
             normalize_ep_stat = self.normalize_ep_stat
         # This method computes ep for every other buff/proc not covered by
         # get_ep or get_weapon_ep. Weapon enchants, being tied to the
         # weapons they are on, are computed by get_weapon_ep.
         ep_values = {}
-        baseline_dps = self.get_dps()
-        normalize_dps = self.ep_helper(normalize_ep_stat)
 
         procs_list = []
         gear_buffs_list = []
@@ -170,62 +310,53 @@ class DamageCalculator(object):
             else:
                 ep_values[i] = _('not allowed')
 
-        for i in gear_buffs_list:
-            # Note that activated abilites like trinkets, potions, or
-            # engineering gizmos are handled as gear buffs by the engine.
-            setattr(self.stats.gear_buffs, i, not getattr(self.stats.gear_buffs, i))
-            new_dps = self.get_dps()
-            ep_values[i] = abs(new_dps - baseline_dps) / (normalize_dps - baseline_dps)
-            setattr(self.stats.gear_buffs, i, not getattr(self.stats.gear_buffs, i))
-
-        for i in procs_list:
-            try:
-                if getattr(self.stats.procs, i):
-                    delattr(self.stats.procs, i)
-                else:
-                    self.stats.procs.set_proc(i)
-                new_dps = self.get_dps()
-                ep_values[i] = abs(new_dps - baseline_dps) / (normalize_dps - baseline_dps)
-                if getattr(self.stats.procs, i):
-                    delattr(self.stats.procs, i)
-                else:
-                    self.stats.procs.set_proc(i)
-            except InvalidProcException:
+        # Note that activated abilites like trinkets, potions, or engineering
+        # gizmos are handled as gear buffs by the engine.
+        perturbations = [('baseline',), ('stat', normalize_ep_stat)]
+        perturbations += [('gear_buff', i) for i in gear_buffs_list]
+        perturbations += [('proc', i) for i in procs_list]
+        results = self.get_perturbed_dps(perturbations, executor)
+
+        for perturbation, result in zip(perturbations, results):
+            if isinstance(result, InvalidProcException) and perturbation[0] == 'proc':
                 # Data for these procs is not complete/correct
-                ep_values[i] = _('not supported')
-                delattr(self.stats.procs, i)
+                ep_values[perturbation[1]] = _('not supported')
+            elif isinstance(result, Exception):
+                raise result
+        baseline_dps, normalize_dps = results[:2]
+        for perturbation, new_dps in zip(perturbations[2:], results[2:]):
+            if perturbation[1] not in ep_values:
+                ep_values[perturbation[1]] = abs(new_dps - baseline_dps) / (normalize_dps - baseline_dps)
 
         return ep_values
 
-    def get_glyphs_ranking(self, list=None):
+    def get_glyphs_ranking(self, list=None, executor=None):
         glyphs = []
         glyphs_ranking = {}
-        baseline_dps = self.get_dps()
 
         if list == None:
             glyphs = self.glyphs.allowed_glyphs
         else:
             glyphs = list
 
-        for i in glyphs:
-            setattr(self.glyphs, i, not getattr(self.glyphs, i))
-            try:
-                new_dps = self.get_dps()
-                if new_dps != baseline_dps:
-                    glyphs_ranking[i] = abs(new_dps - baseline_dps)
-            except:
+        perturbations = [('baseline',)] + [('glyph', i) for i in glyphs]
+        results = self.get_perturbed_dps(perturbations, executor)
+        baseline_dps = results[0]
+        if isinstance(baseline_dps, Exception):
+            raise baseline_dps
+
+        for i, new_dps in zip(glyphs, results[1:]):
+            if isinstance(new_dps, Exception):
                 glyphs_ranking[i] = _('not implemented')
-            setattr(self.glyphs, i, not getattr(self.glyphs, i))
+            elif new_dps != baseline_dps:
+                glyphs_ranking[i] = abs(new_dps - baseline_dps)
 
         return glyphs_ranking
 
-    def get_talents_ranking(self, list=None):
+    def get_talents_ranking(self, list=None, executor=None):
         talents_ranking = {}
-        baseline_dps = self.get_dps()
         talent_list = []
 
-        self.talents.reset_cache()
-
         if list is None:
         # Build a list of talents that can be taken in the active spec
             for talent in self.talents.treeForTalent:
@@ -236,22 +367,25 @@ class DamageCalculator(object):
         else:
             talent_list = list
 
+        perturbations = [('baseline',)]
         for talent in talent_list:
             old_talent_value = getattr(self.talents, talent)
             if old_talent_value == 0:
                 new_talent_value = 1
             else:
                 new_talent_value = old_talent_value - 1
-
-            self.talents.treeForTalent[talent].set_talent(talent, new_talent_value)
-            try:
-                new_dps = self.get_dps()
-                # Disregard talents that don't affect dps
-                if new_dps != baseline_dps:
-                    talents_ranking[talent] = abs(new_dps - baseline_dps)
-            except:
+            perturbations.append(('talent', talent, old_talent_value, new_talent_value))
+        results = self.get_perturbed_dps(perturbations, executor)
+        baseline_dps = results[0]
+        if isinstance(baseline_dps, Exception):
+            raise baseline_dps
+
+        for talent, new_dps in zip(talent_list, results[1:]):
+            if isinstance(new_dps, Exception):
                 talents_ranking[talent] = _('not implemented')
-            self.talents.treeForTalent[talent].set_talent(talent, old_talent_value)
+            # Disregard talents that don't affect dps
+            elif new_dps != baseline_dps:
+                talents_ranking[talent] = abs(new_dps - baseline_dps)
 
         main_tree_talents_ranking = {}
         off_trees_talents_ranking = {}
@@ -261,13 +395,156 @@ class DamageCalculator(object):
             else:
                 off_trees_talents_ranking[talent] = talents_ranking[talent]
 
-        self.talents.reset_cache()
         return main_tree_talents_ranking, off_trees_talents_ranking
 
+    def get_report(self, ep_stats=None, normalize_ep_stat=None, other_ep=None, weapon_ep=None, talents_ranking=False, glyphs_ranking=None, executor=None):
+        # Everything a character sheet wants in one call.  The baseline is
+        # computed once, as a breakdown, and that and the normalizing stat's
+        # dps are shared by every section instead of being recomputed by each.
+        # other_ep and glyphs_ranking take the lists get_other_ep and
+        # get_glyphs_ranking do (glyphs_ranking=True ranks all glyphs);
+        # weapon_ep takes a dictionary of get_weapon_ep keyword arguments.
+        # Sections not asked for are left out of the report.
+        self.perturbation_cache = {}
+        try:
+            dps_breakdown = self.get_dps_breakdown()
+            dps = sum(dps_breakdown.values())
+            self.perturbation_cache[('baseline',)] = dps
+            report = {
+                'dps': dps,
+                'dps_breakdown': dps_breakdown,
+                'ep': self.get_ep(ep_stats, normalize_ep_stat, executor=executor)
+            }
+            if other_ep:
+                report['other_ep'] = self.get_other_ep(other_ep, normalize_ep_stat, executor=executor)
+            if weapon_ep is not None:
+                report['mh_ep'], report['oh_ep'] = self.get_weapon_ep(normalize_ep_stat=normalize_ep_stat, executor=executor, **weapon_ep)
+            if talents_ranking:
+                report['talents_ranking'] = self.get_talents_ranking(executor=executor)
+            if glyphs_ranking is True:
+                report['glyphs_ranking'] = self.get_glyphs_ranking(executor=executor)
+            elif glyphs_ranking:
+                report['glyphs_ranking'] = self.get_glyphs_ranking(glyphs_ranking, executor=executor)
+        finally:
+            self.perturbation_cache = None
+
+        if self.telemetry is not None:
+            report['telemetry'] = self.telemetry.as_dict()
+        return report
+
+    def get_dps_breakdown(self):
+        # Overwrite this function to return a dictionary of dps by source;
+        # get_report expects the sources to add up to get_dps.
+        raise NotImplementedError
+
+    def apply_perturbation(self, perturbation):
+        # Perturbations are the small changes EP and rankings value: tuples of
+        # a kind and its arguments, or ('combined', perturbation, ...) for
+        # several at once.  Inputs are never changed in place - a perturbed
+        # input is a modified copy - so whoever else holds them doesn't see
+        # the change, and revert_perturbation just puts the originals back.
+        self.unperturbed_inputs = (self.stats, self.talents, self.glyphs, self.calculating_ep)
+        try:
+            self._perturb(perturbation)
+        except:
+            self.revert_perturbation(perturbation)
+            raise
+
+    def _perturb(self, perturbation):
+        kind = perturbation[0]
+        if kind == 'combined':
+            for part in perturbation[1:]:
+                self._perturb(part)
+        elif kind == 'stat':
+            # ('stat', stat) adds a rating point of stat; ('stat', stat,
+            # amount) adds amount of it.
+            stat = perturbation[1]
+            amount = 1.
+            if len(perturbation) > 2:
+                amount = perturbation[2]
+            if stat not in self.ep_perturbed_stats:
+                self.stats = copy.copy(self.stats)
+                setattr(self.stats, stat, getattr(self.stats, stat) + amount)
+            elif amount == 1:
+                self.calculating_ep = stat
+            else:
+                self.calculating_ep = {stat: amount}
+        elif kind == 'gear_buff':
+            self.stats = copy.copy(self.stats)
+            self.stats.gear_buffs = copy.copy(self.stats.gear_buffs)
+            setattr(self.stats.gear_buffs, perturbation[1], not getattr(self.stats.gear_buffs, perturbation[1]))
+        elif kind == 'proc':
+            self.stats = copy.copy(self.stats)
+            self.stats.procs = copy.copy(self.stats.procs)
+            if getattr(self.stats.procs, perturbation[1]):
+                delattr(self.stats.procs, perturbation[1])
+            else:
+                self.stats.procs.set_proc(perturbation[1])
+        elif kind in ('weapon_dps', 'weapon_speed', 'enchant'):
+            # ('weapon_dps', hand) adds 1 weapon dps; ('weapon_speed', hand,
+            # speed) and ('enchant', hand, enchant) swap in the given speed or
+            # enchant (None for none).
+            hand = perturbation[1]
+            self.stats = copy.copy(self.stats)
+            weapon = copy.copy(getattr(self.stats, hand))
+            setattr(self.stats, hand, weapon)
+            if kind == 'weapon_dps':
+                weapon.weapon_dps += 1.
+            elif kind == 'weapon_speed':
+                weapon.speed = perturbation[2]
+            else:
+                weapon.set_enchant(perturbation[2])
+        elif kind == 'glyph':
+            self.glyphs = copy.copy(self.glyphs)
+            setattr(self.glyphs, perturbation[1], not getattr(self.glyphs, perturbation[1]))
+        elif kind == 'talent':
+            talent, old_value, new_value = perturbation[1:]
+            self.talents = self.talents.with_talent(talent, new_value)
+        elif kind != 'baseline':
+            raise exceptions.InvalidInputException(_('Unknown perturbation {kind}').format(kind=kind))
+
+    def revert_perturbation(self, perturbation):
+        self.stats, self.talents, self.glyphs, self.calculating_ep = self.unperturbed_inputs
+        del self.unperturbed_inputs
+
+    def get_perturbed_dps(self, perturbations, executor=None):
+        # Returns the dps under each of the perturbations, in order; a
+        # perturbation whose dps can't be computed gets the exception raised
+        # instead.  If an executor (anything with a map method, like a
+        # multiprocessing.Pool or a futures.ProcessPoolExecutor) is given, the
+        # perturbations are spread over it, each worker process evaluating
+        # them on its own copy of this calculator.  Either way the results
+        # are the same as long as warm starting is off.  While get_report
+        # runs, results are shared between its sections.
+        cache = self.perturbation_cache
+        if cache is None:
+            cache = {}
+        pending = []
+        for perturbation in perturbations:
+            if perturbation not in cache and perturbation not in pending:
+                pending.append(perturbation)
+        if executor is None:
+            results = [self.perturbed_dps(perturbation) for perturbation in pending]
+        else:
+            results = self.snapshot().get_perturbed_dps(pending, executor)
+        cache.update(zip(pending, results))
+        return [cache[perturbation] for perturbation in perturbations]
+
+    def snapshot(self):
+        return Snapshot(cPickle.dumps((self.__class__, self.wire_form()), cPickle.HIGHEST_PROTOCOL))
+
+    def perturbed_dps(self, perturbation):
+        self.apply_perturbation(perturbation)
+        try:
+            return self.get_dps()
+        except Exception as e:
+            return e
+        finally:
+            self.revert_perturbation(perturbation)
+
     def get_dps(self):
         # Overwrite this function with your calculations/simulations/whatever;
         # this is what callers will (initially) be looking at.
-        self.talents.reset_cache()
         pass
 
     def get_spell_hit_from_talents(self):
@@ -300,15 +577,13 @@ class DamageCalculator(object):
 
         if dodgeable:
             dodge_chance = max(self.BASE_DODGE_CHANCE - expertise, 0)
-            if self.calculating_ep == 'dodge_exp':
-                dodge_chance += self.stats.get_expertise_from_rating(1)
+            dodge_chance += self.stats.get_expertise_from_rating(1) * self.ep_perturbation('dodge_exp')
         else:
             dodge_chance = 0
 
         if parryable:
             parry_chance = max(self.BASE_PARRY_CHANCE - expertise, 0)
-            if self.calculating_ep in ('parry_exp', 'dodge_exp'):
-                parry_chance += self.stats.get_expertise_from_rating(1)
+            parry_chance += self.stats.get_expertise_from_rating(1) * self.ep_perturbation('parry_exp', 'dodge_exp')
         else:
             parry_chance = 0
 
@@ -321,10 +596,8 @@ class DamageCalculator(object):
         if weapon == None:
             weapon = self.stats.mh
         hit_chance = self.melee_hit_chance(self.BASE_ONE_HAND_MISS_RATE, dodgeable, parryable, weapon.type)
-        if self.calculating_ep == 'yellow_hit':
-            hit_chance -= self.stats.get_melee_hit_from_rating(1)
-        if (self.calculating_ep == 'mh_dodge_exp' and dodgeable) or (self.calculating_ep == 'mh_parry_exp' and parryable):
-            hit_chance -= self.stats.get_expertise_from_rating(1)
+        hit_chance -= self.stats.get_melee_hit_from_rating(1) * self.ep_perturbation('yellow_hit')
+        hit_chance -= self.stats.get_expertise_from_rating(1) * self.expertise_perturbation('mh', dodgeable, parryable)
         return hit_chance
 
     def off_hand_melee_hit_chance(self, dodgeable=True, parryable=False, weapon=None):
@@ -334,10 +607,8 @@ class DamageCalculator(object):
         if weapon == None:
             weapon = self.stats.oh
         hit_chance = self.melee_hit_chance(self.BASE_ONE_HAND_MISS_RATE, dodgeable, parryable, weapon.type)
-        if self.calculating_ep == 'yellow_hit':
-            hit_chance -= self.stats.get_melee_hit_from_rating(1)
-        if (self.calculating_ep == 'oh_dodge_exp' and dodgeable) or (self.calculating_ep == 'oh_parry_exp' and parryable):
-            hit_chance -= self.stats.get_expertise_from_rating(1)
+        hit_chance -= self.stats.get_melee_hit_from_rating(1) * self.ep_perturbation('yellow_hit')
+        hit_chance -= self.stats.get_expertise_from_rating(1) * self.expertise_perturbation('oh', dodgeable, parryable)
         return hit_chance
 
     def dual_wield_mh_hit_chance(self, dodgeable=True, parryable=False):
@@ -345,8 +616,7 @@ class DamageCalculator(object):
         # if you ever want to attacking from the front, you can just set that
         # to True.
         hit_chance = self.dual_wield_hit_chance(dodgeable, parryable, self.stats.mh.type)
-        if (self.calculating_ep == 'mh_dodge_exp' and dodgeable) or (self.calculating_ep == 'mh_parry_exp' and parryable):
-            hit_chance -= self.stats.get_expertise_from_rating(1)
+        hit_chance -= self.stats.get_expertise_from_rating(1) * self.expertise_perturbation('mh', dodgeable, parryable)
         return hit_chance
 
     def dual_wield_oh_hit_chance(self, dodgeable=True, parryable=False):
@@ -354,22 +624,32 @@ class DamageCalculator(object):
         # if you ever want to attacking from the front, you can just set that
         # to True.
         hit_chance = self.dual_wield_hit_chance(dodgeable, parryable, self.stats.oh.type)
-        if (self.calculating_ep == 'oh_dodge_exp' and dodgeable) or (self.calculating_ep == 'oh_parry_exp' and parryable):
-            hit_chance -= self.stats.get_expertise_from_rating(1)
+        hit_chance -= self.stats.get_expertise_from_rating(1) * self.expertise_perturbation('oh', dodgeable, parryable)
         return hit_chance
 
     def dual_wield_hit_chance(self, dodgeable, parryable, weapon_type):
         hit_chance = self.melee_hit_chance(self.BASE_DW_MISS_RATE, dodgeable, parryable, weapon_type)
-        if self.calculating_ep in ('yellow_hit', 'spell_hit', 'white_hit'):
-            hit_chance -= self.stats.get_melee_hit_from_rating(1)
+        hit_chance -= self.stats.get_melee_hit_from_rating(1) * self.ep_perturbation('yellow_hit', 'spell_hit', 'white_hit')
         return hit_chance
 
     def spell_hit_chance(self):
         hit_chance = 1 - max(self.BASE_SPELL_MISS_RATE - self.stats.get_spell_hit_from_rating() - self.get_spell_hit_from_talents() - self.race.get_racial_hit(), 0)
-        if self.calculating_ep in ('yellow_hit', 'spell_hit'):
-            hit_chance -= self.stats.get_spell_hit_from_rating(1)
+        hit_chance -= self.stats.get_spell_hit_from_rating(1) * self.ep_perturbation('yellow_hit', 'spell_hit')
         return hit_chance
 
+    def get_rating_caps(self):
+        # The hit and expertise ratings at which a miss, dodge or parry chance
+        # bottoms out; dps has a kink at each of them.
+        melee_hit = self.race.get_racial_hit() + self.get_melee_hit_from_talents()
+        spell_hit = self.race.get_racial_hit() + self.get_spell_hit_from_talents()
+        hit_caps = [(base_miss_chance - melee_hit) / self.stats.get_melee_hit_from_rating(1) for base_miss_chance in (self.BASE_ONE_HAND_MISS_RATE, self.BASE_DW_MISS_RATE)]
+        hit_caps.append((self.BASE_SPELL_MISS_RATE - spell_hit) / self.stats.get_spell_hit_from_rating(1))
+        exp_caps = []
+        for weapon in (self.stats.mh, self.stats.oh):
+            for base_chance in (self.BASE_DODGE_CHANCE, self.BASE_PARRY_CHANCE):
+                exp_caps.append((base_chance - self.race.get_racial_expertise(weapon.type)) / self.stats.get_expertise_from_rating(1))
+        return {'hit': sorted(set([cap for cap in hit_caps if cap > 0])), 'exp': sorted(set([cap for cap in exp_caps if cap > 0]))}
+
     def buff_melee_crit(self):
         return self.buffs.buff_all_crit()
 
@@ -395,3 +675,64 @@ class DamageCalculator(object):
         elif attack_kind == 'physical':
             armor_override = self.target_armor(armor)
             return self.buffs.physical_damage_multiplier() * self.armor_mitigation_multiplier(armor_override)
+
+
+class Snapshot(object):
+    # An immutable copy of a calculator, taken by its snapshot method: its
+    # class and wire form, pickled.  Perturbations of it can be evaluated from any
+    # number of threads (or, through an executor, processes) at once; each
+    # evaluates them on a private copy it unpickles once, so neither the
+    # snapshot nor the calculator it was taken of is ever changed.
+
+    __slots__ = ('state',)
+
+    def __init__(self, state):
+        object.__setattr__(self, 'state', state)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(_('Snapshots cannot be modified'))
+
+    def __getstate__(self):
+        return self.state
+
+    def __setstate__(self, state):
+        object.__setattr__(self, 'state', state)
+
+    def calculator(self):
+        # A new calculator to do with as you like.
+        return _load_calculator(self.state)
+
+    def get_dps(self, perturbation=('baseline',)):
+        dps = _perturbed_dps_task((self.state, perturbation))
+        if isinstance(dps, Exception):
+            raise dps
+        return dps
+
+    def get_perturbed_dps(self, perturbations, executor=None):
+        # As DamageCalculator.get_perturbed_dps, without sharing results.
+        tasks = [(self.state, perturbation) for perturbation in perturbations]
+        if executor is None:
+            return map(_perturbed_dps_task, tasks)
+        return executor.map(_perturbed_dps_task, tasks)
+
+
+def _load_calculator(state):
+    calculator_class, form = cPickle.loads(state)
+    return calculator_class.from_wire_form(form)
+
+# The calculator each thread (of each worker process) last rebuilt, keyed by
+# its snapshot state, so a batch of perturbations only rebuilds it once per
+# thread.
+_worker = threading.local()
+
+def _perturbed_dps_task(task):
+    state, perturbation = task
+    calculators = getattr(_worker, 'calculators', None)
+    if calculators is None or state not in calculators:
+        calculators = _worker.calculators = {state: _load_calculator(state)}
+    try:
+        return calculators[state].perturbed_dps(perturbation)
+    except:
+        # Don't reuse a copy something went wrong with.
+        _worker.calculators = None
+        raise
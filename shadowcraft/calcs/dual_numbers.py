@@ -0,0 +1,143 @@
+import math
+
+# Dual numbers for forward-mode differentiation of the models.  A Dual carries
+# a value and the gradient of that value with respect to a fixed, ordered set
+# of inputs; arithmetic on Duals applies the chain rule as it goes, so running
+# a model on Dual inputs yields its partial derivatives with respect to all
+# of them in one pass.
+#
+# Comparisons (and hence max, min and branches) look at the value only, which
+# is the usual convention: at a kink you get the derivative of whichever
+# branch the value took.  Anything that isn't a Dual is treated as a constant.
+
+class Dual(object):
+    __slots__ = ('value', 'gradient')
+
+    def __init__(self, value, gradient):
+        self.value = value
+        self.gradient = tuple(gradient)
+
+    @classmethod
+    def variable(cls, value, index, size):
+        # The input number index (of size inputs) with the given value.
+        gradient = [0.] * size
+        gradient[index] = 1.
+        return cls(value, gradient)
+
+    def _scaled(self, value, factor):
+        return Dual(value, [factor * d for d in self.gradient])
+
+    def __add__(self, other):
+        if isinstance(other, Dual):
+            return Dual(self.value + other.value, [a + b for a, b in zip(self.gradient, other.gradient)])
+        return Dual(self.value + other, self.gradient)
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        if isinstance(other, Dual):
+            return Dual(self.value - other.value, [a - b for a, b in zip(self.gradient, other.gradient)])
+        return Dual(self.value - other, self.gradient)
+
+    def __rsub__(self, other):
+        return self._scaled(other - self.value, -1)
+
+    def __mul__(self, other):
+        if isinstance(other, Dual):
+            return Dual(self.value * other.value, [self.value * b + other.value * a for a, b in zip(self.gradient, other.gradient)])
+        return self._scaled(self.value * other, other)
+
+    __rmul__ = __mul__
+
+    def __div__(self, other):
+        if isinstance(other, Dual):
+            value = self.value / other.value
+            return Dual(value, [(a - value * b) / other.value for a, b in zip(self.gradient, other.gradient)])
+        return self._scaled(self.value / other, 1. / other)
+
+    def __rdiv__(self, other):
+        value = other / self.value
+        return self._scaled(value, -value / self.value)
+
+    __truediv__ = __div__
+    __rtruediv__ = __rdiv__
+
+    def __pow__(self, other):
+        if isinstance(other, Dual):
+            value = self.value ** other.value
+            if self.value == 0:
+                return Dual(value, [0.] * len(self.gradient))
+            log_base = math.log(self.value)
+            return Dual(value, [value * (other.value * a / self.value + log_base * b) for a, b in zip(self.gradient, other.gradient)])
+        if other == 0:
+            return Dual(1., [0.] * len(self.gradient))
+        return self._scaled(self.value ** other, other * self.value ** (other - 1))
+
+    def __rpow__(self, other):
+        value = other ** self.value
+        if other == 0:
+            return Dual(value, [0.] * len(self.gradient))
+        return self._scaled(value, value * math.log(other))
+
+    def __neg__(self):
+        return self._scaled(-self.value, -1)
+
+    def __pos__(self):
+        return self
+
+    def __abs__(self):
+        if self.value < 0:
+            return -self
+        return self
+
+    def _other_value(self, other):
+        if isinstance(other, Dual):
+            return other.value
+        return other
+
+    def __lt__(self, other):
+        return self.value < self._other_value(other)
+
+    def __le__(self, other):
+        return self.value <= self._other_value(other)
+
+    def __gt__(self, other):
+        return self.value > self._other_value(other)
+
+    def __ge__(self, other):
+        return self.value >= self._other_value(other)
+
+    def __eq__(self, other):
+        return self.value == self._other_value(other)
+
+    def __ne__(self, other):
+        return self.value != self._other_value(other)
+
+    def __hash__(self):
+        return hash(self.value)
+
+    def __nonzero__(self):
+        return bool(self.value)
+
+    def __float__(self):
+        return float(self.value)
+
+    def __int__(self):
+        return int(self.value)
+
+    def __repr__(self):
+        return 'Dual(%r, %r)' % (self.value, self.gradient)
+
+
+def value(x):
+    # The value of x, whether or not it's a Dual.
+    if isinstance(x, Dual):
+        return x.value
+    return x
+
+
+def gradient(x, size):
+    # The gradient of x; constants have a gradient of zeros.
+    if isinstance(x, Dual):
+        return x.gradient
+    return (0.,) * size
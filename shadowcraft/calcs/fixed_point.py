@@ -0,0 +1,114 @@
+import gettext
+import __builtin__
+
+__builtin__._ = gettext.gettext
+
+from shadowcraft.calcs import linear_algebra
+from shadowcraft.core import exceptions
+
+# Solvers for the fixed point problems our models boil down to: the stats we
+# get from procs depend on how often we attack, which in turn depends on our
+# stats.  A solver is fed, once per pass, the guess it was evaluated at and the
+# image the model produced for it, and returns the guess for the next pass.
+# Guesses and images are lists of floats in a fixed order.
+
+class InvalidSolverException(exceptions.InvalidInputException):
+    pass
+
+
+class FixedPointSolver(object):
+    # Plain (Picard) iteration: just feed the image back in.  Subclasses keep
+    # whatever history they need; call reset() before starting a new problem.
+
+    def reset(self):
+        pass
+
+    def next_guess(self, guess, image):
+        return image
+
+
+class AitkenExtrapolation(FixedPointSolver):
+    # Aitken delta-squared extrapolation, restarted from the extrapolated point
+    # every other pass (i.e., Steffensen's method).  We use the Irons-Tuck
+    # vector form, which applies a single step length to the whole vector;
+    # extrapolating each component on its own behaves badly when the stats
+    # are coupled.
+
+    def reset(self):
+        self.previous_guess = None
+
+    def next_guess(self, guess, image):
+        if self.previous_guess is None:
+            self.previous_guess = guess
+            self.previous_image = image
+            return image
+
+        x0, x1, x2 = self.previous_guess, self.previous_image, image
+        self.previous_guess = None
+
+        first_differences = [b - a for a, b in zip(x1, x2)]
+        second_differences = [c - 2 * b + a for a, b, c in zip(x0, x1, x2)]
+        denominator = sum([d * d for d in second_differences])
+        if denominator == 0:
+            return image
+        step = sum([a * b for a, b in zip(first_differences, second_differences)]) / denominator
+        return [c - step * d for c, d in zip(x2, first_differences)]
+
+
+class AndersonAcceleration(FixedPointSolver):
+    # Type II Anderson acceleration: the next guess is the combination of the
+    # last few images whose residuals (image - guess) best cancel out.  The
+    # depth is the number of previous passes we keep around.
+
+    def __init__(self, depth=3):
+        self.depth = depth
+        self.reset()
+
+    def reset(self):
+        self.residual_differences = []
+        self.image_differences = []
+        self.last_residual = None
+        self.last_image = None
+
+    def next_guess(self, guess, image):
+        residual = [g - x for g, x in zip(image, guess)]
+        if self.last_residual is not None:
+            self.residual_differences.append([a - b for a, b in zip(residual, self.last_residual)])
+            self.image_differences.append([a - b for a, b in zip(image, self.last_image)])
+            if len(self.residual_differences) > self.depth:
+                del self.residual_differences[0]
+                del self.image_differences[0]
+        self.last_residual = residual
+        self.last_image = image
+
+        if not self.residual_differences:
+            return image
+
+        try:
+            gamma = linear_algebra.least_squares(self.residual_differences, residual, regularization=1e-12)
+        except linear_algebra.SingularMatrixException:
+            # Residuals have stopped changing; there's nothing to extrapolate
+            # from, so fall back to a plain pass and start over.
+            self.reset()
+            return image
+
+        next_guess = list(image)
+        for coefficient, differences in zip(gamma, self.image_differences):
+            for i in xrange(len(next_guess)):
+                next_guess[i] -= coefficient * differences[i]
+        return next_guess
+
+
+solvers = {
+    'plain': FixedPointSolver,
+    'aitken': AitkenExtrapolation,
+    'anderson': AndersonAcceleration
+}
+
+
+def get_solver(name):
+    if name not in solvers:
+        raise InvalidSolverException(_('Unknown fixed point solver {solver}').format(solver=name))
+    solver = solvers[name]()
+    solver.reset()
+    return solver
@@ -0,0 +1,60 @@
+import gettext
+import __builtin__
+
+__builtin__._ = gettext.gettext
+
+from shadowcraft.core import exceptions
+
+# Small dense linear algebra helpers.  The systems we solve are tiny (a
+# handful of unknowns), so plain lists and Gaussian elimination are more than
+# fast enough and save us from depending on numpy.
+
+class SingularMatrixException(exceptions.InvalidInputException):
+    pass
+
+
+def solve(matrix, rhs):
+    # Solves matrix * x = rhs by Gaussian elimination with partial pivoting.
+    # matrix is a list of rows; neither argument is modified.
+    size = len(rhs)
+    rows = [list(matrix[i]) + [rhs[i]] for i in xrange(size)]
+    for col in xrange(size):
+        pivot = max(xrange(col, size), key=lambda row: abs(rows[row][col]))
+        if abs(rows[pivot][col]) == 0:
+            raise SingularMatrixException(_('Cannot solve a singular linear system'))
+        rows[col], rows[pivot] = rows[pivot], rows[col]
+        pivot_row = rows[col]
+        for row in xrange(col + 1, size):
+            factor = rows[row][col] / pivot_row[col]
+            if factor:
+                current_row = rows[row]
+                for k in xrange(col, size + 1):
+                    current_row[k] -= factor * pivot_row[k]
+
+    solution = [0] * size
+    for row in xrange(size - 1, -1, -1):
+        total = rows[row][size]
+        for k in xrange(row + 1, size):
+            total -= rows[row][k] * solution[k]
+        solution[row] = total / rows[row][row]
+    return solution
+
+
+def least_squares(columns, rhs, regularization=0):
+    # Returns the coefficients c minimizing |rhs - sum(c[j] * columns[j])|
+    # by way of the normal equations.  A small (relative) Tikhonov
+    # regularization term can be passed to keep nearly collinear columns from
+    # blowing up the solution.
+    size = len(columns)
+    normal_matrix = [[0] * size for i in xrange(size)]
+    for i in xrange(size):
+        for j in xrange(i, size):
+            dot = sum([a * b for a, b in zip(columns[i], columns[j])])
+            normal_matrix[i][j] = dot
+            normal_matrix[j][i] = dot
+    if regularization:
+        trace = sum([normal_matrix[i][i] for i in xrange(size)])
+        for i in xrange(size):
+            normal_matrix[i][i] += regularization * trace
+    normal_rhs = [sum([a * b for a, b in zip(column, rhs)]) for column in columns]
+    return solve(normal_matrix, normal_rhs)
@@ -1,10 +1,18 @@
 import copy
 import gettext
+import glob
+import hashlib
+import os
 import __builtin__
 
 __builtin__._ = gettext.gettext
 
+from shadowcraft.calcs import dual_numbers
+from shadowcraft.calcs import fixed_point
 from shadowcraft.calcs.rogue import RogueDamageCalculator
+from shadowcraft.calcs.rogue.Aldriana import attack_rates
+from shadowcraft.calcs.rogue.Aldriana import settings
+from shadowcraft.core import caching
 from shadowcraft.core import exceptions
 
 
@@ -13,23 +21,40 @@ class InputNotModeledException(exceptions.InvalidInputException):
     pass
 
 
+# The packages, relative to shadowcraft, whose code and data the model's
+# results depend on.
+MODEL_SOURCES = ('calcs', 'calcs/rogue', 'calcs/rogue/Aldriana', 'objects', 'objects/rogue')
+_model_version = None
+
+def model_version():
+    # A stamp that changes whenever the model does: a hash of the source
+    # files in MODEL_SOURCES.  Anything that stores results should key them
+    # on this as well as the input.
+    global _model_version
+    if _model_version is None:
+        root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+        digest = hashlib.sha1()
+        for source in MODEL_SOURCES:
+            for path in sorted(glob.glob(os.path.join(root, source, '*.py'))):
+                digest.update('/'.join((source, os.path.basename(path))))
+                with open(path, 'rb') as f:
+                    digest.update(f.read())
+        _model_version = digest.hexdigest()
+    return _model_version
+
+
 class AldrianasRogueDamageCalculator(RogueDamageCalculator):
+    settings_class = settings.Settings
+
     ###########################################################################
     # Main DPS comparison function.  Calls the appropriate sub-function based
     # on talent tree.
     ###########################################################################
 
     def get_dps(self):
-        super(AldrianasRogueDamageCalculator, self).get_dps()
-        if self.talents.is_assassination_rogue():
-            self.init_assassination()
-            return self.assassination_dps_estimate()
-        elif self.talents.is_combat_rogue():
-            return self.combat_dps_estimate()
-        elif self.talents.is_subtlety_rogue():
-            return self.subtlety_dps_estimate()
-        else:
-            raise InputNotModeledException(_('You must have 31 points in at least one talent tree.'))
+        # Summing the breakdown, rather than calling the *_dps_estimate
+        # functions, keeps get_dps exactly consistent with get_report.
+        return sum(self.get_dps_breakdown().values())
 
     def get_dps_breakdown(self):
         if self.talents.is_assassination_rogue():
@@ -48,19 +73,33 @@ class AldrianasRogueDamageCalculator(RogueDamageCalculator):
 
     PRECISION_REQUIRED = 10 ** -7
 
+    # The stats iterated on by compute_damage, in the order the fixed point
+    # solvers see them.
+    SOLVER_STATS = ('agi', 'ap', 'crit', 'haste', 'mastery')
+    # Largest relative change in base stats we'll still warm start across.
+    WARM_START_TOLERANCE = .05
+
     def are_close_enough(self, old_dist, new_dist):
-        for item in new_dist:
-            if item not in old_dist:
+        return new_dist.distance(old_dist) <= self.PRECISION_REQUIRED
+
+    def are_stats_close_enough(self, old_stats, new_stats):
+        for old, new in zip(old_stats, new_stats):
+            if abs(new - old) > self.PRECISION_REQUIRED * max(abs(old), 1):
                 return False
-            elif not hasattr(new_dist[item], '__iter__'):
-                if abs(new_dist[item] - old_dist[item]) > self.PRECISION_REQUIRED:
-                    return False
-            else:
-                for index in range(len(new_dist[item])):
-                    if abs(new_dist[item][index] - old_dist[item][index]) > self.PRECISION_REQUIRED:
-                        return False
         return True
 
+    # Proc stats compute_damage does something with; procs with any other
+    # stat are only read by name, if at all.
+    MODELED_PROC_STATS = frozenset(['agi', 'ap', 'crit', 'haste', 'mastery', 'spell_damage', 'physical_damage', 'extra_weapon_damage'])
+    NAMED_PROCS = frozenset(['rogue_t11_4pc', 'matrix_restabilizer', 'heroic_matrix_restabilizer'])
+
+    def get_modeled_procs(self):
+        procs = []
+        for proc_name in self.stats.procs.equipped_proc_names:
+            if proc_name in self.NAMED_PROCS or getattr(self.stats.procs, proc_name).stat in self.MODELED_PROC_STATS:
+                procs.append(proc_name)
+        return procs
+
     def get_dps_contribution(self, damage_tuple, crit_rate, frequency):
         (base_damage, crit_damage) = damage_tuple
         average_hit = base_damage * (1 - crit_rate) + crit_damage * crit_rate
@@ -88,36 +127,64 @@ class AldrianasRogueDamageCalculator(RogueDamageCalculator):
         # Just average-casing for now.  Should fix that at some point.
         return 1 + .3 * self.heroism_uptime_per_fight()
 
+    # Combo point distributions only depend on the cp per move, finisher size
+    # and ruthlessness, so they're shared by every calculator; EP and ranking
+    # runs ask for the same few over and over.
+    cp_distribution_cache = caching.LRUCache(512)
+
     def get_cp_distribution_for_cycle(self, cp_distribution_per_move, target_cp_quantity):
+        # Returns the distribution of (cps, moves) we finish with when using
+        # moves that generate cps as per cp_distribution_per_move until we
+        # have at least target_cp_quantity, along with the fraction of time
+        # spent at each cp count.
+        ruthlessness = self.talents.ruthlessness
+        move_distribution = sorted(cp_distribution_per_move.items())
+        for move_cp, move_prob in move_distribution:
+            if isinstance(move_prob, dual_numbers.Dual):
+                # Don't let cached floats stand in for a derivative.
+                return self.compute_cp_distribution_for_cycle(move_distribution, target_cp_quantity, ruthlessness)
+
+        key = (tuple(move_distribution), target_cp_quantity, ruthlessness)
+        result = self.cp_distribution_cache.get(key)
+        if result is None:
+            result = self.compute_cp_distribution_for_cycle(move_distribution, target_cp_quantity, ruthlessness)
+            self.cp_distribution_cache.put(key, result)
+        cur_dist, time_spent_at_cp = result
+        return dict(cur_dist), list(time_spent_at_cp)
+
+    def compute_cp_distribution_for_cycle(self, move_distribution, target_cp_quantity, ruthlessness):
+        # The chain of cp counts is stepped one move at a time: dist[cps][moves]
+        # is the chance of sitting at cps after that many moves.  At step n
+        # everything short of n cps makes another move, which is the only way
+        # to get there, so target_cp_quantity steps are enough.
+        ruthlessness_chance = ruthlessness * .2
+        max_moves = target_cp_quantity + 1
+        dist = [[0] * max_moves for cps in xrange(6)]
+        dist[0][0] = 1 - ruthlessness_chance
+        dist[1][0] = ruthlessness_chance
+        reached = set([(0, 0), (1, 0)])
         time_spent_at_cp = [0, 0, 0, 0, 0, 0]
-        cur_min_cp = 0
-        ruthlessness_chance = self.talents.ruthlessness * .2
-        cur_dist = {(0, 0): (1 - ruthlessness_chance), (1, 0): ruthlessness_chance}
-        while cur_min_cp < target_cp_quantity:
-            cur_min_cp += 1
-
-            new_dist = {}
-            for (cps, moves), prob in cur_dist.items():
-                if cps >= cur_min_cp:
-                    if (cps, moves) in new_dist:
-                        new_dist[(cps, moves)] += prob
-                    else:
-                        new_dist[(cps, moves)] = prob
-                else:
-                    for (move_cp, move_prob) in cp_distribution_per_move.items():
-                        total_cps = cps + move_cp
-                        if total_cps > 5:
-                            total_cps = 5
-                        dist_entry = (total_cps, moves + 1)
+
+        for cur_min_cp in xrange(1, target_cp_quantity + 1):
+            new_dist = [list(dist[cps]) if cps >= cur_min_cp else [0] * max_moves for cps in xrange(6)]
+            for cps in xrange(cur_min_cp):
+                row = dist[cps]
+                for moves in xrange(max_moves - 1):
+                    if (cps, moves) not in reached:
+                        continue
+                    prob = row[moves]
+                    for move_cp, move_prob in move_distribution:
+                        total_cps = min(cps + move_cp, 5)
                         time_spent_at_cp[total_cps] += move_prob * prob
-                        if dist_entry in new_dist:
-                            new_dist[dist_entry] += move_prob * prob
-                        else:
-                            new_dist[dist_entry] = move_prob * prob
-            cur_dist = new_dist
+                        new_dist[total_cps][moves + 1] += move_prob * prob
+                        reached.add((total_cps, moves + 1))
+                    reached.discard((cps, moves))
+            dist = new_dist
 
-        for (cps, moves), prob in cur_dist.items():
-            time_spent_at_cp[cps] += prob
+        cur_dist = {}
+        for (cps, moves) in reached:
+            cur_dist[(cps, moves)] = dist[cps][moves]
+            time_spent_at_cp[cps] += dist[cps][moves]
 
         total_weight = sum(time_spent_at_cp)
         for i in xrange(6):
@@ -393,137 +460,149 @@ class AldrianasRogueDamageCalculator(RogueDamageCalculator):
 
         return damage_breakdown
 
-    def get_mh_procs_per_second(self, proc, attacks_per_second, crit_rates):
-        triggers_per_second = 0
+    # Procs are compiled, once per compute_damage, into a TriggerVector per
+    # hand and the rate each trigger procs them at; the solver then only has
+    # to take a dot product with the attack rates for every proc on every
+    # pass, rather than go back over the proc's behaviour each time.
+    MH_STRIKES = ('mutilate', 'backstab', 'revealing_strike', 'sinister_strike', 'ambush', 'hemorrhage', 'mh_killing_spree', 'main_gauche')
+
+    def get_mh_proc_triggers(self, proc):
+        crit_only = proc.procs_off_crit_only()
+        triggers = []
         if proc.procs_off_auto_attacks():
-            if proc.procs_off_crit_only():
-                triggers_per_second += attacks_per_second['mh_autoattacks'] * crit_rates['mh_autoattacks']
+            if crit_only:
+                triggers.append(('mh_autoattacks', 'mh_autoattacks', 'mh_autoattacks'))
             else:
-                triggers_per_second += attacks_per_second['mh_autoattack_hits']
+                triggers.append(('mh_autoattack_hits', None, 'mh_autoattack_hits'))
         if proc.procs_off_strikes():
-            for ability in ('mutilate', 'backstab', 'revealing_strike', 'sinister_strike', 'ambush', 'hemorrhage', 'mh_killing_spree', 'main_gauche'):
+            for ability in self.MH_STRIKES + ('envenom', 'eviscerate'):
                 if ability == 'main_gauche' and not proc.procs_off_procced_strikes():
-                    pass
-                elif ability in attacks_per_second:
-                    if proc.procs_off_crit_only():
-                        triggers_per_second += attacks_per_second[ability] * crit_rates[ability]
-                    else:
-                        triggers_per_second += attacks_per_second[ability]
-            for ability in ('envenom', 'eviscerate'):
-                if ability in attacks_per_second:
-                    if proc.procs_off_crit_only():
-                        triggers_per_second += sum(attacks_per_second[ability]) * crit_rates[ability]
-                    else:
-                        triggers_per_second += sum(attacks_per_second[ability])
-        if proc.procs_off_apply_debuff():
-            if 'rupture' in attacks_per_second:
-                if not proc.procs_off_crit_only():
-                    triggers_per_second += attacks_per_second['rupture']
-            if 'garrote' in attacks_per_second:
-                if not proc.procs_off_crit_only():
-                    triggers_per_second += attacks_per_second['garrote']
-            if 'hemorrhage_ticks' in attacks_per_second:
-                if not proc.procs_off_crit_only():
-                    triggers_per_second += attacks_per_second['hemorrhage']
-
-        return triggers_per_second * proc.proc_rate(self.stats.mh.speed)
-
-    def get_oh_procs_per_second(self, proc, attacks_per_second, crit_rates):
-        triggers_per_second = 0
+                    continue
+                triggers.append((ability, ability if crit_only else None, ability))
+        if proc.procs_off_apply_debuff() and not crit_only:
+            triggers.append(('rupture', None, 'rupture'))
+            triggers.append(('garrote', None, 'garrote'))
+            # Hemorrhage only applies a debuff in the builds that glyph it.
+            triggers.append(('hemorrhage', None, 'hemorrhage_ticks'))
+        return triggers
+
+    def get_oh_proc_triggers(self, proc):
+        crit_only = proc.procs_off_crit_only()
+        triggers = []
         if proc.procs_off_auto_attacks():
-            if proc.procs_off_crit_only():
-                triggers_per_second += attacks_per_second['oh_autoattacks'] * crit_rates['oh_autoattacks']
+            if crit_only:
+                triggers.append(('oh_autoattacks', 'oh_autoattacks', 'oh_autoattacks'))
             else:
-                triggers_per_second += attacks_per_second['oh_autoattack_hits']
+                triggers.append(('oh_autoattack_hits', None, 'oh_autoattack_hits'))
         if proc.procs_off_strikes():
             for ability in ('mutilate', 'oh_killing_spree'):
-                if ability in attacks_per_second:
-                    if proc.procs_off_crit_only():
-                        triggers_per_second += attacks_per_second[ability] * crit_rates[ability]
-                    else:
-                        triggers_per_second += attacks_per_second[ability]
-
-        return triggers_per_second * proc.proc_rate(self.stats.oh.speed)
-
-    def get_other_procs_per_second(self, proc, attacks_per_second, crit_rates):
-        triggers_per_second = 0
+                triggers.append((ability, ability if crit_only else None, ability))
+        return triggers
 
+    def get_other_proc_triggers(self, proc):
+        crit_only = proc.procs_off_crit_only()
+        triggers = []
         if proc.procs_off_harmful_spells():
             for ability in ('instant_poison', 'wound_poison', 'venomous_wounds'):
-                if ability in attacks_per_second:
-                    if proc.procs_off_crit_only():
-                        triggers_per_second += attacks_per_second[ability] * crit_rates[ability]
-                    else:
-                        triggers_per_second += attacks_per_second[ability]
+                triggers.append((ability, ability if crit_only else None, ability))
         if proc.procs_off_periodic_spell_damage():
-            if 'deadly_poison' in attacks_per_second:
-                if proc.procs_off_crit_only():
-                    triggers_per_second += attacks_per_second['deadly_poison'] * crit_rates['deadly_poison']
-                else:
-                    triggers_per_second += attacks_per_second['deadly_poison']
+            triggers.append(('deadly_poison', 'deadly_poison' if crit_only else None, 'deadly_poison'))
         if proc.procs_off_bleeds():
-            if 'rupture_ticks' in attacks_per_second:
-                if proc.procs_off_crit_only():
-                    triggers_per_second += sum(attacks_per_second['rupture_ticks']) * crit_rates['rupture']
-                else:
-                    triggers_per_second += sum(attacks_per_second['rupture_ticks'])
-            if 'garrote_ticks' in attacks_per_second:
-                if proc.procs_off_crit_only():
-                    triggers_per_second += attacks_per_second['garrote_ticks'] * crit_rates['garrote']
-                else:
-                    triggers_per_second += attacks_per_second['garrote_ticks']
-            if 'hemorrhage_ticks' in attacks_per_second:
-                if proc.procs_off_crit_only():
-                    triggers_per_second += attacks_per_second['hemorrhage_ticks'] * crit_rates['hemorrhage']
-                else:
-                    triggers_per_second += attacks_per_second['hemorrhage_ticks']
-        if proc.is_ppm():
-            if triggers_per_second == 0:
-                return 0
-            else:
-                raise InputNotModeledException(_('PPMs that also proc off spells are not yet modeled.'))
+            # Ticks are keyed by the crit rate of the bleed they belong to.
+            for ability, crit_key in (('rupture_ticks', 'rupture'), ('garrote_ticks', 'garrote'), ('hemorrhage_ticks', 'hemorrhage')):
+                triggers.append((ability, crit_key if crit_only else None, ability))
+        return triggers
+
+    def compile_proc_triggers(self, proc):
+        # Returns a list of (TriggerVector, proc rate) pairs; a rate of None
+        # marks spell triggers on a ppm proc, which we can't model.
+        if getattr(proc, 'mh_only', False):
+            hands = ('mh',)
+        elif getattr(proc, 'oh_only', False):
+            hands = ('oh',)
         else:
-            return triggers_per_second * proc.proc_rate()
+            hands = ('mh', 'oh', 'other')
+
+        compiled = []
+        for hand in hands:
+            if hand == 'mh':
+                triggers = self.get_mh_proc_triggers(proc)
+                rate = proc.proc_rate(self.stats.mh.speed)
+            elif hand == 'oh':
+                triggers = self.get_oh_proc_triggers(proc)
+                rate = proc.proc_rate(self.stats.oh.speed)
+            else:
+                triggers = self.get_other_proc_triggers(proc)
+                rate = None if proc.is_ppm() else proc.proc_rate()
+            compiled.append((attack_rates.TriggerVector(triggers), rate))
+        return compiled
+
+    def get_proc_triggers(self, proc):
+        # Compiled triggers are only good for the compute_damage call they were
+        # made in, as that's where proc behaviours and hands get set up.
+        if getattr(self, 'proc_triggers', None) is None:
+            return self.compile_proc_triggers(proc)
+        if proc not in self.proc_triggers:
+            self.proc_triggers[proc] = self.compile_proc_triggers(proc)
+        return self.proc_triggers[proc]
 
     def get_procs_per_second(self, proc, attacks_per_second, crit_rates):
         # TODO: Include damaging proc hits in figuring out how often everything else procs.
-        if getattr(proc, 'mh_only', False):
-            procs_per_second = self.get_mh_procs_per_second(proc, attacks_per_second, crit_rates)
-        elif getattr(proc, 'oh_only', False):
-            procs_per_second = self.get_oh_procs_per_second(proc, attacks_per_second, crit_rates)
-        else:
-            procs_per_second = self.get_mh_procs_per_second(proc, attacks_per_second, crit_rates) + self.get_oh_procs_per_second(proc, attacks_per_second, crit_rates) + self.get_other_procs_per_second(proc, attacks_per_second, crit_rates)
+        procs_per_second = 0
+        for triggers, rate in self.get_proc_triggers(proc):
+            triggers_per_second = triggers.per_second(attacks_per_second, crit_rates)
+            if rate is not None:
+                procs_per_second += triggers_per_second * rate
+            elif triggers_per_second != 0:
+                raise InputNotModeledException(_('PPMs that also proc off spells are not yet modeled.'))
 
         return procs_per_second
 
-    def set_uptime_for_ramping_proc(self, proc, procs_per_second):
+    def get_ramping_uptime(self, procs_per_second, max_stacks):
         time_for_one_stack = 1 / procs_per_second
-        if time_for_one_stack * proc.max_stacks > self.settings.duration:
+        if time_for_one_stack * max_stacks > self.settings.duration:
             max_stacks_reached = self.settings.duration * procs_per_second
-            proc.uptime = max_stacks_reached / 2
+            return max_stacks_reached / 2
         else:
-            missing_stacks = proc.max_stacks * (proc.max_stacks + 1) / 2
+            missing_stacks = max_stacks * (max_stacks + 1) / 2
             stack_time_lost = missing_stacks * time_for_one_stack
-            proc.uptime = proc.max_stacks - stack_time_lost / self.settings.duration
-
-    def set_uptime(self, proc, attacks_per_second, crit_rates):
-        procs_per_second = self.get_procs_per_second(proc, attacks_per_second, crit_rates)
+            return max_stacks - stack_time_lost / self.settings.duration
 
-        if proc.icd:
-            proc.uptime = proc.duration / (proc.icd + 1. / procs_per_second)
-        else:
-            if procs_per_second >= 1:
-                self.set_uptime_for_ramping_proc(proc, procs_per_second)
+    def set_uptime_for_ramping_proc(self, proc, procs_per_second):
+        proc.uptime = self.get_ramping_uptime(procs_per_second, proc.max_stacks)
+
+    def get_uptimes(self, procs_per_second, durations, icds, max_stacks):
+        # Takes the procs per second, duration, icd and max stacks of any
+        # number of procs, as parallel sequences, and returns the uptime of
+        # each.
+        uptimes = []
+        for proc_rate, duration, icd, stacks in zip(procs_per_second, durations, icds, max_stacks):
+            if icd:
+                uptimes.append(duration / (icd + 1. / proc_rate))
+            elif proc_rate >= 1:
+                uptimes.append(self.get_ramping_uptime(proc_rate, stacks))
             else:
-            # See http://elitistjerks.com/f31/t20747-advanced_rogue_mechanics_discussion/#post621369
-            # for the derivation of this formula.
-                q = 1 - procs_per_second
-                Q = q ** proc.duration
+                # See http://elitistjerks.com/f31/t20747-advanced_rogue_mechanics_discussion/#post621369
+                # for the derivation of this formula.
+                q = 1 - proc_rate
+                Q = q ** duration
                 if Q < .0001:
-                    self.set_uptime_for_ramping_proc(proc, procs_per_second)
+                    uptimes.append(self.get_ramping_uptime(proc_rate, stacks))
                 else:
                     P = 1 - Q
-                    proc.uptime = P * (1 - P ** proc.max_stacks) / Q
+                    uptimes.append(P * (1 - P ** stacks) / Q)
+        return uptimes
+
+    def set_uptimes(self, procs, attacks_per_second, crit_rates):
+        procs_per_second = [self.get_procs_per_second(proc, attacks_per_second, crit_rates) for proc in procs]
+        durations = [proc.duration for proc in procs]
+        icds = [proc.icd for proc in procs]
+        max_stacks = [proc.max_stacks for proc in procs]
+        for proc, uptime in zip(procs, self.get_uptimes(procs_per_second, durations, icds, max_stacks)):
+            proc.uptime = uptime
+
+    def set_uptime(self, proc, attacks_per_second, crit_rates):
+        self.set_uptimes([proc], attacks_per_second, crit_rates)
 
     def update_with_damaging_proc(self, proc, attacks_per_second, crit_rates):
         if proc.icd:
@@ -632,6 +711,28 @@ class AldrianasRogueDamageCalculator(RogueDamageCalculator):
             attacks_per_second['wound_poison'] = mh_poison_procs
             attacks_per_second['instant_poison'] = oh_poison_procs
 
+    def get_warm_start_guess(self, key, proc_signature, base_guess):
+        # Perturbation runs (EP, rankings) solve nearly the same problem over
+        # and over.  If the procs are the same and the base stats haven't
+        # moved much since the last solve for this cycle, assume the procs
+        # contribute what they did last time and start from there.
+        warm_starts = getattr(self, 'warm_starts', {})
+        if key not in warm_starts:
+            return base_guess
+        previous_signature, previous_base, proc_contribution = warm_starts[key]
+        if previous_signature != proc_signature:
+            return base_guess
+        for new, old in zip(base_guess, previous_base):
+            if abs(new - old) > self.WARM_START_TOLERANCE * max(abs(old), 1):
+                return base_guess
+        return [base + contribution for base, contribution in zip(base_guess, proc_contribution)]
+
+    def save_warm_start(self, key, proc_signature, base_guess, guess):
+        if getattr(self, 'warm_starts', None) is None:
+            self.warm_starts = {}
+        proc_contribution = [float(x) - float(base) for x, base in zip(guess, base_guess)]
+        self.warm_starts[key] = (proc_signature, [float(x) for x in base_guess], proc_contribution)
+
     def compute_damage(self, attack_counts_function):
         # TODO: Crit cap
         #
@@ -681,8 +782,26 @@ class AldrianasRogueDamageCalculator(RogueDamageCalculator):
                     elif enchant == 'avalanche':
                         damage_procs.append(spell_component)
 
-        attacks_per_second, crit_rates = attack_counts_function(current_stats)
+        # Procs without an icd feed back into the fixed point; those with one
+        # are added in once it has converged.
+        stacking_procs = [proc for proc in active_procs if not proc.icd]
+        icd_procs = [proc for proc in active_procs if proc.icd]
+        self.proc_triggers = {}
+
+        solver = fixed_point.get_solver(self.settings.solver)
+        base_guess = [current_stats[stat] for stat in self.SOLVER_STATS]
+        guess = base_guess
 
+        warm_start_key = attack_counts_function.__name__
+        proc_signature = tuple([(proc.proc_name, proc.stat) for proc in active_procs + damage_procs])
+        if self.settings.warm_start:
+            guess = self.get_warm_start_guess(warm_start_key, proc_signature, base_guess)
+            current_stats = dict(zip(self.SOLVER_STATS, guess))
+
+        with self.timed('attack_counts'):
+            attacks_per_second, crit_rates = attack_counts_function(current_stats)
+
+        converged = False
         for _loop in range(20):
             current_stats = {
                 'agi': self.base_stats['agi'],
@@ -692,30 +811,49 @@ class AldrianasRogueDamageCalculator(RogueDamageCalculator):
                 'mastery': self.base_stats['mastery']
             }
 
-            self.update_crit_rates_for_4pc_t11(attacks_per_second, crit_rates)
+            with self.timed('proc_uptimes'):
+                self.update_crit_rates_for_4pc_t11(attacks_per_second, crit_rates)
 
-            for proc in damage_procs:
-                if not proc.icd:
-                    self.update_with_damaging_proc(proc, attacks_per_second, crit_rates)
+                for proc in damage_procs:
+                    if not proc.icd:
+                        self.update_with_damaging_proc(proc, attacks_per_second, crit_rates)
 
-            for proc in active_procs:
-                if not proc.icd:
-                    self.set_uptime(proc, attacks_per_second, crit_rates)
+                self.set_uptimes(stacking_procs, attacks_per_second, crit_rates)
+                for proc in stacking_procs:
                     current_stats[proc.stat] += proc.uptime * proc.value
 
             current_stats['agi'] *= self.agi_multiplier
             for stat in ('crit', 'haste', 'mastery'):
                 current_stats[stat] *= self.get_4pc_t12_multiplier()
 
+            image = [current_stats[stat] for stat in self.SOLVER_STATS]
+            guess = solver.next_guess(guess, image)
+            # Settled attack counts aren't enough to stop on: AP doesn't move
+            # them, so an extrapolated AP would never be checked.  We also
+            # need the solver to have stepped (almost) onto the image, relative
+            # to the size of each stat; plain iteration always does.
+            on_image = True
+            if guess is not image:
+                on_image = self.are_stats_close_enough(image, guess)
+                current_stats = dict(zip(self.SOLVER_STATS, guess))
+
             old_attacks_per_second = attacks_per_second
-            attacks_per_second, crit_rates = attack_counts_function(current_stats)
+            with self.timed('attack_counts'):
+                attacks_per_second, crit_rates = attack_counts_function(current_stats)
 
-            if self.are_close_enough(old_attacks_per_second, attacks_per_second):
+            if on_image and self.are_close_enough(old_attacks_per_second, attacks_per_second):
+                converged = True
                 break
 
-        for proc in active_procs:
-            if proc.icd:
-                self.set_uptime(proc, attacks_per_second, crit_rates)
+        if self.telemetry is not None:
+            self.telemetry.record_solve(attack_counts_function.__name__, _loop + 1, old_attacks_per_second, attacks_per_second, converged)
+
+        if self.settings.warm_start:
+            self.save_warm_start(warm_start_key, proc_signature, base_guess, guess)
+
+        with self.timed('proc_uptimes'):
+            self.set_uptimes(icd_procs, attacks_per_second, crit_rates)
+            for proc in icd_procs:
                 if proc.stat == 'agi':
                     current_stats[proc.stat] += proc.uptime * proc.value * self.agi_multiplier
                 elif proc.stat in ('crit', 'haste', 'mastery'):
@@ -723,17 +861,21 @@ class AldrianasRogueDamageCalculator(RogueDamageCalculator):
                 else:
                     current_stats[proc.stat] += proc.uptime * proc.value
 
-        attacks_per_second, crit_rates = attack_counts_function(current_stats)
+        with self.timed('attack_counts'):
+            attacks_per_second, crit_rates = attack_counts_function(current_stats)
 
-        self.update_crit_rates_for_4pc_t11(attacks_per_second, crit_rates)
+        with self.timed('proc_uptimes'):
+            self.update_crit_rates_for_4pc_t11(attacks_per_second, crit_rates)
 
-        for proc in damage_procs:
-            self.update_with_damaging_proc(proc, attacks_per_second, crit_rates)
+            for proc in damage_procs:
+                self.update_with_damaging_proc(proc, attacks_per_second, crit_rates)
+
+            self.set_uptimes(weapon_damage_procs, attacks_per_second, crit_rates)
 
-        for proc in weapon_damage_procs:
-            self.set_uptime(proc, attacks_per_second, crit_rates)
+        self.proc_triggers = None
 
-        damage_breakdown = self.get_damage_breakdown(current_stats, attacks_per_second, crit_rates, damage_procs)
+        with self.timed('get_damage_breakdown'):
+            damage_breakdown = self.get_damage_breakdown(current_stats, attacks_per_second, crit_rates, damage_procs)
 
         # Discard the crit component.
         for key in damage_breakdown:
@@ -775,7 +917,8 @@ class AldrianasRogueDamageCalculator(RogueDamageCalculator):
         if self.talents.cut_to_the_chase != 3:
             raise InputNotModeledException(_('Assassination modeling requires three points in Cut to the Chase'))
 
-        self.set_constants()
+        with self.timed('set_constants'):
+            self.set_constants()
 
         self.envenom_energy_cost = 28 + 7 / self.strike_hit_chance
         self.envenom_energy_cost *= self.stats.gear_buffs.rogue_t13_2pc_cost_multiplier()
@@ -929,7 +1072,7 @@ class AldrianasRogueDamageCalculator(RogueDamageCalculator):
         envenom_energy_cost = cpg_per_finisher * cpg_energy_cost + self.envenom_energy_cost - cp_per_finisher * self.relentless_strikes_energy_return_per_cp
         envenoms_per_cycle = energy_for_envenoms / envenom_energy_cost
 
-        attacks_per_second = {}
+        attacks_per_second = attack_rates.AttackRates()
 
         envenoms_per_second = envenoms_per_cycle / avg_cycle_length
         attacks_per_second['rupture'] = 1 / avg_cycle_length
@@ -944,10 +1087,11 @@ class AldrianasRogueDamageCalculator(RogueDamageCalculator):
 
         attacks_per_second['envenom'] = [finisher_chance * envenoms_per_second for finisher_chance in envenom_size_breakdown]
 
-        attacks_per_second['rupture_ticks'] = [0, 0, 0, 0, 0, 0]
+        rupture_ticks = [0, 0, 0, 0, 0, 0]
         for i in xrange(1, 6):
             ticks_per_rupture = 3 + i + 2 * self.glyphs.rupture
-            attacks_per_second['rupture_ticks'][i] = ticks_per_rupture * attacks_per_second['rupture'] * rupture_sizes[i]
+            rupture_ticks[i] = ticks_per_rupture * attacks_per_second['rupture'] * rupture_sizes[i]
+        attacks_per_second['rupture_ticks'] = rupture_ticks
 
         total_rupture_ticks = sum(attacks_per_second['rupture_ticks'])
         attacks_per_second['garrote_ticks'] = 6 * attacks_per_second['garrote']
@@ -1013,7 +1157,8 @@ class AldrianasRogueDamageCalculator(RogueDamageCalculator):
         if not self.talents.revealing_strike and self.settings.cycle.use_revealing_strike != 'never':
             raise InputNotModeledException(_('Cannot specify revealing strike usage in cycle without taking the talent.'))
 
-        self.set_constants()
+        with self.timed('set_constants'):
+            self.set_constants()
 
         if self.talents.bandits_guile:
             self.max_bandits_guile_buff = 1.3
@@ -1049,7 +1194,7 @@ class AldrianasRogueDamageCalculator(RogueDamageCalculator):
         return damage_breakdown
 
     def combat_attack_counts(self, current_stats):
-        attacks_per_second = {}
+        attacks_per_second = attack_rates.AttackRates()
 
         base_melee_crit_rate = self.melee_crit_rate(agi=current_stats['agi'], crit=current_stats['crit'])
         base_spell_crit_rate = self.spell_crit_rate(crit=current_stats['crit'])
@@ -1223,10 +1368,11 @@ class AldrianasRogueDamageCalculator(RogueDamageCalculator):
 
         attacks_per_second['eviscerate'] = [finisher_chance * total_evis_per_second for finisher_chance in finisher_size_breakdown]
 
-        attacks_per_second['rupture_ticks'] = [0, 0, 0, 0, 0, 0]
+        rupture_ticks = [0, 0, 0, 0, 0, 0]
         for i in xrange(1, 6):
             ticks_per_rupture = 3 + i + 2 * self.glyphs.rupture
-            attacks_per_second['rupture_ticks'][i] = ticks_per_rupture * attacks_per_second['rupture'] * finisher_size_breakdown[i]
+            rupture_ticks[i] = ticks_per_rupture * attacks_per_second['rupture'] * finisher_size_breakdown[i]
+        attacks_per_second['rupture_ticks'] = rupture_ticks
 
         total_mh_hits = attacks_per_second['mh_autoattack_hits'] + attacks_per_second['sinister_strike'] + attacks_per_second['revealing_strike'] + attacks_per_second['mh_killing_spree'] + attacks_per_second['rupture'] + total_evis_per_second + attacks_per_second['main_gauche']
         total_oh_hits = attacks_per_second['oh_autoattack_hits'] + attacks_per_second['oh_killing_spree']
@@ -1258,7 +1404,8 @@ class AldrianasRogueDamageCalculator(RogueDamageCalculator):
         if self.talents.serrated_blades != 2:
             raise InputNotModeledException(_('Subtlety modeling currently requires 2 points in Serrated Blades'))
 
-        self.set_constants()
+        with self.timed('set_constants'):
+            self.set_constants()
 
         self.base_hemo_cost = 28 + 7 / self.strike_hit_chance - 2 * self.talents.slaughter_from_the_shadows
         self.base_hemo_cost *= self.stats.gear_buffs.rogue_t13_2pc_cost_multiplier()
@@ -1294,7 +1441,7 @@ class AldrianasRogueDamageCalculator(RogueDamageCalculator):
         return damage_breakdown
 
     def subtlety_attack_counts_backstab(self, current_stats):
-        attacks_per_second = {}
+        attacks_per_second = attack_rates.AttackRates()
 
         base_melee_crit_rate = self.melee_crit_rate(agi=current_stats['agi'], crit=current_stats['crit'])
         base_spell_crit_rate = self.spell_crit_rate(crit=current_stats['crit'])
@@ -1423,7 +1570,7 @@ class AldrianasRogueDamageCalculator(RogueDamageCalculator):
         extra_eviscerates_per_cycle = energy_for_evis_spam / total_cost_of_extra_eviscerate
 
         attacks_per_second['cp_builder'] = (5 - .2 * self.talents.ruthlessness) * extra_eviscerates_per_cycle / cycle_length
-        attacks_per_second['eviscerate'] = [0, 0, 0, 0, 0, (bonus_eviscerates + extra_eviscerates_per_cycle) / cycle_length]
+        eviscerates_per_second = (bonus_eviscerates + extra_eviscerates_per_cycle) / cycle_length
         attacks_per_second['ambush'] = ambushes_from_vanish
 
         if self.talents.shadow_dance:
@@ -1454,12 +1601,13 @@ class AldrianasRogueDamageCalculator(RogueDamageCalculator):
 
             attacks_per_second['cp_builder'] -= shadow_dance_replaced_cp_builders * shadow_dance_frequency
             attacks_per_second['ambush'] += shadow_dance_extra_ambushes * shadow_dance_frequency
-            attacks_per_second['eviscerate'][5] += shadow_dance_extra_eviscerates * shadow_dance_frequency
+            eviscerates_per_second += shadow_dance_extra_eviscerates * shadow_dance_frequency
 
             self.find_weakness_uptime += (10 + shadow_dance_duration - self.settings.response_time) * shadow_dance_frequency
         else:
             self.ambush_shadowstep_rate = 1
 
+        attacks_per_second['eviscerate'] = [0, 0, 0, 0, 0, eviscerates_per_second]
         attacks_per_second['rupture_ticks'] = (0, 0, 0, 0, 0, .5)
 
         total_mh_hits = attacks_per_second['mh_autoattack_hits'] + attacks_per_second['cp_builder'] + sum(attacks_per_second['eviscerate']) + attacks_per_second['ambush']
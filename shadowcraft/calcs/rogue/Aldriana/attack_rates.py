@@ -0,0 +1,151 @@
+class AttackRates(object):
+    # The attacks per second the *_attack_counts functions come up with, kept
+    # in a flat list with a fixed slot for each attack; finishers (and rupture
+    # ticks) hold a tuple of six rates in theirs, one per combo point count.
+    # It reads and writes like the dictionary it replaces - rates['rupture'],
+    # 'envenom' in rates, del rates['cp_builder'] - but is cheap to create,
+    # copy and compare on every pass of the solver.  Damaging procs aren't
+    # known in advance, so their rates live in a plain dictionary on the side.
+
+    __slots__ = ('values', 'procs')
+
+    scalar_attacks = (
+        'mh_autoattacks', 'oh_autoattacks', 'mh_autoattack_hits', 'oh_autoattack_hits',
+        'mutilate', 'backstab', 'hemorrhage', 'sinister_strike', 'revealing_strike', 'ambush', 'cp_builder',
+        'main_gauche', 'mh_killing_spree', 'oh_killing_spree',
+        'rupture', 'garrote', 'garrote_ticks', 'hemorrhage_ticks', 'venomous_wounds',
+        'instant_poison', 'deadly_poison', 'wound_poison')
+    finishers = ('envenom', 'eviscerate', 'rupture_ticks')
+
+    slot_order = scalar_attacks + finishers
+    size = len(slot_order)
+    index = dict([(name, slot) for slot, name in enumerate(slot_order)])
+    finisher_slots = range(len(scalar_attacks), size)
+
+    def __init__(self, values=None, procs=None):
+        if values is None:
+            values = [None] * self.size
+        if procs is None:
+            procs = {}
+        self.values = values
+        self.procs = procs
+
+    def copy(self):
+        return AttackRates(list(self.values), dict(self.procs))
+
+    def __getitem__(self, name):
+        try:
+            value = self.values[self.index[name]]
+        except KeyError:
+            return self.procs[name]
+        if value is None:
+            raise KeyError(name)
+        return value
+
+    def __setitem__(self, name, value):
+        try:
+            slot = self.index[name]
+        except KeyError:
+            self.procs[name] = value
+            return
+        if slot in self.finisher_slots:
+            value = tuple(value)
+            if len(value) != 6:
+                raise ValueError(name)
+        self.values[slot] = value
+
+    def __delitem__(self, name):
+        try:
+            slot = self.index[name]
+        except KeyError:
+            del self.procs[name]
+            return
+        if self.values[slot] is None:
+            raise KeyError(name)
+        self.values[slot] = None
+
+    def __contains__(self, name):
+        try:
+            return self.values[self.index[name]] is not None
+        except KeyError:
+            return name in self.procs
+
+    def setdefault(self, name, default):
+        if name not in self:
+            self[name] = default
+        return self[name]
+
+    def keys(self):
+        return [name for name, value in zip(self.slot_order, self.values) if value is not None] + self.procs.keys()
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def items(self):
+        return [(name, self[name]) for name in self.keys()]
+
+    def distance(self, other):
+        # The largest change in any attack's rate from other to self; procs
+        # are left out, as the solver compares rates before they're added.
+        # Attacks self has but other doesn't make the two infinitely far
+        # apart.
+        distance = 0
+        new_values = self.values
+        old_values = other.values
+        for slot in xrange(len(self.scalar_attacks)):
+            new = new_values[slot]
+            if new is not None:
+                old = old_values[slot]
+                if old is None:
+                    return float('inf')
+                difference = abs(new - old)
+                if difference > distance:
+                    distance = difference
+        for slot in self.finisher_slots:
+            new = new_values[slot]
+            if new is not None:
+                old = old_values[slot]
+                if old is None:
+                    return float('inf')
+                for a, b in zip(new, old):
+                    difference = abs(a - b)
+                    if difference > distance:
+                        distance = difference
+        return distance
+
+
+class TriggerVector(object):
+    # The attacks that can trigger a proc, compiled down to AttackRates slots
+    # so that working out how often they happen is a single pass over a short
+    # list.  Each trigger is an (attack, crit_key, condition) tuple: the rate
+    # of attack (summed over combo points, for finishers) counts, weighted by
+    # crit_rates[crit_key] if crit_key isn't None, as long as the condition
+    # attack has a rate.  Attacks with no rate are skipped.
+
+    __slots__ = ('terms',)
+
+    def __init__(self, triggers):
+        first_finisher_slot = len(AttackRates.scalar_attacks)
+        terms = []
+        for attack, crit_key, condition in triggers:
+            slot = AttackRates.index[attack]
+            terms.append((slot, AttackRates.index[condition], slot >= first_finisher_slot, crit_key))
+        self.terms = tuple(terms)
+
+    def __len__(self):
+        return len(self.terms)
+
+    def per_second(self, attack_rates, crit_rates):
+        values = attack_rates.values
+        triggers_per_second = 0
+        for slot, condition, is_finisher, crit_key in self.terms:
+            if values[condition] is None:
+                continue
+            rate = values[slot]
+            if is_finisher:
+                rate = sum(rate)
+            if crit_key is None:
+                triggers_per_second += rate
+            else:
+                triggers_per_second += rate * crit_rates[crit_key]
+        return triggers_per_second
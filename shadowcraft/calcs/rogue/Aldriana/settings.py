@@ -1,7 +1,9 @@
+from shadowcraft.core import exceptions
+
 class Settings(object):
     # Settings object for AldrianasRogueDamageCalculator.
 
-    def __init__(self, cycle, time_in_execute_range=.35, tricks_on_cooldown=True, response_time=.5, mh_poison='ip', oh_poison='dp', duration=300):
+    def __init__(self, cycle, time_in_execute_range=.35, tricks_on_cooldown=True, response_time=.5, mh_poison='ip', oh_poison='dp', duration=300, solver='plain', warm_start=False):
         self.cycle = cycle
         self.time_in_execute_range = time_in_execute_range
         self.tricks_on_cooldown = tricks_on_cooldown
@@ -9,6 +11,20 @@ class Settings(object):
         self.mh_poison = mh_poison
         self.oh_poison = oh_poison
         self.duration = duration
+        self.solver = solver # Fixed point solver used to converge proc uptimes: 'plain', 'aitken' or 'anderson'.
+        self.warm_start = warm_start # Seed each solve from the last converged one; speeds up EP and rankings at the cost of tiny (~1e-9) differences in results.
+
+    def canonical_form(self):
+        options = [(name, value) for name, value in vars(self).items() if name != 'cycle']
+        return (self.cycle.canonical_form(), tuple(sorted(options)))
+
+    def wire_form(self):
+        return self.canonical_form()
+
+    @classmethod
+    def from_wire_form(cls, form):
+        cycle_form, options = form
+        return cls(Cycle.from_wire_form(cycle_form), **dict(options))
 
 
 class Cycle(object):
@@ -21,6 +37,18 @@ class Cycle(object):
     # you have an appropriate cycle object to go with your talent trees, etc.
     _cycle_type = ''
 
+    def canonical_form(self):
+        return (self._cycle_type, tuple(sorted(vars(self).items())))
+
+    @classmethod
+    def from_wire_form(cls, form):
+        # Builds a cycle of whichever type form (a canonical form) is of.
+        cycle_type, options = form
+        for cycle_class in cls.__subclasses__():
+            if cycle_class._cycle_type == cycle_type:
+                return cycle_class(**dict(options))
+        raise exceptions.InvalidInputException(_('Unknown cycle type {cycle_type}').format(cycle_type=cycle_type))
+
 
 class AssassinationCycle(Cycle):
     _cycle_type = 'assassination'
@@ -0,0 +1,1019 @@
+import collections
+import copy
+import heapq
+import itertools
+import math
+import random
+import time
+
+from shadowcraft.calcs.rogue.Aldriana import AldrianasRogueDamageCalculator
+from shadowcraft.calcs.rogue.Aldriana import InputNotModeledException
+
+# A discrete-event Monte Carlo simulator, as a second engine next to the
+# closed form model: it takes the same inputs and reads the same per-ability
+# damage functions, constants and settings, but plays fights out attack by
+# attack instead of solving for average rates.  Heroism windows, proc stacks,
+# internal cooldowns, combo points carried over between finishers, energy
+# capping and the execute phase all happen as they would in a fight, so its
+# results are there to check the formulas against and to cover what they
+# can't model.  Racial and on-use stat boosts are still averaged, as in the
+# model.
+#
+# Fights are seeded from the simulator's seed and their index, so the same
+# inputs always give the same results, and two calculators with the same seed
+# play out the same random numbers, each kind of decision (a weapon's swings,
+# a proc, an ability's crits) drawing from a stream of its own, so that
+# fights stay paired when a change in stats has one of them come up more
+# often (which keeps EP differences from drowning in noise).
+#
+#   calculator = RogueSimulator(stats, talents, glyphs, buffs, race, settings, iterations=10000, seed=1)
+#   calculator.get_dps()
+#
+# The rotation is the model's: ruptures go up once a builder has been used
+# since the last finisher (or at the minimum combo points, if it's not
+# prioritized), and at the minimum combo points we envenom, unless rupture
+# would drop before we could afford another builder, when we hold the
+# finisher for it.  Vanish and shadowmeld come off cooldown at a random
+# point in their first cooldown each fight, so a fight averages duration /
+# cooldown of them as the model does; they don't cut a garrote short, and
+# only vanish opens an overkill window.
+#
+# Against the model, total dps comes out within a couple of percent and each
+# source within 5%, bar mutilate, which we press 4-6% more often (the model
+# averages energy over the whole cycle), and garrote, which comes out a few
+# percent low as the fight's end cuts off the last one's ticks.
+#
+# A fight plays out some 1700 events and takes 6 to 10ms, so a run of 10000
+# takes one to two minutes on one core, not the seconds one would like;
+# simulate can spread the fights over a process pool.  Only assassination is
+# simulated for now.
+
+
+class Hand(object):
+    # A weapon, with what its swings need, the chances of its hits landing
+    # an instant poison, without and with envenom up, and the procs off the
+    # attacks landed with it, listed by attack (named as in the model's proc
+    # triggers), with those off its swings picked out again as
+    # autoattack_triggers.  Its swings and poisons draw from streams of
+    # their own.
+    __slots__ = ('name', 'speed', 'hit_chance', 'autoattack', 'poison_chances', 'triggers', 'autoattack_triggers', 'swing_roll', 'poison_roll')
+
+    def __init__(self, name, speed, hit_chance, poison_chances):
+        self.name = name
+        self.speed = speed
+        self.hit_chance = hit_chance
+        self.autoattack = name + '_autoattack'
+        self.poison_chances = poison_chances
+        self.triggers = {}
+
+
+class Buff(object):
+    # A proc: its stacks of value in stat, if it's a stat proc, or the hit
+    # it does, if it's a damage one.  It can't proc again before ready (its
+    # internal cooldown).  Refreshing a buff only moves expires: the one
+    # expiry event it has queued checks whether it's still due.
+    __slots__ = ('name', 'stat', 'value', 'duration', 'max_stacks', 'can_crit', 'icd', 'stacks', 'ready', 'expires')
+
+    def __init__(self, proc):
+        self.name = proc.proc_name
+        self.stat = proc.stat
+        self.value = proc.value
+        self.duration = proc.duration
+        self.max_stacks = proc.max_stacks
+        self.can_crit = proc.can_crit
+        self.icd = proc.icd or 0
+        self.reset()
+
+    def reset(self):
+        self.stacks = 0
+        self.ready = 0.
+        self.expires = 0.
+
+
+class Trigger(object):
+    # One way a buff can proc: at rate off the attacks it's listed under,
+    # crits only if crit_only, drawing from a stream of its own.
+    __slots__ = ('buff', 'rate', 'crit_only', 'roll')
+
+    def __init__(self, buff, rate, crit_only):
+        self.buff = buff
+        self.rate = rate
+        self.crit_only = crit_only
+
+
+class RogueSimulator(AldrianasRogueDamageCalculator):
+    def __init__(self, stats, talents, glyphs, buffs, race, settings=None, level=85, iterations=1000, seed=0):
+        super(RogueSimulator, self).__init__(stats, talents, glyphs, buffs, race, settings, level)
+        self.iterations = iterations
+        self.seed = seed
+
+    def canonical_form(self):
+        return (super(RogueSimulator, self).canonical_form(), self.iterations, self.seed)
+
+    def wire_form(self):
+        return (super(RogueSimulator, self).wire_form(), self.iterations, self.seed)
+
+    @classmethod
+    def from_wire_form(cls, form):
+        calculator_form, iterations, seed = form
+        calculator = super(RogueSimulator, cls).from_wire_form(calculator_form)
+        calculator.iterations = iterations
+        calculator.seed = seed
+        return calculator
+
+    def get_dps_breakdown(self):
+        fights = self.simulate()
+        breakdown = {}
+        for fight in fights:
+            for source, dps in fight.iteritems():
+                breakdown[source] = breakdown.get(source, 0) + dps
+        for source in breakdown:
+            breakdown[source] /= len(fights)
+        return breakdown
+
+    def get_dps_statistics(self):
+        # The mean dps over our fights and its standard error.
+        dps = [sum(fight.values()) for fight in self.simulate()]
+        mean = sum(dps) / len(dps)
+        if len(dps) == 1:
+            return mean, 0.
+        variance = sum([(x - mean) ** 2 for x in dps]) / (len(dps) - 1)
+        return mean, math.sqrt(variance / len(dps))
+
+    def get_dps_gradient(self, ep_stats):
+        raise InputNotModeledException(_('Simulated results cannot be differentiated; use finite difference EP instead.'))
+
+    # Simulated EP values stats over this much of each, rather than a single
+    # rating point, whose worth would be lost in the noise.
+    EP_AMOUNT = 100.
+
+    def get_ep(self, ep_stats=None, normalize_ep_stat=None, analytic=False, executor=None):
+        if analytic:
+            return super(RogueSimulator, self).get_ep(ep_stats, normalize_ep_stat, analytic, executor)
+        return self.get_simulated_ep(ep_stats, normalize_ep_stat, executor=executor)[0]
+
+    def get_simulated_ep(self, ep_stats=None, normalize_ep_stat=None, tolerance=.1, confidence=.95, batch_size=None, max_iterations=None, max_seconds=60, executor=None):
+        # EP from paired simulations: the baseline and each stat's
+        # perturbation play out the same fights, seed for seed, so most of
+        # the noise cancels out of their differences.  Fights are added
+        # batch_size (by default, self.iterations or EP_BATCH_SIZE, if
+        # fewer) at a time until the confidence interval of every EP value
+        # is within tolerance of it either side, max_iterations (by default,
+        # four times self.iterations) have been played, or a batch finishes
+        # more than max_seconds after we started (None for no limit).
+        # Returns the EP values and a dictionary of their (low, high)
+        # confidence intervals.
+        #
+        # Each batch plays batch_size fights for the baseline, the
+        # normalizing stat and every one of ep_stats: with the default
+        # stats, a batch of 250 is some 2750 fights, 20 to 30 seconds on one
+        # core, after which agility and crit are typically some .08 either
+        # side and haste .15; halving that takes four times as many fights.
+        # So by default three batches or so meet the tolerance, in about a
+        # minute: not get_ep's wall time, but as close as this gets to it
+        # without giving up precision.  How many fights fit in max_seconds
+        # depends on the machine, so pass None for results that don't.
+        # Pass an executor to spread the fights over a process pool.
+        if not normalize_ep_stat:
+            normalize_ep_stat = self.normalize_ep_stat
+        if not ep_stats:
+            ep_stats = self.default_ep_stats
+        if batch_size is None:
+            batch_size = min(self.iterations, self.EP_BATCH_SIZE)
+        if max_iterations is None:
+            max_iterations = 4 * self.iterations
+        if batch_size < 2 or max_iterations < 2:
+            raise InputNotModeledException(_('At least two fights must be simulated'))
+        if not 0 < confidence < 1:
+            raise InputNotModeledException(_('The confidence level must be between 0 and 1'))
+        z = normal_quantile(.5 + confidence / 2.)
+
+        perturbations = [('baseline',), ('stat', normalize_ep_stat, self.EP_AMOUNT)]
+        perturbations.extend([('stat', stat, self.EP_AMOUNT) for stat in ep_stats])
+        snapshot = None
+        if executor is not None:
+            snapshot = self.snapshot()
+        fights = [[] for perturbation in perturbations]
+        started = time.time()
+        start = 0
+        while start < max_iterations:
+            stop = min(start + batch_size, max_iterations)
+            for perturbation_fights, batch in zip(fights, self.get_perturbed_fights(perturbations, start, stop, snapshot, executor)):
+                perturbation_fights.extend(batch)
+            start = stop
+            ep_values, half_widths = paired_ratios(fights[0], fights[1], fights[2:], z)
+            if max(half_widths) <= tolerance:
+                break
+            if max_seconds is not None and time.time() - started > max_seconds:
+                break
+
+        intervals = {}
+        for stat, ep, half_width in zip(ep_stats, ep_values, half_widths):
+            intervals[stat] = (ep - half_width, ep + half_width)
+        return dict(zip(ep_stats, ep_values)), intervals
+
+    def get_perturbed_fights(self, perturbations, start, stop, snapshot=None, executor=None):
+        # Returns the dps of fights start to stop under each of the
+        # perturbations; with an executor, they're played out over it, on
+        # copies of snapshot (by default, one taken now).
+        if executor is None:
+            return [self.perturbed_fights(perturbation, start, stop) for perturbation in perturbations]
+        if snapshot is None:
+            snapshot = self.snapshot()
+        tasks = []
+        for perturbation in perturbations:
+            for task_start in xrange(start, stop, self.FIGHTS_PER_TASK):
+                tasks.append((snapshot, perturbation, task_start, min(task_start + self.FIGHTS_PER_TASK, stop)))
+        results = iter(executor.map(_perturbed_fights_task, tasks))
+        tasks_per_perturbation = len(tasks) / len(perturbations)
+        fights = []
+        for perturbation in perturbations:
+            perturbation_fights = []
+            for i in xrange(tasks_per_perturbation):
+                perturbation_fights.extend(next(results))
+            fights.append(perturbation_fights)
+        return fights
+
+    def perturbed_fights(self, perturbation, start, stop):
+        self.apply_perturbation(perturbation)
+        try:
+            return [sum(fight.values()) for fight in self.run_fights(start, stop)]
+        finally:
+            self.revert_perturbation(perturbation)
+
+    # The most fights get_simulated_ep adds at a time, by default.
+    EP_BATCH_SIZE = 250
+
+    # Fights handed to each task when simulating over an executor.
+    FIGHTS_PER_TASK = 250
+
+    def simulate(self, iterations=None, executor=None):
+        # Returns a dictionary of dps by source for each of iterations (by
+        # default, self.iterations) fights.  If an executor is given, the
+        # fights are spread over it; every fight has its own seed, so the
+        # results are the same either way.
+        if iterations is None:
+            iterations = self.iterations
+        if iterations < 1:
+            raise InputNotModeledException(_('At least one fight must be simulated'))
+        if executor is None:
+            return self.run_fights(0, iterations)
+        snapshot = self.snapshot()
+        tasks = [(snapshot, start, min(start + self.FIGHTS_PER_TASK, iterations)) for start in xrange(0, iterations, self.FIGHTS_PER_TASK)]
+        fights = []
+        for chunk in executor.map(_run_fights_task, tasks):
+            fights.extend(chunk)
+        return fights
+
+    def run_fights(self, start, stop):
+        # Plays out fights start to stop (not included).
+        if not self.talents.is_assassination_rogue():
+            raise InputNotModeledException(_('Only assassination can be simulated'))
+        self.init_assassination()
+        fight = AssassinationFight(self)
+        return [fight.run(self.seed * 1000003 + i) for i in xrange(start, stop)]
+
+    def damage_coefficients(self, damage_function, *args, **kwargs):
+        # Every damage function is linear in ap and mastery rating apart from
+        # their product (through potent poisons), and crits for a fixed
+        # multiple of its hit; the returned (a, b, c, d, crit_multiplier)
+        # give a non-crit hit of a + b * ap + (c + d * ap) * mastery.  With
+        # mastery=False, the function doesn't take one.
+        mastery = kwargs.pop('mastery', True)
+        def hit(ap, rating):
+            if mastery:
+                return damage_function(ap, *args, mastery=rating, **kwargs)
+            return damage_function(ap, *args, **kwargs)
+        scale = 1000.
+        f00 = hit(0., 0.)[0]
+        f10 = hit(scale, 0.)[0]
+        f01 = hit(0., scale)[0]
+        f11, crit = hit(scale, scale)
+        return (f00, (f10 - f00) / scale, (f01 - f00) / scale, (f11 - f10 - f01 + f00) / scale ** 2, crit / f11)
+
+
+def _run_fights_task(task):
+    snapshot, start, stop = task
+    return snapshot.calculator().run_fights(start, stop)
+
+def _perturbed_fights_task(task):
+    snapshot, perturbation, start, stop = task
+    return snapshot.calculator().perturbed_fights(perturbation, start, stop)
+
+def normal_quantile(p):
+    # The x a standard normal variable falls below with probability p, to
+    # within 5e-4 (Abramowitz and Stegun 26.2.23), which is plenty for the
+    # width of a confidence interval.
+    if p < .5:
+        return -normal_quantile(1 - p)
+    t = math.sqrt(-2 * math.log(1 - p))
+    return t - (2.515517 + .802853 * t + .010328 * t ** 2) / (1 + 1.432788 * t + .189269 * t ** 2 + .001308 * t ** 3)
+
+def paired_ratios(baseline, normalize, samples, z):
+    # For each of samples (lists of results paired with baseline's), the
+    # absolute ratio of its mean difference from baseline to normalize's,
+    # and the half width of its confidence interval at z standard errors,
+    # from the delta method.
+    count = len(baseline)
+    normalize_differences = [x - base for x, base in zip(normalize, baseline)]
+    normalize_mean = sum(normalize_differences) / count
+    if normalize_mean == 0:
+        raise InputNotModeledException(_('The normalizing stat makes no difference to the simulated dps'))
+    ratios = []
+    half_widths = []
+    for sample in samples:
+        differences = [x - base for x, base in zip(sample, baseline)]
+        ratio = sum(differences) / count / normalize_mean
+        variance = sum([(d - ratio * n) ** 2 for d, n in zip(differences, normalize_differences)]) / (count - 1)
+        ratios.append(abs(ratio))
+        half_widths.append(z * math.sqrt(variance / count) / abs(normalize_mean))
+    return ratios, half_widths
+
+
+class AssassinationFight(object):
+    # Plays out fights for a RogueSimulator, which must have been through
+    # init_assassination: everything that stays the same from fight to fight
+    # is worked out here, once, and run plays a fight from a given seed.
+
+    MAX_ENERGY = 100
+    GCD = 1.
+    MISS_REFUND = .8
+    OVERKILL_DURATION = 20
+    OVERKILL_ENERGY_REGEN = 3
+    VENDETTA_COOLDOWN = 120
+    VENDETTA_MULTIPLIER = 1.2
+    HEROISM_DURATION = 40
+    HEROISM_COOLDOWN = 600
+    HEROISM_MULTIPLIER = 1.3
+    ENVENOM_IP_MULTIPLIER = 1.5
+    ENVENOM_DP_BONUS = .15
+    # Energy we treat as close enough to what an ability costs, so floating
+    # point error can't have us wait forever.
+    ENERGY_TOLERANCE = 1e-6
+
+    def __init__(self, calculator):
+        c = calculator
+        self.calculator = c
+        settings = c.settings
+        cycle = settings.cycle
+        talents = c.talents
+        gear_buffs = c.stats.gear_buffs
+        c.setup_unique_procs()
+
+        self.duration = settings.duration
+        self.execute_start = settings.duration * (1 - settings.time_in_execute_range)
+
+        # Hit and crit.
+        self.strike_hit = c.strike_hit_chance
+        self.spell_hit = c.spell_hit_chance()
+        self.glance_rate = c.GLANCE_RATE
+        self.glance_multiplier = c.GLANCE_MULTIPLIER
+        self.mutilate_crit_bonus = gear_buffs.rogue_t11_2pc_crit_bonus() + .05 * talents.puncturing_wounds
+        self.backstab_crit_bonus = gear_buffs.rogue_t11_2pc_crit_bonus() + .1 * talents.puncturing_wounds
+        self.burning_wounds = gear_buffs.rogue_t12_2pc_damage_bonus()
+
+        # Stats, as compute_damage builds them.  Crit chances and haste are
+        # linear in the stats they come from, which saves us calling back
+        # into the calculator every time a proc changes them.
+        self.base_stats = dict(c.base_stats)
+        scale = 1000.
+        self.melee_crit_base = c.melee_crit_rate(agi=0, crit=0)
+        self.melee_crit_per_agi = (c.melee_crit_rate(agi=scale, crit=0) - self.melee_crit_base) / scale
+        self.melee_crit_per_rating = (c.melee_crit_rate(agi=0, crit=scale) - self.melee_crit_base) / scale
+        self.spell_crit_base = c.spell_crit_rate(crit=0)
+        self.spell_crit_per_rating = (c.spell_crit_rate(crit=scale) - self.spell_crit_base) / scale
+        self.haste_per_rating = (c.stats.get_haste_multiplier_from_rating(scale) - 1) / scale
+        self.agi_multiplier = c.agi_multiplier
+        self.t12_multiplier = c.get_4pc_t12_multiplier()
+        self.base_strength = c.base_strength
+        self.ap_multiplier = c.buffs.attack_power_multiplier() * (1 + .03 * talents.savage_combat)
+        # Heroism is played out rather than averaged in.
+        self.speed_multiplier = c.base_speed_multiplier / c.get_heroism_haste_multiplier()
+        self.heroism = bool(c.buffs.short_term_haste_buff)
+
+        # Energy: cold blood's energy comes when it's used.
+        self.bonus_energy_regen = c.bonus_energy_regen
+        if talents.cold_blood:
+            self.bonus_energy_regen -= 25. / (120 + settings.response_time)
+        cost_multiplier = gear_buffs.rogue_t13_2pc_cost_multiplier()
+        self.costs = {
+            'mutilate': (60 - 5 * c.glyphs.mutilate) * cost_multiplier,
+            'backstab': (60 - 15 * talents.murderous_intent) * cost_multiplier,
+            'rupture': 25 * cost_multiplier,
+            'envenom': 35 * cost_multiplier,
+            'garrote': 45 * cost_multiplier
+        }
+        self.backstab_glyph_refund = 5 * c.glyphs.backstab
+        self.relentless_strikes_chance = c.relentless_strikes_energy_return_per_cp / 25.
+        self.ruthlessness_chance = .2 * talents.ruthlessness
+        self.seal_fate_chance = .5 * talents.seal_fate
+        self.venomous_wounds_chance = .3 * talents.venomous_wounds
+        self.overkill = bool(talents.overkill)
+
+        # Cycle and cooldowns.
+        self.min_envenom_size = (cycle.min_envenom_size_mutilate, cycle.min_envenom_size_backstab)
+        self.prioritize_rupture_uptime = (cycle.prioritize_rupture_uptime_mutilate, cycle.prioritize_rupture_uptime_backstab)
+        self.rupture_ticks = 3 + 2 * c.glyphs.rupture
+        # Vanish, and shadowmeld if we have it, put us back in stealth for a
+        # garrote, every so many seconds; as in the model, only vanish (and
+        # the opener) brings overkill with it.
+        self.stealth_cooldowns = [(180. + settings.response_time - 30 * talents.elusiveness, True)]
+        if c.race.shadowmeld:
+            self.stealth_cooldowns.append((120. + settings.response_time, False))
+        self.cold_blood_cooldown = None
+        if talents.cold_blood:
+            self.cold_blood_cooldown = 120 + settings.response_time
+        self.vendetta_duration = 0
+        if talents.vendetta:
+            self.vendetta_duration = 30 * (1 + c.glyphs.vendetta * .20) + gear_buffs.rogue_t13_4pc * 9
+
+        # Poisons: instant poison procs off the hits of the weapon it's on at
+        # a rate going by its speed, and off the deadly poison weapon's once
+        # deadly poison is stacked up; envenom raises both rates.
+        ip_hand = 'mh' if settings.mh_poison == 'ip' else 'oh'
+        ip_rate = .3 * getattr(c.stats, ip_hand).speed / 1.4
+        dp_rate = .5
+        for hand in ('mh', 'oh'):
+            if hand == ip_hand:
+                rates = (ip_rate, ip_rate * self.ENVENOM_IP_MULTIPLIER)
+            else:
+                rates = (dp_rate, dp_rate + self.ENVENOM_DP_BONUS)
+            weapon = getattr(c.stats, hand)
+            poison_chances = tuple([rate * self.spell_hit for rate in rates])
+            setattr(self, hand, Hand(hand, weapon.speed, getattr(c, 'dual_wield_%s_hit_chance' % hand)(), poison_chances))
+
+        # Damage, by source: a fight works out what each would hit for
+        # whenever a proc changes our stats, rather than on every hit.
+        self.coefficients = {
+            'mh_autoattack': c.damage_coefficients(c.mh_damage, mastery=False),
+            'oh_autoattack': c.damage_coefficients(c.oh_damage, mastery=False),
+            'mh_mutilate': c.damage_coefficients(c.mh_mutilate_damage, mastery=False),
+            'oh_mutilate': c.damage_coefficients(c.oh_mutilate_damage, mastery=False),
+            'backstab': c.damage_coefficients(c.backstab_damage, mastery=False),
+            'garrote': c.damage_coefficients(c.garrote_tick_damage, mastery=False),
+            'venomous_wounds': c.damage_coefficients(c.venomous_wounds_damage),
+            'instant_poison': c.damage_coefficients(c.instant_poison_damage),
+            'deadly_poison': c.damage_coefficients(c.deadly_poison_tick_damage)
+        }
+        for cp in xrange(1, 6):
+            self.coefficients[('rupture', cp)] = c.damage_coefficients(c.rupture_tick_damage, cp, mastery=False)
+            self.coefficients[('envenom', cp)] = c.damage_coefficients(c.envenom_damage, cp)
+        self.crit_multipliers = dict([(source, coefficients[4]) for source, coefficients in self.coefficients.iteritems()])
+        self.melee_crit_multiplier = c.crit_damage_modifiers()
+        self.spell_crit_multiplier = c.crit_damage_modifiers(is_spell=True)
+        self.physical_multiplier = c.raid_settings_modifiers('physical')
+        self.spell_multiplier = c.raid_settings_modifiers('spell')
+
+        self.setup_procs()
+        self.setup_on_use()
+
+        # Sources whose landing and crits are rolled for in streams of their
+        # own; see run.
+        abilities = ['mutilate', 'backstab', 'envenom', 'rupture', 'garrote']
+        damage_procs = [buff.name for buff in self.buffs if buff.stat in ('spell_damage', 'physical_damage')]
+        damage_procs.extend([item[0] for item in self.on_use])
+        self.hit_roll_sources = abilities + ['venomous_wounds'] + damage_procs
+        self.crit_roll_sources = abilities + ['instant_poison', 'deadly_poison', 'venomous_wounds'] + damage_procs
+        # The generators they draw from; see setup_rolls.
+        self.roll_sources = []
+
+    def setup_procs(self):
+        # Triggers are listed by attack under the hand they're landed with,
+        # or in spell_triggers for spells and ticks.
+        c = self.calculator
+        self.buffs = []
+        self.triggers = []
+        self.spell_triggers = {}
+        self.deadly_scheme = None
+        self.deadly_scheme_buff = None
+
+        procs = []
+        for proc_name in c.get_modeled_procs():
+            proc = getattr(c.stats.procs, proc_name)
+            if proc_name == 'rogue_t11_4pc':
+                self.deadly_scheme = proc
+            elif proc.stat == 'extra_weapon_damage':
+                # Doesn't do anything in the model either.
+                continue
+            elif proc.stat in c.MODELED_PROC_STATS:
+                procs.append(proc)
+            else:
+                raise InputNotModeledException(_('The simulator does not model {proc}').format(proc=proc_name))
+        for hand in ('mh', 'oh'):
+            for enchant in ('landslide', 'hurricane', 'avalanche'):
+                proc = getattr(getattr(c.stats, hand), enchant)
+                if proc:
+                    proc = copy.copy(proc)
+                    setattr(proc, hand + '_only', True)
+                    procs.append(proc)
+                    if enchant in ('hurricane', 'avalanche'):
+                        # Their spell components, with a buff of their own.
+                        spell_component = copy.copy(proc)
+                        delattr(spell_component, hand + '_only')
+                        spell_component.behaviour_toggle = 'spell'
+                        procs.append(spell_component)
+
+        for proc in procs:
+            buff = Buff(proc)
+            self.buffs.append(buff)
+            self.add_triggers(buff, proc)
+        if self.deadly_scheme:
+            self.deadly_scheme_buff = Buff(self.deadly_scheme)
+            self.buffs.append(self.deadly_scheme_buff)
+            self.add_triggers(self.deadly_scheme_buff, self.deadly_scheme)
+        for hand in (self.mh, self.oh):
+            hand.autoattack_triggers = hand.triggers.get('autoattack')
+
+    # The model's names for the attacks procs trigger off, as we emit them.
+    ATTACK_NAMES = {
+        'mh_autoattacks': 'autoattack',
+        'mh_autoattack_hits': 'autoattack',
+        'oh_autoattacks': 'autoattack',
+        'oh_autoattack_hits': 'autoattack'
+    }
+
+    def add_triggers(self, buff, proc):
+        c = self.calculator
+        if getattr(proc, 'mh_only', False):
+            hands = ('mh',)
+        elif getattr(proc, 'oh_only', False):
+            hands = ('oh',)
+        else:
+            hands = ('mh', 'oh', 'other')
+
+        for hand in hands:
+            if hand == 'mh':
+                triggers = c.get_mh_proc_triggers(proc)
+                rate = proc.proc_rate(c.stats.mh.speed)
+            elif hand == 'oh':
+                triggers = c.get_oh_proc_triggers(proc)
+                rate = proc.proc_rate(c.stats.oh.speed)
+            elif proc.is_ppm():
+                # Spells don't proc ppm effects.
+                continue
+            else:
+                triggers = c.get_other_proc_triggers(proc)
+                rate = proc.proc_rate()
+            if hand == 'other':
+                attack_triggers = self.spell_triggers
+            else:
+                attack_triggers = getattr(self, hand).triggers
+            for attack, crit_key, condition in triggers:
+                attack = self.ATTACK_NAMES.get(attack, attack)
+                trigger = Trigger(buff, rate, crit_key is not None)
+                self.triggers.append(trigger)
+                attack_triggers.setdefault(attack, []).append(trigger)
+
+    def setup_on_use(self):
+        # Damage on use effects are used on cooldown.
+        c = self.calculator
+        self.on_use = []
+        for stat in ('spell_damage', 'physical_damage'):
+            for boost in c.stats.gear_buffs.get_all_activated_boosts_for_stat(stat):
+                self.on_use.append((boost['name'], stat, boost['value'], boost['cooldown'] + c.settings.response_time))
+        if c.race.rocket_barrage:
+            self.on_use.append(('Rocket Barrage', 'spell_damage', None, 120 + c.settings.response_time))
+
+    ###########################################################################
+    # Running a fight.
+    ###########################################################################
+
+    def run(self, seed):
+        # Plays out one fight, whose random numbers come from seed; returns
+        # its dps by source.
+        self.setup_rolls(seed)
+        self.queue = []
+        self.sequence = itertools.count()
+        self.now = 0.
+        self.damage_done = collections.defaultdict(float)
+        self.vendetta_multiplier = 1
+
+        self.bonus = {'agi': 0, 'ap': 0, 'crit': 0, 'haste': 0, 'mastery': 0}
+        for buff in self.buffs:
+            buff.reset()
+        self.damage = {}
+        self.heroism_active = False
+        self.envenom_until = -1.
+        self.deadly_scheme_until = -1.
+        self.overkill_until = -1.
+        self.cold_blood_ready = 0.
+        self.energy = self.MAX_ENERGY
+        self.energy_time = 0.
+        self.energy_regen = 0
+        self.haste_multiplier = None
+        self.plan = 0
+        self.waiting = False
+        self.cp = 0
+        self.built = False
+        self.rupture_up = False
+        self.rupture_ends = 0.
+        self.garrote_ends = 0.
+        self.bleeds = {'garrote': 0, 'rupture': 0}
+        # We open from stealth.
+        self.stealthed = True
+        self.stealth_overkill = True
+        self.update_stats()
+
+        if self.vendetta_duration:
+            self.schedule(0., self.start_vendetta)
+        for hand in (self.mh, self.oh):
+            self.schedule(0., self.swing, hand)
+        self.schedule(0., self.act, self.plan)
+        self.schedule(3., self.deadly_poison_tick)
+        # Each comes off cooldown at a point in its first cooldown that's
+        # different every fight, so a fight gets the model's duration /
+        # cooldown of them on average.
+        for cooldown in self.stealth_cooldowns:
+            self.schedule(self.stealth_roll() * cooldown[0], self.stealth, cooldown)
+        if self.heroism:
+            self.schedule(0., self.start_heroism)
+        for item in self.on_use:
+            self.schedule(0., self.use_item, item)
+
+        queue = self.queue
+        duration = self.duration
+        pop = heapq.heappop
+        while queue:
+            time, sequence, handler, data = pop(queue)
+            if time >= duration:
+                break
+            self.now = time
+            handler(data)
+
+        return dict([(source, damage / duration) for source, damage in self.damage_done.iteritems()])
+
+    def setup_rolls(self, seed):
+        # Every kind of random decision draws from a stream of its own, once
+        # per decision: each weapon's swings and poisons, each proc, each
+        # source's landing and its crits, and so on.  So when a change has
+        # one thing happen more or less often (a faster swing, say), the
+        # others still draw what they would have, and fights played out
+        # with and without the change stay paired.  The generators are kept
+        # from one fight to the next and just reseeded, which is a good deal
+        # cheaper than building them afresh.
+        streams = itertools.count()
+        def stream():
+            index = next(streams)
+            if index == len(self.roll_sources):
+                self.roll_sources.append(random.Random())
+            self.roll_sources[index].seed(seed * 1000003 + index)
+            return self.roll_sources[index].random
+        for hand in (self.mh, self.oh):
+            hand.swing_roll = stream()
+            hand.poison_roll = stream()
+        self.stealth_roll = stream()
+        self.seal_fate_roll = stream()
+        self.relentless_strikes_roll = stream()
+        self.ruthlessness_roll = stream()
+        self.venomous_wounds_roll = stream()
+        self.hit_rolls = dict([(source, stream()) for source in self.hit_roll_sources])
+        self.crit_rolls = dict([(source, stream()) for source in self.crit_roll_sources])
+        for trigger in self.triggers:
+            trigger.roll = stream()
+
+    def schedule(self, time, handler, data=None):
+        # Has handler(data) called at time; events are queued as (time,
+        # sequence number, handler, data), so ties go in the order they
+        # were scheduled.
+        heapq.heappush(self.queue, (time, next(self.sequence), handler, data))
+
+    def update_stats(self):
+        # Works out everything that depends on our stats, after a proc or
+        # heroism changes them.
+        base = self.base_stats
+        bonus = self.bonus
+        agi = (base['agi'] + bonus['agi']) * self.agi_multiplier
+        crit = (base['crit'] + bonus['crit']) * self.t12_multiplier
+        haste = (base['haste'] + bonus['haste']) * self.t12_multiplier
+        self.mastery = mastery = (base['mastery'] + bonus['mastery']) * self.t12_multiplier
+        self.ap = ap = (base['ap'] + bonus['ap'] + 2 * agi + self.base_strength) * self.ap_multiplier
+        self.melee_crit = self.melee_crit_base + self.melee_crit_per_agi * agi + self.melee_crit_per_rating * crit
+        self.spell_crit = self.spell_crit_base + self.spell_crit_per_rating * crit
+        damage = self.damage
+        for source, (a, b, c, d, crit_multiplier) in self.coefficients.iteritems():
+            damage[source] = a + b * ap + (c + d * ap) * mastery
+        haste_multiplier = 1 + self.haste_per_rating * haste
+        self.attack_speed = self.speed_multiplier * haste_multiplier
+        if self.heroism_active:
+            self.attack_speed *= self.HEROISM_MULTIPLIER
+        if haste_multiplier != self.haste_multiplier:
+            self.haste_multiplier = haste_multiplier
+            self.update_energy_regen()
+
+    ###########################################################################
+    # Energy.
+    ###########################################################################
+
+    def sync_energy(self):
+        energy = self.energy + self.energy_regen * (self.now - self.energy_time)
+        self.energy = min(energy, self.MAX_ENERGY)
+        self.energy_time = self.now
+
+    def update_energy_regen(self):
+        self.sync_energy()
+        regen = 10
+        if self.now < self.overkill_until:
+            regen += self.OVERKILL_ENERGY_REGEN
+        self.energy_regen = regen * self.haste_multiplier + self.bonus_energy_regen
+        self.wake()
+
+    def gain_energy(self, energy):
+        self.sync_energy()
+        self.energy = min(self.energy + energy, self.MAX_ENERGY)
+        self.wake()
+
+    def wake(self):
+        # Whatever we were waiting for energy to do, rethink it now: the act
+        # we had queued is left to find it's out of date.
+        if self.waiting:
+            self.plan += 1
+            self.schedule(self.now, self.act, self.plan)
+
+    ###########################################################################
+    # Damage and procs.
+    ###########################################################################
+
+    def deal(self, source, damage):
+        self.damage_done[source] += damage * self.vendetta_multiplier
+
+    def strike(self, source, damage, crit_rate, crit_multiplier, burning_wounds=False):
+        # Deals damage, which crits at crit_rate; returns whether it did.
+        crit = self.crit_rolls[source]() < crit_rate
+        if crit:
+            damage *= crit_multiplier
+            if burning_wounds and self.burning_wounds:
+                self.deal('burning_wounds', damage * self.burning_wounds)
+        self.deal(source, damage)
+        return crit
+
+    def land(self, source, damage, crit, crit_multiplier, burning_wounds=False):
+        if crit:
+            damage *= crit_multiplier
+            if burning_wounds and self.burning_wounds:
+                self.deal('burning_wounds', damage * self.burning_wounds)
+        self.deal(source, damage)
+
+    def proc(self, triggers, crit=False):
+        # Rolls the procs an attack can trigger, given the triggers listed
+        # under it (None if there are none).
+        if triggers is None:
+            return
+        now = self.now
+        for trigger in triggers:
+            buff = trigger.buff
+            if (crit or not trigger.crit_only) and now >= buff.ready and trigger.roll() < trigger.rate:
+                buff.ready = now + buff.icd
+                self.fire(buff)
+
+    def fire(self, buff):
+        now = self.now
+        if buff is self.deadly_scheme_buff:
+            self.deadly_scheme_until = now + buff.duration
+        elif buff.stat == 'spell_damage':
+            if self.hit_rolls[buff.name]() < self.spell_hit:
+                crit_rate = self.spell_crit if buff.can_crit else 0
+                self.strike(buff.name, buff.value * self.spell_multiplier, crit_rate, self.spell_crit_multiplier)
+        elif buff.stat == 'physical_damage':
+            if self.hit_rolls[buff.name]() < self.strike_hit:
+                crit_rate = self.melee_crit if buff.can_crit else 0
+                self.strike(buff.name, buff.value * self.physical_multiplier, crit_rate, self.melee_crit_multiplier)
+        else:
+            buff.expires = now + buff.duration
+            if buff.stacks == 0:
+                self.schedule(buff.expires, self.expire, buff)
+            if buff.stacks < buff.max_stacks:
+                buff.stacks += 1
+                self.bonus[buff.stat] += buff.value
+                self.update_stats()
+
+    def expire(self, buff):
+        if buff.expires > self.now:
+            self.schedule(buff.expires, self.expire, buff)
+        else:
+            self.bonus[buff.stat] -= buff.value * buff.stacks
+            buff.stacks = 0
+            self.update_stats()
+
+    def poison(self, hand):
+        # Instant poison off a hit landed with hand.
+        if hand.poison_roll() < hand.poison_chances[self.now < self.envenom_until]:
+            crit = self.strike('instant_poison', self.damage['instant_poison'], self.spell_crit, self.crit_multipliers['instant_poison'])
+            self.proc(self.spell_triggers.get('instant_poison'), crit)
+
+    def venomous_wounds(self):
+        if self.venomous_wounds_roll() < self.venomous_wounds_chance:
+            self.gain_energy(10)
+            if self.hit_rolls['venomous_wounds']() < self.spell_hit:
+                crit = self.strike('venomous_wounds', self.damage['venomous_wounds'], self.spell_crit, self.crit_multipliers['venomous_wounds'])
+                self.proc(self.spell_triggers.get('venomous_wounds'), crit)
+
+    ###########################################################################
+    # Events.
+    ###########################################################################
+
+    def swing(self, hand):
+        hit_chance = hand.hit_chance
+        roll = hand.swing_roll()
+        if roll < hit_chance:
+            damage = self.damage[hand.autoattack]
+            crit = False
+            if roll < self.glance_rate:
+                damage *= self.glance_multiplier
+            elif roll < self.glance_rate + min(self.melee_crit, hit_chance - self.glance_rate):
+                crit = True
+                damage *= self.crit_multipliers[hand.autoattack]
+                if self.burning_wounds:
+                    self.deal('burning_wounds', damage * self.burning_wounds)
+            # Swings are most of a fight's events, so this spells out deal()
+            # and schedule().
+            self.damage_done['autoattack'] += damage * self.vendetta_multiplier
+            if hand.autoattack_triggers is not None:
+                self.proc(hand.autoattack_triggers, crit)
+            self.poison(hand)
+        heapq.heappush(self.queue, (self.now + hand.speed / self.attack_speed, next(self.sequence), self.swing, hand))
+
+    def act(self, plan):
+        # Picks our next move and makes it, or waits for the energy to.
+        if plan != self.plan:
+            return
+        self.waiting = False
+        execute = self.now >= self.execute_start
+        min_envenom_size = self.min_envenom_size[execute]
+        builder = 'backstab' if execute else 'mutilate'
+        self.sync_energy()
+        if self.stealthed:
+            ability = 'garrote'
+        elif not self.rupture_up and self.built and (self.prioritize_rupture_uptime[execute] or self.cp >= min_envenom_size):
+            ability = 'rupture'
+        elif self.cp >= min_envenom_size:
+            if self.rupture_up and self.rupture_ends < self.now + (self.costs['envenom'] + self.costs[builder] - self.energy) / self.energy_regen:
+                self.waiting = True
+                return
+            ability = 'envenom'
+        else:
+            ability = builder
+
+        cost = self.costs[ability]
+        if self.energy < cost - self.ENERGY_TOLERANCE:
+            self.waiting = True
+            self.schedule(self.now + (cost - self.energy) / self.energy_regen, self.act, plan)
+            return
+
+        self.energy -= cost
+        if ability == 'garrote':
+            self.open()
+        if self.hit_rolls[ability]() < self.strike_hit:
+            getattr(self, ability)()
+        else:
+            self.energy += cost * self.MISS_REFUND
+        self.schedule(self.now + self.GCD, self.act, self.plan)
+
+    def add_cp(self, cp, builder=True):
+        self.cp = min(self.cp + cp, 5)
+        self.built = self.built or builder
+
+    def finish(self):
+        # Spends our combo points on a finisher that landed.
+        cp = self.cp
+        self.cp = 0
+        self.built = False
+        if self.relentless_strikes_roll() < cp * self.relentless_strikes_chance:
+            self.gain_energy(25)
+        if self.ruthlessness_roll() < self.ruthlessness_chance:
+            self.cp = 1
+        return cp
+
+    def mutilate(self):
+        crit_rate = min(self.melee_crit + self.mutilate_crit_bonus, 1)
+        roll = self.crit_rolls['mutilate']
+        crits = (roll() < crit_rate, roll() < crit_rate)
+        cp = 2
+        for hand, crit in zip((self.mh, self.oh), crits):
+            source = hand.name + '_mutilate'
+            # Two crits at once only leave the one burning wound.
+            self.land('mutilate', self.damage[source], crit, self.crit_multipliers[source], hand is self.oh or not crits[1])
+            if crit and self.seal_fate_roll() < self.seal_fate_chance:
+                cp = 3
+        self.add_cp(cp)
+        for hand, crit in zip((self.mh, self.oh), crits):
+            self.proc(hand.triggers.get('mutilate'), crit)
+            self.poison(hand)
+
+    def backstab(self):
+        crit_rate = min(self.melee_crit + self.backstab_crit_bonus, 1)
+        crit = self.strike('backstab', self.damage['backstab'], crit_rate, self.crit_multipliers['backstab'], True)
+        cp = 1
+        if crit:
+            if self.seal_fate_roll() < self.seal_fate_chance:
+                cp = 2
+            if self.backstab_glyph_refund:
+                self.gain_energy(self.backstab_glyph_refund)
+        self.add_cp(cp)
+        self.proc(self.mh.triggers.get('backstab'), crit)
+        self.poison(self.mh)
+
+    def envenom(self):
+        now = self.now
+        crit_rate = self.melee_crit
+        if self.cold_blood_cooldown is not None and now >= self.cold_blood_ready:
+            self.cold_blood_ready = now + self.cold_blood_cooldown
+            self.gain_energy(25)
+            crit_rate = 1
+        if now < self.deadly_scheme_until:
+            self.deadly_scheme_until = -1.
+            crit_rate = 1
+        source = ('envenom', self.finish())
+        crit = self.strike('envenom', self.damage[source], crit_rate, self.crit_multipliers[source], True)
+        self.envenom_until = now + 1 + source[1]
+        self.proc(self.mh.triggers.get('envenom'), crit)
+        self.poison(self.mh)
+
+    def rupture(self):
+        cp = self.finish()
+        self.rupture_up = True
+        self.rupture_ends = self.now + 2 * (self.rupture_ticks + cp)
+        source = ('rupture', cp)
+        self.apply_bleed('rupture', 2, self.rupture_ticks + cp, self.damage[source], self.crit_multipliers[source])
+        self.proc(self.mh.triggers.get('rupture'))
+        self.poison(self.mh)
+
+    def open(self):
+        # Garrote takes us out of stealth, hit or miss.
+        self.stealthed = False
+        if self.overkill and self.stealth_overkill:
+            self.overkill_until = self.now + self.OVERKILL_DURATION
+            self.update_energy_regen()
+            self.schedule(self.overkill_until, self.end_overkill)
+
+    def garrote(self):
+        self.garrote_ends = self.now + 18
+        self.apply_bleed('garrote', 3, 6, self.damage['garrote'], self.crit_multipliers['garrote'])
+        self.add_cp(1, False)
+        self.proc(self.mh.triggers.get('garrote'))
+        self.poison(self.mh)
+
+    def apply_bleed(self, name, period, ticks, damage, crit_multiplier):
+        # Bleeds keep the ap and crit they were applied with, and a new one
+        # replaces any of the same name still ticking.
+        self.bleeds[name] += 1
+        self.schedule(self.now + period, self.bleed_tick, (name, self.bleeds[name], period, ticks, damage, self.melee_crit, crit_multiplier))
+
+    def bleed_tick(self, bleed):
+        name, application, period, ticks, damage, crit_rate, crit_multiplier = bleed
+        if application != self.bleeds[name]:
+            return
+        crit = self.strike(name, damage, crit_rate, crit_multiplier)
+        self.proc(self.spell_triggers.get(name + '_ticks'), crit)
+        self.venomous_wounds()
+        if ticks > 1:
+            self.schedule(self.now + period, self.bleed_tick, (name, application, period, ticks - 1, damage, crit_rate, crit_multiplier))
+        elif name == 'rupture':
+            self.rupture_up = False
+            self.wake()
+
+    def deadly_poison_tick(self, data):
+        crit = self.strike('deadly_poison', self.damage['deadly_poison'], self.spell_crit, self.crit_multipliers['deadly_poison'])
+        self.proc(self.spell_triggers.get('deadly_poison'), crit)
+        self.schedule(self.now + 3, self.deadly_poison_tick)
+
+    def stealth(self, cooldown):
+        # Kept for when the garrote we have up runs out.
+        if self.now < self.garrote_ends:
+            self.schedule(self.garrote_ends, self.stealth, cooldown)
+            return
+        self.stealthed = True
+        self.stealth_overkill = cooldown[1]
+        self.wake()
+        self.schedule(self.now + cooldown[0], self.stealth, cooldown)
+
+    def end_overkill(self, data):
+        self.update_energy_regen()
+
+    def start_vendetta(self, data):
+        self.vendetta_multiplier = self.VENDETTA_MULTIPLIER
+        self.schedule(self.now + self.vendetta_duration, self.end_vendetta)
+        self.schedule(self.now + self.VENDETTA_COOLDOWN, self.start_vendetta)
+
+    def end_vendetta(self, data):
+        self.vendetta_multiplier = 1
+
+    def start_heroism(self, data):
+        self.heroism_active = True
+        self.update_stats()
+        self.schedule(self.now + self.HEROISM_DURATION, self.end_heroism)
+        self.schedule(self.now + self.HEROISM_COOLDOWN, self.start_heroism)
+
+    def end_heroism(self, data):
+        self.heroism_active = False
+        self.update_stats()
+
+    def use_item(self, item):
+        name, stat, value, cooldown = item
+        if value is None:
+            value = self.calculator.race.calculate_rocket_barrage(self.ap, 0, 0)
+        if stat == 'spell_damage':
+            if self.hit_rolls[name]() < self.spell_hit:
+                self.strike(name, value * self.spell_multiplier, self.spell_crit, self.spell_crit_multiplier)
+        elif self.hit_rolls[name]() < self.strike_hit:
+            self.strike(name, value * self.physical_multiplier, self.melee_crit, self.melee_crit_multiplier)
+        self.schedule(self.now + cooldown, self.use_item, item)
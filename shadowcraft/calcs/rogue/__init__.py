@@ -5,6 +5,8 @@ __builtin__._ = gettext.gettext
 
 from shadowcraft.calcs import DamageCalculator
 from shadowcraft.core import exceptions
+from shadowcraft.objects.rogue import rogue_glyphs
+from shadowcraft.objects.rogue import rogue_talents
 
 class RogueDamageCalculator(DamageCalculator):
     # Functions of general use to rogue damage calculation go here. If a
@@ -15,6 +17,9 @@ class RogueDamageCalculator(DamageCalculator):
     # backstab damage as a function of AP - that (almost) any rogue damage
     # calculator will need to know, so things like that go here.
 
+    talents_class = rogue_talents.RogueTalents
+    glyphs_class = rogue_glyphs.RogueGlyphs
+
     bs_bonus_dmg_values =         {80:310, 81:317, 82:324, 83:331, 84:338, 85:345}
     mut_bonus_dmg_values =        {80:180, 85:201}
     ss_bonus_dmg_values =         {80:180, 81:184, 82:188, 83:192, 84:196, 85:200}
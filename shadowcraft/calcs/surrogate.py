@@ -0,0 +1,226 @@
+import copy
+import gettext
+import random
+import __builtin__
+
+__builtin__._ = gettext.gettext
+
+from shadowcraft.calcs import linear_algebra
+from shadowcraft.core import exceptions
+
+# A cheap stand-in for get_dps around a character's current gear, for callers
+# (a gear planner re-rating every hover) that want many approximate answers
+# rather than a few exact ones.  Within a box around a centre, dps is fitted
+# with a quadratic in the gear stats plus a hinge at each hit and expertise
+# cap inside the box, where dps has a kink a quadratic would smear out.  The
+# fit is checked against samples it wasn't fitted to, and a query outside the
+# box has the model refitted around it.
+
+class SurrogateException(exceptions.InvalidInputException):
+    pass
+
+
+def get_dps(calculator, points, columns):
+    # The calculator's dps with each point's (absolute) ratings for columns,
+    # one solve after another, set on a copy of its stats so nobody else sees
+    # them.
+    stats = calculator.stats
+    calculator.stats = copy.copy(stats)
+    results = []
+    try:
+        for point in points:
+            for stat, value in zip(columns, point):
+                setattr(calculator.stats, stat, value)
+            results.append(calculator.get_dps())
+    finally:
+        calculator.stats = stats
+    return results
+
+
+class LocalModel(object):
+    # The fit over the box of half width radius around center (clipped at
+    # zero rating).  error_bound is its largest error on the samples held
+    # out of the fit, and ep_error its largest error in EP at the centre,
+    # against the calculator's analytic EP where it has one.
+
+    def __init__(self, calculator, columns, caps, center, radius, rng):
+        self.columns = columns
+        self.center = list(center)
+        self.low = [max(value - radius, 0) for value in center]
+        self.high = [value + radius for value in center]
+        self.middle = [(low + high) / 2. for low, high in zip(self.low, self.high)]
+        self.scales = [2. / (high - low) for low, high in zip(self.low, self.high)]
+        self.hinges = []
+        for i, stat in enumerate(columns):
+            for cap in caps.get(stat, ()):
+                if self.low[i] < cap < self.high[i]:
+                    self.hinges.append((i, cap))
+
+        size = len(columns)
+        terms = 1 + size + size * (size + 1) / 2 + len(self.hinges)
+        points = [list(center)]
+        for i in xrange(size):
+            for bound in (self.low, self.high):
+                point = list(center)
+                point[i] = bound[i]
+                points.append(point)
+        while len(points) < 3 * terms:
+            points.append([rng.uniform(low, high) for low, high in zip(self.low, self.high)])
+        training, validation = points[:2 * terms], points[2 * terms:]
+        dps = get_dps(calculator, points, columns)
+
+        rows = [self.features(point) for point in training]
+        feature_columns = [[row[j] for row in rows] for j in xrange(terms)]
+        self.coefficients = linear_algebra.least_squares(feature_columns, dps[:2 * terms], regularization=1e-12)
+        self.error_bound = max([abs(self.estimate(point) - actual) for point, actual in zip(validation, dps[2 * terms:])])
+        self.ep_error = None
+        if calculator.normalize_ep_stat in columns:
+            self.ep_error = self.get_ep_error(calculator)
+
+    def contains(self, point):
+        for value, low, high in zip(point, self.low, self.high):
+            if not low <= value <= high:
+                return False
+        return True
+
+    def features(self, point):
+        # The model's terms at point: a constant, the scaled offsets from the
+        # middle of the box, their products, and the hinges.
+        offsets = [(value - middle) * scale for value, middle, scale in zip(point, self.middle, self.scales)]
+        row = [1.] + offsets
+        for i, offset in enumerate(offsets):
+            for other in offsets[i:]:
+                row.append(offset * other)
+        for i, cap in self.hinges:
+            row.append(max(point[i] - cap, 0) * self.scales[i])
+        return row
+
+    def estimate(self, point):
+        return sum([coefficient * term for coefficient, term in zip(self.coefficients, self.features(point))])
+
+    def gradient(self, point):
+        # The model's partial derivatives with respect to each column's
+        # rating; at a cap, that of gaining rating.
+        size = len(self.columns)
+        offsets = [(value - middle) * scale for value, middle, scale in zip(point, self.middle, self.scales)]
+        derivatives = list(self.coefficients[1:size + 1])
+        k = size + 1
+        for i in xrange(size):
+            for j in xrange(i, size):
+                derivatives[i] += self.coefficients[k] * offsets[j]
+                derivatives[j] += self.coefficients[k] * offsets[i]
+                k += 1
+        for i, cap in self.hinges:
+            if point[i] >= cap:
+                derivatives[i] += self.coefficients[k]
+            k += 1
+        return [derivative * scale for derivative, scale in zip(derivatives, self.scales)]
+
+    def ep_values(self, point, normalize_ep_stat):
+        gradient = self.gradient(point)
+        normalize = gradient[self.columns.index(normalize_ep_stat)]
+        return [abs(derivative) / normalize for derivative in gradient]
+
+    def get_ep_error(self, calculator):
+        stats = calculator.stats
+        calculator.stats = copy.copy(stats)
+        for stat, value in zip(self.columns, self.center):
+            setattr(calculator.stats, stat, value)
+        try:
+            gradient = calculator.get_dps_gradient(self.columns)[1]
+        except exceptions.InvalidInputException:
+            return None
+        finally:
+            calculator.stats = stats
+        normalize_ep_stat = calculator.normalize_ep_stat
+        exact = [abs(gradient[stat]) / gradient[normalize_ep_stat] for stat in self.columns]
+        return max([abs(a - b) for a, b in zip(exact, self.ep_values(self.center, normalize_ep_stat))])
+
+
+class Surrogate(object):
+    # Fitting a model takes three solves per term (about 100 with the
+    # default columns), each warm started from the last; queries then take
+    # some tens of microseconds.  The last few models are kept, so going
+    # back and forth between two gear sets doesn't refit each time.  The
+    # calculator's other inputs are fixed at construction, and a copy of it
+    # is kept, so later changes to it aren't picked up: build a new
+    # surrogate for a new spec or gear set.
+    MAX_MODELS = 8
+
+    # The stats that can be columns: the gear stats reforging and gems move,
+    # and the only ones the model reads straight off the calculator's stats.
+    STATS = ('str', 'agi', 'ap', 'crit', 'hit', 'exp', 'haste', 'mastery')
+
+    def __init__(self, calculator, columns=('ap', 'agi', 'crit', 'haste', 'mastery', 'hit', 'exp'), radius=400, seed=0):
+        if radius <= 0:
+            raise SurrogateException(_('The trust region radius must be positive'))
+        for stat in columns:
+            if stat not in self.STATS:
+                raise SurrogateException(_('Cannot model {stat}; allowed stats are {stats}').format(stat=stat, stats=', '.join(self.STATS)))
+        self.calculator = calculator.snapshot().calculator()
+        # The copy's settings are ours alone, so we can warm start its solves
+        # without changing anyone else's.
+        self.calculator.settings.warm_start = True
+        self.columns = tuple(columns)
+        self.indices = dict([(stat, i) for i, stat in enumerate(self.columns)])
+        self.radius = radius
+        self.seed = seed
+        self.base = [getattr(self.calculator.stats, stat) for stat in self.columns]
+        self.caps = self.calculator.get_rating_caps()
+        self.fits = 0
+        self.models = []
+        self.model = self.fit(self.base)
+
+    def fit(self, center):
+        # Each fit gets its own seed, so a surrogate's fits are reproducible.
+        model = LocalModel(self.calculator, self.columns, self.caps, center, self.radius, random.Random(self.seed * 1000003 + self.fits))
+        self.fits += 1
+        self.models.insert(0, model)
+        del self.models[self.MAX_MODELS:]
+        return model
+
+    def point(self, values):
+        # The stats for a query, values (a dictionary of ratings) over the
+        # ones the calculator came with; self.model is left as a model whose
+        # trust region they're in, fitted around them if need be.
+        point = list(self.base)
+        if values:
+            for stat, value in values.iteritems():
+                if stat not in self.indices:
+                    raise SurrogateException(_('{stat} is not modeled; modeled stats are {stats}').format(stat=stat, stats=', '.join(self.columns)))
+                point[self.indices[stat]] = value
+        if not self.model.contains(point):
+            for model in self.models:
+                if model.contains(point):
+                    self.model = model
+                    break
+            else:
+                self.model = self.fit(point)
+        return point
+
+    @property
+    def error_bound(self):
+        return self.model.error_bound
+
+    @property
+    def ep_error(self):
+        return self.model.ep_error
+
+    def get_dps(self, values=None):
+        # Approximate dps, to within about error_bound.
+        point = self.point(values)
+        return self.model.estimate(point)
+
+    def get_dps_interval(self, values=None):
+        dps = self.get_dps(values)
+        return dps - self.model.error_bound, dps + self.model.error_bound
+
+    def get_ep(self, values=None, normalize_ep_stat=None):
+        # Approximate EP of the columns, from the model's derivatives; to
+        # within about ep_error.
+        if not normalize_ep_stat:
+            normalize_ep_stat = self.calculator.normalize_ep_stat
+        if normalize_ep_stat not in self.indices:
+            raise SurrogateException(_('{stat} is not modeled; modeled stats are {stats}').format(stat=normalize_ep_stat, stats=', '.join(self.columns)))
+        point = self.point(values)
+        return dict(zip(self.columns, self.model.ep_values(point, normalize_ep_stat)))
@@ -0,0 +1,86 @@
+import time
+
+# Opt-in instrumentation for damage calculators.  Assign a Telemetry object to
+# calculator.telemetry and every subsequent get_dps (or EP, ranking...) call
+# will record how its fixed point solves went and where the time was spent.
+# Records accumulate until reset() is called, so one can look at a single
+# get_dps or at a whole get_ep run.
+
+class Telemetry(object):
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.solves = []
+        self.timings = {}
+
+    def timer(self, stage):
+        return _Timer(self, stage)
+
+    def add_time(self, stage, seconds):
+        self.timings[stage] = self.timings.get(stage, 0) + seconds
+
+    def record_solve(self, name, iterations, old_attacks_per_second, attacks_per_second, converged):
+        self.solves.append({
+            'function': name,
+            'iterations': iterations,
+            'residuals': residuals(old_attacks_per_second, attacks_per_second),
+            'converged': converged
+        })
+
+    def converged(self):
+        for solve in self.solves:
+            if not solve['converged']:
+                return False
+        return True
+
+    def iterations(self):
+        return sum([solve['iterations'] for solve in self.solves])
+
+    def as_dict(self):
+        return {
+            'solves': [dict(solve) for solve in self.solves],
+            'timings': dict(self.timings),
+            'iterations': self.iterations(),
+            'converged': self.converged()
+        }
+
+
+class _Timer(object):
+
+    def __init__(self, telemetry, stage):
+        self.telemetry = telemetry
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.time()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.telemetry.add_time(self.stage, time.time() - self.start)
+        return False
+
+
+class _NullTimer(object):
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+null_timer = _NullTimer()
+
+
+def residuals(old_dist, new_dist):
+    # The largest change, per attack, between the last two passes of a solve;
+    # attacks with one rate per combo point size report the worst of them.
+    result = {}
+    for item in new_dist:
+        if item not in old_dist:
+            result[item] = None
+        elif not hasattr(new_dist[item], '__iter__'):
+            result[item] = abs(new_dist[item] - old_dist[item])
+        else:
+            result[item] = max([abs(new - old) for new, old in zip(new_dist[item], old_dist[item])])
+    return result
@@ -0,0 +1,171 @@
+import collections
+import csv
+import json
+import multiprocessing
+import optparse
+import sys
+
+from shadowcraft.calcs.rogue.Aldriana import AldrianasRogueDamageCalculator
+from shadowcraft.calcs.rogue.Aldriana import model_version
+from shadowcraft.core import caching
+from shadowcraft.core import jsoninput
+
+# Evaluates characters in bulk: reads one JSON character (as taken by
+# jsoninput.from_json) per line and writes one result per line, in the same
+# order, as JSON Lines or CSV.  Only a few lines per worker are held in
+# memory at any time, however long the input is.
+#
+#   python -m shadowcraft.core.batch --workers 4 characters.jsonl > results.jsonl
+
+# The persistent store results are looked up in, if any; each worker process
+# opens its own.
+_store = None
+
+def _init_worker(store_path, store_model_version):
+    # Workers open the store at the model version the parent opened it with,
+    # so they read the same rows it writes.
+    global _store
+    if store_path is not None:
+        _store = caching.SQLiteStore(store_path, store_model_version)
+
+def evaluate_line(line_number, line, character_class='rogue'):
+    # Returns (result, key, stored): result is a dictionary holding the line
+    # number, the character's id (if it has one) and either its dps, dps
+    # breakdown and EP or the error that kept us from computing them.  key
+    # is the canonical key of the character, and stored whether its results
+    # came out of the persistent store.
+    result = {'line': line_number}
+    try:
+        j = json.loads(line)
+        if isinstance(j, dict) and 'id' in j:
+            result['id'] = j['id']
+        calculator = jsoninput.from_dict(j, character_class)
+        key = calculator.canonical_key()
+        results = None
+        if _store is not None:
+            results = _store.get(key)
+        stored = results is not None
+        if results is None:
+            results = jsoninput.results_cache.get(key)
+        if results is None:
+            report = calculator.get_report()
+            results = {'dps': report['dps'], 'dps_breakdown': report['dps_breakdown'], 'ep': report['ep']}
+        jsoninput.results_cache.put(key, results)
+    except Exception as e:
+        # Bad input and bugs alike spoil only their own line, as they do a
+        # single request to the service.
+        result['error'] = unicode(e)
+        return result, None, True
+    result.update(results)
+    return result, key, stored
+
+
+class JSONLinesWriter(object):
+
+    def __init__(self, output):
+        self.output = output
+
+    def write(self, result):
+        self.output.write(json.dumps(result, sort_keys=True))
+        self.output.write('\n')
+
+
+class CSVWriter(object):
+    # One row per character: its dps and EP values; dps breakdowns vary in
+    # shape from character to character, so they're left out.
+
+    def __init__(self, output, ep_stats=AldrianasRogueDamageCalculator.default_ep_stats):
+        self.ep_stats = ep_stats
+        self.writer = csv.writer(output)
+        self.writer.writerow(['line', 'id', 'dps'] + ['ep_' + stat for stat in ep_stats] + ['error'])
+
+    def write(self, result):
+        ep = result.get('ep', {})
+        row = [result['line'], result.get('id', ''), result.get('dps', '')]
+        row.extend([ep.get(stat, '') for stat in self.ep_stats])
+        row.append(result.get('error', u'').encode('utf-8'))
+        self.writer.writerow(row)
+
+
+writers = {
+    'jsonl': JSONLinesWriter,
+    'csv': CSVWriter
+}
+
+
+def run(lines, writer, workers=1, character_class='rogue', store=None, max_pending=None):
+    # Evaluates every line of lines (blank ones are skipped) and hands the
+    # results to writer in order.  With more than one worker, lines are
+    # spread over a process pool; at most max_pending of them are in flight
+    # at once.  Results not yet in store, if given, are saved to it.
+    global _store
+    def save(result, key, stored):
+        if not stored and store is not None:
+            store.put(key, dict([(name, result[name]) for name in ('dps', 'dps_breakdown', 'ep')]))
+        writer.write(result)
+
+    numbered_lines = ((number, line) for number, line in enumerate(lines, 1) if line.strip())
+    if workers <= 1:
+        _store = store
+        try:
+            for number, line in numbered_lines:
+                save(*evaluate_line(number, line, character_class))
+        finally:
+            _store = None
+        return
+
+    if max_pending is None:
+        max_pending = 4 * workers
+    store_path = store_model_version = None
+    if store is not None:
+        store_path, store_model_version = store.path, store.model_version
+    pool = multiprocessing.Pool(workers, _init_worker, (store_path, store_model_version))
+    try:
+        pending = collections.deque()
+        for number, line in numbered_lines:
+            pending.append(pool.apply_async(evaluate_line, (number, line, character_class)))
+            if len(pending) >= max_pending:
+                save(*pending.popleft().get())
+        while pending:
+            save(*pending.popleft().get())
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def main(argv=None):
+    parser = optparse.OptionParser(usage='%prog [options] [input]', description='Evaluates JSON Lines character profiles, one per line, from input (default: stdin).')
+    parser.add_option('-o', '--output', help='file to write results to (default: stdout)')
+    parser.add_option('-f', '--format', choices=sorted(writers.keys()), default='jsonl', help='output format: jsonl or csv (default: %default)')
+    parser.add_option('-w', '--workers', type='int', default=1, help='number of worker processes (default: %default)')
+    parser.add_option('-s', '--store', help='SQLite database to look up and save results in')
+    parser.add_option('-c', '--class', dest='character_class', default='rogue', help='character class (default: %default)')
+    options, args = parser.parse_args(argv)
+    if len(args) > 1:
+        parser.error('only one input file can be given')
+
+    if args:
+        input_file = open(args[0])
+    else:
+        input_file = sys.stdin
+    if options.output:
+        output_file = open(options.output, 'wb')
+    else:
+        output_file = sys.stdout
+    store = None
+    if options.store:
+        store = caching.SQLiteStore(options.store, model_version())
+
+    try:
+        run(input_file, writers[options.format](output_file), options.workers, options.character_class, store)
+    finally:
+        if store is not None:
+            store.close()
+        if args:
+            input_file.close()
+        if options.output:
+            output_file.close()
+
+
+if __name__ == '__main__':
+    main()
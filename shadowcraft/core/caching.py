@@ -0,0 +1,239 @@
+import cPickle
+import hashlib
+import json
+import shelve
+import sqlite3
+import sys
+import threading
+import time
+
+class LRUCache(object):
+    # A dictionary-like cache holding at most maxsize entries; when full, the
+    # least recently used entry is dropped to make room.  If a ttl (in
+    # seconds) is given, entries also expire that long after being put.  Hits
+    # and misses are counted so callers can check the cache is earning its
+    # keep.  Entries are kept in a dictionary and a circular doubly linked
+    # list running from the least to the most recently used, and a lock
+    # makes it safe to share between threads.
+
+    # Fields of a list link.
+    PREVIOUS, NEXT, KEY, VALUE, EXPIRY = range(5)
+
+    def __init__(self, maxsize=128, ttl=None, clock=time.time):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self.lock:
+            self.entries = {}
+            self.root = [None, None, None, None, None]
+            self.root[self.PREVIOUS] = self.root[self.NEXT] = self.root
+            self.hits = 0
+            self.misses = 0
+
+    def _unlink(self, link):
+        link[self.PREVIOUS][self.NEXT] = link[self.NEXT]
+        link[self.NEXT][self.PREVIOUS] = link[self.PREVIOUS]
+
+    def _append(self, link):
+        # Makes link the most recently used.
+        last = self.root[self.PREVIOUS]
+        link[self.PREVIOUS], link[self.NEXT] = last, self.root
+        last[self.NEXT] = self.root[self.PREVIOUS] = link
+
+    def get(self, key, default=None):
+        with self.lock:
+            link = self.entries.get(key)
+            if link is None:
+                self.misses += 1
+                return default
+            expiry = link[self.EXPIRY]
+            if expiry is not None and self.clock() >= expiry:
+                self._unlink(link)
+                del self.entries[key]
+                self.misses += 1
+                return default
+            self._unlink(link)
+            self._append(link)
+            self.hits += 1
+            return link[self.VALUE]
+
+    def put(self, key, value):
+        if self.ttl is None:
+            expiry = None
+        else:
+            expiry = self.clock() + self.ttl
+        with self.lock:
+            link = self.entries.pop(key, None)
+            if link is not None:
+                self._unlink(link)
+            elif len(self.entries) >= self.maxsize:
+                oldest = self.root[self.NEXT]
+                self._unlink(oldest)
+                del self.entries[oldest[self.KEY]]
+            link = [None, None, key, value, expiry]
+            self._append(link)
+            self.entries[key] = link
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class ShelveStore(object):
+    # A persistent tier for ResultCache, kept in a shelve file.
+
+    def __init__(self, path):
+        self.shelf = shelve.open(path)
+
+    def get(self, key):
+        return self.shelf.get(key)
+
+    def put(self, key, value):
+        self.shelf[key] = value
+        self.shelf.sync()
+
+    def close(self):
+        self.shelf.close()
+
+
+class SQLiteStore(object):
+    # A persistent tier for ResultCache, kept in an SQLite database; meant for
+    # sweeps that produce more results than fit in memory and get restarted
+    # or extended.  Results are stamped with the model version they were
+    # computed with, and results from any other version are ignored, so a
+    # change to the model invalidates the store without anyone having to
+    # remember to.  Puts are written in batches of batch_size; call flush (or
+    # close) to write out the rest.
+
+    def __init__(self, path, model_version, batch_size=500):
+        self.path = path
+        self.model_version = model_version
+        self.batch_size = batch_size
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS results (key TEXT, model_version TEXT, value BLOB, PRIMARY KEY (key, model_version))')
+        self.connection.commit()
+
+    def get(self, key):
+        with self.lock:
+            if key in self.pending:
+                return self.pending[key]
+            row = self.connection.execute('SELECT value FROM results WHERE key = ? AND model_version = ?', (key, self.model_version)).fetchone()
+        if row is None:
+            return None
+        return cPickle.loads(str(row[0]))
+
+    def put(self, key, value):
+        with self.lock:
+            self.pending[key] = value
+            if len(self.pending) >= self.batch_size:
+                self._flush()
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def _flush(self):
+        rows = [(key, self.model_version, sqlite3.Binary(cPickle.dumps(value, cPickle.HIGHEST_PROTOCOL))) for key, value in self.pending.items()]
+        self.connection.executemany('INSERT OR REPLACE INTO results VALUES (?, ?, ?)', rows)
+        self.connection.commit()
+        self.pending.clear()
+
+    def prune(self):
+        # Deletes the results of every other model version.
+        with self.lock:
+            self.connection.execute('DELETE FROM results WHERE model_version != ?', (self.model_version,))
+            self.connection.commit()
+
+    def close(self):
+        self.flush()
+        self.connection.close()
+
+
+class ResultCache(object):
+    # Caches results by request key: an LRUCache in front of an optional
+    # persistent store (anything with get and put methods, like ShelveStore or
+    # SQLiteStore).  The ttl only applies to the in-memory tier; a store keeps
+    # its results until it is cleared.
+
+    def __init__(self, maxsize=1024, ttl=None, store=None):
+        self.memory = LRUCache(maxsize, ttl)
+        self.store = store
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is None and self.store is not None:
+            value = self.store.get(key)
+            if value is not None:
+                self.memory.put(key, value)
+        return value
+
+    def put(self, key, value):
+        self.memory.put(key, value)
+        if self.store is not None:
+            self.store.put(key, value)
+
+    def clear(self):
+        self.memory.clear()
+
+
+class _Call(object):
+    # One computation in progress, and its outcome once it's done.
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class Coalescer(object):
+    # Lets concurrent callers asking for the same thing share one computation:
+    # the first caller with a given key runs the function, and anyone who asks
+    # for that key while it runs waits for it and gets the same result (or
+    # exception) back.  Nothing is kept once the computation is done - put a
+    # cache in front for that.
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight = {}
+        self.coalesced = 0
+
+    def run(self, key, function, *args):
+        with self.lock:
+            call = self.in_flight.get(key)
+            leader = call is None
+            if leader:
+                call = self.in_flight[key] = _Call()
+            else:
+                self.coalesced += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error[0], call.error[1], call.error[2]
+            return call.value
+
+        try:
+            call.value = function(*args)
+        except:
+            call.error = sys.exc_info()
+            raise
+        finally:
+            with self.lock:
+                del self.in_flight[key]
+            call.done.set()
+        return call.value
+
+
+def request_key(request):
+    # A hash of request (anything json can encode) that doesn't depend on
+    # the order of its keys or on its formatting.
+    canonical = json.dumps(request, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha1(canonical).hexdigest()
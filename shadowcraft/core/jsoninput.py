@@ -1,6 +1,8 @@
 import json
 from shadowcraft.calcs.rogue.Aldriana import AldrianasRogueDamageCalculator
+from shadowcraft.calcs.rogue.Aldriana import model_version
 from shadowcraft.calcs.rogue.Aldriana import settings
+from shadowcraft.core import caching
 from shadowcraft.core import exceptions
 from shadowcraft.objects import buffs
 from shadowcraft.objects import procs
@@ -13,7 +15,9 @@ class InvalidJSONException(exceptions.InvalidInputException):
     pass
 
 def from_json(json_string, character_class='rogue'):
-    j = json.loads(json_string)
+    return from_dict(json.loads(json_string), character_class)
+
+def from_dict(j, character_class='rogue'):
     try: 
         race_object = race.Race(str(j['race']), character_class=character_class)
         level = int(j['level'])
@@ -36,9 +40,9 @@ def from_json(json_string, character_class='rogue'):
         else:
             raise InvalidJSONException(_("Missing settings"))
 
-        # Settings(cycle, time_in_execute_range=.35, tricks_on_cooldown=True, response_time=.5, mh_poison='ip', oh_poison='dp', duration=300):
+        # Settings(cycle, time_in_execute_range=.35, tricks_on_cooldown=True, response_time=.5, mh_poison='ip', oh_poison='dp', duration=300, solver='plain', warm_start=False):
         settings_object = settings.Settings(cycle, s.get('time_in_execute_range', .35), s.get('tricks_on_cooldown', True),
-            s.get('response_time', .5), s.get('mh_poison', 'ip'), s.get('oh_poison', 'dp'), s.get('duration', 300))
+            s.get('response_time', .5), s.get('mh_poison', 'ip'), s.get('oh_poison', 'dp'), s.get('duration', 300), s.get('solver', 'plain'), s.get('warm_start', False))
     
         stats_dict = j['stats']
         # Weapon(damage, speed, weapon_type, enchant=None):
@@ -63,6 +67,52 @@ def from_json(json_string, character_class='rogue'):
     # Calculator(stats, talents, glyphs, buffs, race, settings=None, level=85):
     return AldrianasRogueDamageCalculator(stats_object, talents, glyphs, buffs_object, race_object, settings=settings_object, level=level)
 
+# Shared by every get_results call that doesn't bring its own cache.
+results_cache = caching.ResultCache()
+# Canonical keys of the request strings we've seen, so a repeated request
+# doesn't even need parsing.
+request_keys = caching.LRUCache(1024)
+
+def persistent_cache(path, maxsize=1024, ttl=None):
+    # A results cache backed by an SQLite database at path, for sweeps that
+    # want to pick up where they left off.  Results from other versions of
+    # the model are ignored.  Close its store when done.
+    return caching.ResultCache(maxsize, ttl, caching.SQLiteStore(path, model_version()))
+
+def get_results(json_string, character_class='rogue', cache=results_cache):
+    # Returns the dps, dps breakdown and EP for a character, as get_report
+    # does.  Results are cached by the calculator's canonical key, so asking
+    # for the same character again - even written out differently - doesn't
+    # compute anything, and asking with the very same string doesn't even
+    # build a calculator.  Pass cache=None to always compute.
+    calculator = None
+    key = request_keys.get((character_class, json_string))
+    if key is None:
+        calculator = from_json(json_string, character_class)
+        key = calculator.canonical_key()
+        request_keys.put((character_class, json_string), key)
+    if cache is not None:
+        results = cache.get(key)
+        if results is not None:
+            return copy_results(results)
+
+    if calculator is None:
+        calculator = from_json(json_string, character_class)
+    report = calculator.get_report()
+    results = {'dps': report['dps'], 'dps_breakdown': report['dps_breakdown'], 'ep': report['ep']}
+    if cache is not None:
+        cache.put(key, copy_results(results))
+    return results
+
+def copy_results(results):
+    # Results are numbers and dictionaries of numbers; copy them so callers
+    # can't change what's cached.
+    copied = {}
+    for name, value in results.items():
+        if isinstance(value, dict):
+            value = dict(value)
+        copied[name] = value
+    return copied
 
 if __name__ == '__main__':
     json_string = """{
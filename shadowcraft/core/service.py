@@ -0,0 +1,199 @@
+import BaseHTTPServer
+import SocketServer
+import json
+import multiprocessing
+import optparse
+import threading
+import urlparse
+
+from shadowcraft.core import caching
+from shadowcraft.core import exceptions
+from shadowcraft.core import jsoninput
+
+# A local HTTP calculation service.  POST a character (as taken by
+# jsoninput.from_json) to one of the endpoints below and get its results back
+# as JSON; options go in the query string, e.g.
+#
+#   POST /glyphs_ranking?glyphs=backstab,mutilate
+#
+# Calculations run on a pool of worker processes forked once, when the server
+# starts, from a process that has already imported and set up everything, so
+# requests don't pay for any of that.  Requests that take longer than the
+# timeout get a 504 (their worker finishes the job regardless), and once
+# max_pending jobs are queued or running further requests get a 503 straight
+# away.
+# Concurrent requests for the same character (by its JSON), endpoint and
+# options are coalesced into one calculation.
+#
+#   python -m shadowcraft.core.service --port 8080 --workers 4
+
+def _list_option(options, name):
+    if name not in options:
+        return None
+    return [item for value in options[name] for item in value.split(',') if item]
+
+def _flag_option(options, name):
+    return options.get(name, ['0'])[-1] not in ('0', 'false', '')
+
+def _dps(json_string, character_class, options):
+    return {'dps': jsoninput.get_results(json_string, character_class)['dps']}
+
+def _breakdown(json_string, character_class, options):
+    return {'dps_breakdown': jsoninput.get_results(json_string, character_class)['dps_breakdown']}
+
+def _ep(json_string, character_class, options):
+    stats = _list_option(options, 'stats')
+    if stats is None:
+        return {'ep': jsoninput.get_results(json_string, character_class)['ep']}
+    return {'ep': jsoninput.from_json(json_string, character_class).get_ep(stats)}
+
+def _weapon_ep(json_string, character_class, options):
+    speeds = _list_option(options, 'speeds')
+    if speeds is not None:
+        speeds = [float(speed) for speed in speeds]
+    calculator = jsoninput.from_json(json_string, character_class)
+    mh_ep, oh_ep = calculator.get_weapon_ep(speeds, _flag_option(options, 'dps'), _flag_option(options, 'enchants'))
+    return {'mh_ep': mh_ep, 'oh_ep': oh_ep}
+
+def _talents_ranking(json_string, character_class, options):
+    calculator = jsoninput.from_json(json_string, character_class)
+    main_tree, off_trees = calculator.get_talents_ranking(_list_option(options, 'talents'))
+    return {'main_tree': main_tree, 'off_trees': off_trees}
+
+def _glyphs_ranking(json_string, character_class, options):
+    calculator = jsoninput.from_json(json_string, character_class)
+    return {'glyphs_ranking': calculator.get_glyphs_ranking(_list_option(options, 'glyphs'))}
+
+endpoints = {
+    'dps': _dps,
+    'breakdown': _breakdown,
+    'ep': _ep,
+    'weapon_ep': _weapon_ep,
+    'talents_ranking': _talents_ranking,
+    'glyphs_ranking': _glyphs_ranking
+}
+
+
+def compute(endpoint, json_string, character_class, options):
+    # Runs in the workers.  Returns (status, body): 200 and the results, 400
+    # and an error message if the input doesn't make sense, or 500 and the
+    # message for anything else (an unknown glyph or talent name in the
+    # options, say).  It never raises, so the server always hears back.
+    try:
+        return 200, endpoints[endpoint](json_string, character_class, options)
+    except (exceptions.InvalidInputException, ValueError, TypeError) as e:
+        return 400, {'error': unicode(e)}
+    except Exception as e:
+        return 500, {'error': unicode(e)}
+
+
+class CalculationRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        if urlparse.urlparse(self.path).path.strip('/') == 'health':
+            self.respond(200, {'status': 'ok', 'endpoints': sorted(endpoints.keys())})
+        else:
+            self.respond(404, {'error': 'Not found'})
+
+    def do_POST(self):
+        url = urlparse.urlparse(self.path)
+        endpoint = url.path.strip('/')
+        if endpoint not in endpoints:
+            self.respond(404, {'error': 'Unknown endpoint {endpoint}'.format(endpoint=endpoint)})
+            return
+        json_string = self.rfile.read(int(self.headers.getheader('content-length', 0)))
+        options = urlparse.parse_qs(url.query)
+
+        # Identical requests that arrive while one is being computed share its
+        # computation; different endpoints never do, so a slow ranking
+        # doesn't hold up the dps of the same character.  They're matched on
+        # the JSON alone: building the character is left to the workers.
+        try:
+            key = caching.request_key(json.loads(json_string))
+        except ValueError as e:
+            self.respond(400, {'error': unicode(e)})
+            return
+        key = (endpoint, key, tuple(sorted([(name, tuple(values)) for name, values in options.items()])))
+        status, body = self.server.coalescer.run(key, self.server.compute, endpoint, json_string, options)
+        self.respond(status, body)
+
+    def respond(self, status, body):
+        content = json.dumps(body, sort_keys=True)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            BaseHTTPServer.BaseHTTPRequestHandler.log_message(self, format, *args)
+
+
+class CalculationServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    # Requests are handled on threads of their own, which wait on the worker
+    # pool; server_close shuts the pool down.
+    daemon_threads = True
+
+    def __init__(self, address, workers=None, request_timeout=30, max_pending=64, character_class='rogue', quiet=False):
+        BaseHTTPServer.HTTPServer.__init__(self, address, CalculationRequestHandler)
+        self.pool = multiprocessing.Pool(workers)
+        self.request_timeout = request_timeout
+        # A max_pending of 0 or less (or None) lifts the limit.
+        self.pending = None
+        if max_pending > 0:
+            self.pending = threading.BoundedSemaphore(max_pending)
+        self.character_class = character_class
+        self.quiet = quiet
+        self.coalescer = caching.Coalescer()
+
+    def compute(self, endpoint, json_string, options):
+        # Hands a calculation to the pool; returns (status, body).  The
+        # pending slot is given back when the job finishes, not when we stop
+        # waiting for it, so jobs abandoned with a 504 still count against
+        # max_pending while they hold up the pool.
+        if self.pending is not None and not self.pending.acquire(False):
+            return 503, {'error': 'Too many pending requests'}
+        try:
+            result = self.pool.apply_async(compute, (endpoint, json_string, self.character_class, options), callback=self.finished)
+        except:
+            self.finished(None)
+            raise
+        try:
+            return result.get(self.request_timeout)
+        except multiprocessing.TimeoutError:
+            return 504, {'error': 'Timed out'}
+
+    def finished(self, result):
+        # Called by the pool once a job is done; compute (the module
+        # function) never raises, so every job gets here.
+        if self.pending is not None:
+            self.pending.release()
+
+    def server_close(self):
+        BaseHTTPServer.HTTPServer.server_close(self)
+        self.pool.terminate()
+        self.pool.join()
+
+
+def main(argv=None):
+    parser = optparse.OptionParser(usage='%prog [options]', description='Serves dps, breakdown, EP, weapon EP and ranking calculations over HTTP.')
+    parser.add_option('--host', default='127.0.0.1', help='address to listen on (default: %default)')
+    parser.add_option('-p', '--port', type='int', default=8080, help='port to listen on (default: %default)')
+    parser.add_option('-w', '--workers', type='int', help='number of worker processes (default: one per CPU)')
+    parser.add_option('-t', '--timeout', type='float', default=30, help='seconds to wait for a calculation (default: %default)')
+    parser.add_option('-q', '--max-pending', type='int', default=64, help='requests that can be in flight at once, 0 for no limit (default: %default)')
+    parser.add_option('-c', '--class', dest='character_class', default='rogue', help='character class (default: %default)')
+    options, args = parser.parse_args(argv)
+
+    server = CalculationServer((options.host, options.port), options.workers, options.timeout, options.max_pending, options.character_class)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
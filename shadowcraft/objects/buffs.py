@@ -1,10 +1,11 @@
 from shadowcraft.core import exceptions
+from shadowcraft.objects import flags
 
 class InvalidBuffException(exceptions.InvalidInputException):
     pass
 
 
-class Buffs(object):
+class Buffs(flags.FlagSet):
     # Will need to add the caster/tank (de)buffs at some point if we want to
     # support other classes with this framework.
 
@@ -25,6 +26,8 @@ class Buffs(object):
         'guild_feast'                       # Seafood Magnifique Feast
     ])
     
+    registry_name = 'allowed_buffs'
+
     str_and_agi_buff_values = {80:155, 85:549}
 
     def __init__(self, *args, **kwargs):
@@ -34,12 +37,6 @@ class Buffs(object):
             setattr(self, buff, True)
         self.level = kwargs.get('level', 85)
 
-    def __getattr__(self, name):
-        # Any buff we haven't assigned a value to, we don't have.
-        if name in self.allowed_buffs:
-            return False
-        object.__getattribute__(self, name)
-    
     def __setattr__(self, name, value):
         object.__setattr__(self, name, value)
         if name == 'level':
@@ -51,54 +48,78 @@ class Buffs(object):
         except KeyError as e:
             raise exceptions.InvalidLevelException(_('No conversion factor available for level {level}').format(level=self.level))
 
-    
+    def state_key(self):
+        return (self.mask, self.level)
+
+    def canonical_form(self):
+        return (super(Buffs, self).canonical_form(), self.level)
+
+    def wire_form(self):
+        return (self.mask, self.level)
+
+    @classmethod
+    def from_wire_form(cls, form):
+        mask, level = form
+        buffs = cls(level=level)
+        buffs.mask = mask
+        return buffs
+
+    @flags.cached_per_state
     def stat_multiplier(self):
         if self.stat_multiplier_buff:
             return 1.05
         return 1
 
+    @flags.cached_per_state
     def all_damage_multiplier(self):
         if self.all_damage_buff:
             return 1.03
         else:
             return 1
 
+    @flags.cached_per_state
     def spell_damage_multiplier(self):
         if self.spell_damage_debuff:
             return 1.08 * self.all_damage_multiplier()
         else:
             return self.all_damage_multiplier()
 
+    @flags.cached_per_state
     def physical_damage_multiplier(self):
         if self.physical_vulnerability_debuff:
             return 1.04 * self.all_damage_multiplier()
         else:
             return self.all_damage_multiplier()
 
+    @flags.cached_per_state
     def bleed_damage_multiplier(self):
         if self.bleed_damage_debuff:
             return 1.3 * self.physical_damage_multiplier()
         else:
             return self.physical_damage_multiplier()
 
+    @flags.cached_per_state
     def attack_power_multiplier(self, ranged=False):
         if self.attack_power_buff:
             return [1.2, 1.1][ranged]
         else:
             return 1
 
+    @flags.cached_per_state
     def melee_haste_multiplier(self):
         if self.melee_haste_buff:
             return 1.1
         else:
             return 1
 
+    @flags.cached_per_state
     def buff_str(self):
         if self.str_and_agi_buff:
             return self.str_and_agi_buff_bonus
         else:
             return 0
 
+    @flags.cached_per_state
     def buff_agi(self):
         if self.agi_flask:
             flask_agi = 300
@@ -115,18 +136,21 @@ class Buffs(object):
         else:
             return 0 + food_agi + flask_agi
 
+    @flags.cached_per_state
     def buff_all_crit(self):
         if self.crit_chance_buff:
             return .05
         else:
             return 0
 
+    @flags.cached_per_state
     def buff_spell_crit(self):
         if self.spell_crit_debuff:
             return .05
         else:
             return 0
 
+    @flags.cached_per_state
     def armor_reduction_multiplier(self):
         if self.armor_debuff:
             return 0.88 
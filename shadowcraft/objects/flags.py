@@ -0,0 +1,98 @@
+import functools
+
+
+class _Flag(object):
+    # Reads and writes one bit of the owner's mask.
+
+    __slots__ = ('bit',)
+
+    def __init__(self, bit):
+        self.bit = bit
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        return bool(obj.mask & self.bit)
+
+    def __set__(self, obj, value):
+        if value:
+            obj.mask |= self.bit
+        else:
+            obj.mask &= ~self.bit
+
+
+class FlagSetType(type):
+    # Gives every name in the class' registry (the attribute named by
+    # registry_name) a bit of its own, in sorted order, and an attribute that
+    # reads and writes it.
+
+    def __init__(cls, name, bases, namespace):
+        type.__init__(cls, name, bases, namespace)
+        registry = getattr(cls, cls.registry_name, ())
+        cls.flag_order = tuple(sorted(registry))
+        cls.flag_bits = dict([(flag, 1 << i) for i, flag in enumerate(cls.flag_order)])
+        for flag, bit in cls.flag_bits.items():
+            if not isinstance(getattr(cls, flag, None), (_Flag, type(None))):
+                raise TypeError('{flag} is already an attribute of {cls}'.format(flag=flag, cls=name))
+            setattr(cls, flag, _Flag(bit))
+
+
+class FlagSet(object):
+    # Base class for buffs, glyphs and the like: objects that hold a set of
+    # on/off flags out of a fixed registry.  The flags that are on are kept as
+    # the bits of an integer, mask, which makes the objects cheap to hash and
+    # compare and lets results be cached per configuration (see
+    # cached_per_state).  Anything other than the mask that tells two objects
+    # apart goes in state_key.
+
+    __metaclass__ = FlagSetType
+    registry_name = 'allowed_flags'
+    mask = 0
+
+    def __getattr__(self, name):
+        # Flags are class attributes, so only names that aren't get here.
+        object.__getattribute__(self, name)
+
+    def state_key(self):
+        return self.mask
+
+    def canonical_form(self):
+        # The flags that are on, by name.
+        return tuple([flag for flag in self.flag_order if self.mask & self.flag_bits[flag]])
+
+    def wire_form(self):
+        # A compact, picklable form from_wire_form rebuilds us from.  Flags
+        # are numbered in sorted order, so masks mean the same everywhere.
+        return self.mask
+
+    @classmethod
+    def from_wire_form(cls, form):
+        flag_set = cls()
+        flag_set.mask = form
+        return flag_set
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.state_key() == other.state_key()
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((type(self).__name__, self.state_key()))
+
+
+def cached_per_state(method):
+    # Decorates a FlagSet method whose result only depends on its arguments
+    # and the object's state_key; the result is computed once per state.
+    cache = {}
+
+    @functools.wraps(method)
+    def wrapper(self, *args):
+        key = (type(self), self.state_key(), args)
+        try:
+            return cache[key]
+        except KeyError:
+            value = cache[key] = method(self, *args)
+            return value
+
+    return wrapper
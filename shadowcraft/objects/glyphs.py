@@ -1,13 +1,10 @@
-class Glyphs(object):
+from shadowcraft.objects import flags
+
+class Glyphs(flags.FlagSet):
     allowed_glyphs = frozenset()
+    registry_name = 'allowed_glyphs'
 
     def __init__(self, *args):
         for arg in args:
             if arg in self.allowed_glyphs:
                 setattr(self, arg, True)
-
-    def __getattr__(self, name):
-        # Any glyph we haven't assigned a value to, we don't have.
-        if name in self.allowed_glyphs:
-            return False
-        object.__getattribute__(self, name)
@@ -121,8 +121,16 @@ class Proc(object):
 
 class ProcsList(object):
     allowed_procs = proc_data.allowed_procs
+    # Equipped procs are listed in the order we'd come across them going
+    # through allowed_procs, so results don't depend on the order they were
+    # equipped in.
+    catalog_order = dict([(proc_name, i) for i, proc_name in enumerate(allowed_procs)])
+    # Procs are numbered in sorted order in wire forms, so the bits mean the
+    # same everywhere.
+    wire_order = tuple(sorted(allowed_procs))
 
     def __init__(self, *args):
+        self.equipped_proc_names = ()
         for arg in args:
             if arg in self.allowed_procs:
                 setattr(self, arg, Proc(**self.allowed_procs[arg]))
@@ -132,6 +140,37 @@ class ProcsList(object):
     def set_proc(self, proc):
         setattr(self, proc, Proc(**self.allowed_procs[proc]))
 
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        if name in self.allowed_procs:
+            self._update_equipped(name, bool(value))
+
+    def __delattr__(self, name):
+        object.__delattr__(self, name)
+        if name in self.allowed_procs:
+            self._update_equipped(name, False)
+
+    def _update_equipped(self, proc_name, equipped):
+        # The registry is replaced rather than modified, so shallow copies of
+        # this list don't end up sharing it.
+        proc_names = [i for i in self.__dict__.get('equipped_proc_names', ()) if i != proc_name]
+        if equipped:
+            proc_names.append(proc_name)
+            proc_names.sort(key=self.catalog_order.get)
+        object.__setattr__(self, 'equipped_proc_names', tuple(proc_names))
+
+    def wire_form(self):
+        # A bitmask of the equipped procs; from_wire_form rebuilds them.
+        mask = 0
+        for i, proc_name in enumerate(self.wire_order):
+            if proc_name in self.equipped_proc_names:
+                mask |= 1 << i
+        return mask
+
+    @classmethod
+    def from_wire_form(cls, form):
+        return cls(*[proc_name for i, proc_name in enumerate(cls.wire_order) if form & (1 << i)])
+
     def __getattr__(self, proc):
         # Any proc we haven't assigned a value to, we don't have.
         if proc in self.allowed_procs:
@@ -140,20 +179,18 @@ class ProcsList(object):
 
     def get_all_procs_for_stat(self, stat=None):
         procs = []
-        for proc_name in self.allowed_procs:
+        for proc_name in self.equipped_proc_names:
             proc = getattr(self, proc_name)
-            if proc:
-                if stat == None or proc.stat == stat:
-                    procs.append(proc)
+            if stat == None or proc.stat == stat:
+                procs.append(proc)
 
         return procs
 
     def get_all_damage_procs(self):
         procs = []
-        for proc_name in self.allowed_procs:
+        for proc_name in self.equipped_proc_names:
             proc = getattr(self, proc_name)
-            if proc:
-                if proc.stat in ('spell_damage', 'physical_damage'):
-                    procs.append(proc)
+            if proc.stat in ('spell_damage', 'physical_damage'):
+                procs.append(proc)
 
         return procs
@@ -101,6 +101,16 @@ class Race(object):
         self.level = level
         self.set_racials()
 
+    def canonical_form(self):
+        return (self.race_name, self.character_class, self.level)
+
+    def wire_form(self):
+        return self.canonical_form()
+
+    @classmethod
+    def from_wire_form(cls, form):
+        return cls(*form)
+
     def set_racials(self):
         # Set all racials, so we don't invoke __getattr__ all the time
         for race, racials in Race.racials_by_race.items():
@@ -23,26 +23,27 @@ class Assassination(talents.TalentTree):
         'vendetta': (1, 7)
     }
 
-    def populate_talents_from_list(self, values_list):
-        self.set_talent('deadly_momentum', values_list[0])
-        self.set_talent('coup_de_grace', values_list[1])
-        self.set_talent('lethality', values_list[2])
-        self.set_talent('ruthlessness', values_list[3])
-        self.set_talent('quickening', values_list[4])
-        self.set_talent('puncturing_wounds', values_list[5])
-        self.set_talent('blackjack', values_list[6])
-        self.set_talent('deadly_brew', values_list[7])
-        self.set_talent('cold_blood', values_list[8])
-        self.set_talent('vile_poisons', values_list[9])
-        self.set_talent('deadened_nerves', values_list[10])
-        self.set_talent('seal_fate', values_list[11])
-        self.set_talent('murderous_intent', values_list[12])
-        self.set_talent('overkill', values_list[13])
-        self.set_talent('master_poisoner', values_list[14])
-        self.set_talent('improved_expose_armor', values_list[15])
-        self.set_talent('cut_to_the_chase', values_list[16])
-        self.set_talent('venomous_wounds', values_list[17])
-        self.set_talent('vendetta', values_list[18])
+    talent_order = (
+        'deadly_momentum',
+        'coup_de_grace',
+        'lethality',
+        'ruthlessness',
+        'quickening',
+        'puncturing_wounds',
+        'blackjack',
+        'deadly_brew',
+        'cold_blood',
+        'vile_poisons',
+        'deadened_nerves',
+        'seal_fate',
+        'murderous_intent',
+        'overkill',
+        'master_poisoner',
+        'improved_expose_armor',
+        'cut_to_the_chase',
+        'venomous_wounds',
+        'vendetta'
+    )
 
 class Combat(talents.TalentTree):
     allowed_talents = {
@@ -67,26 +68,27 @@ class Combat(talents.TalentTree):
         'killing_spree': (1, 7)
     }
 
-    def populate_talents_from_list(self, values_list):
-        self.set_talent('improved_recuperate', values_list[0])
-        self.set_talent('improved_sinister_strike', values_list[1])
-        self.set_talent('precision', values_list[2])
-        self.set_talent('improved_slice_and_dice', values_list[3])
-        self.set_talent('improved_sprint', values_list[4])
-        self.set_talent('aggression', values_list[5])
-        self.set_talent('improved_kick', values_list[6])
-        self.set_talent('lightning_reflexes', values_list[7])
-        self.set_talent('revealing_strike', values_list[8])
-        self.set_talent('reinforced_leather', values_list[9])
-        self.set_talent('improved_gouge', values_list[10])
-        self.set_talent('combat_potency', values_list[11])
-        self.set_talent('blade_twisting', values_list[12])
-        self.set_talent('throwing_specialization', values_list[13])
-        self.set_talent('adrenaline_rush', values_list[14])
-        self.set_talent('savage_combat', values_list[15])
-        self.set_talent('bandits_guile', values_list[16])
-        self.set_talent('restless_blades', values_list[17])
-        self.set_talent('killing_spree', values_list[18])
+    talent_order = (
+        'improved_recuperate',
+        'improved_sinister_strike',
+        'precision',
+        'improved_slice_and_dice',
+        'improved_sprint',
+        'aggression',
+        'improved_kick',
+        'lightning_reflexes',
+        'revealing_strike',
+        'reinforced_leather',
+        'improved_gouge',
+        'combat_potency',
+        'blade_twisting',
+        'throwing_specialization',
+        'adrenaline_rush',
+        'savage_combat',
+        'bandits_guile',
+        'restless_blades',
+        'killing_spree'
+    )
 
 class Subtlety(talents.TalentTree):
     allowed_talents = {
@@ -111,26 +113,27 @@ class Subtlety(talents.TalentTree):
         'shadow_dance': (1, 7)
     }
 
-    def populate_talents_from_list(self, values_list):
-        self.set_talent('nightstalker', values_list[0])
-        self.set_talent('improved_ambush', values_list[1])
-        self.set_talent('relentless_strikes', values_list[2])
-        self.set_talent('elusiveness', values_list[3])
-        self.set_talent('waylay', values_list[4])
-        self.set_talent('opportunity', values_list[5])
-        self.set_talent('initiative', values_list[6])
-        self.set_talent('energetic_recovery', values_list[7])
-        self.set_talent('find_weakness', values_list[8])
-        self.set_talent('hemorrhage', values_list[9])
-        self.set_talent('honor_among_thieves', values_list[10])
-        self.set_talent('premeditation', values_list[11])
-        self.set_talent('enveloping_shadows', values_list[12])
-        self.set_talent('cheat_death', values_list[13])
-        self.set_talent('preparation', values_list[14])
-        self.set_talent('sanguinary_vein', values_list[15])
-        self.set_talent('slaughter_from_the_shadows', values_list[16])
-        self.set_talent('serrated_blades', values_list[17])
-        self.set_talent('shadow_dance', values_list[18])
+    talent_order = (
+        'nightstalker',
+        'improved_ambush',
+        'relentless_strikes',
+        'elusiveness',
+        'waylay',
+        'opportunity',
+        'initiative',
+        'energetic_recovery',
+        'find_weakness',
+        'hemorrhage',
+        'honor_among_thieves',
+        'premeditation',
+        'enveloping_shadows',
+        'cheat_death',
+        'preparation',
+        'sanguinary_vein',
+        'slaughter_from_the_shadows',
+        'serrated_blades',
+        'shadow_dance'
+    )
 
 class RogueTalents(talents.ClassTalents):
     @classmethod
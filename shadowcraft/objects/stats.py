@@ -1,3 +1,4 @@
+from shadowcraft.objects import flags
 from shadowcraft.objects import procs
 from shadowcraft.objects import proc_data
 from shadowcraft.core import exceptions
@@ -35,6 +36,25 @@ class Stats(object):
         self.gear_buffs = gear_buffs
         self.level = level
 
+    def canonical_form(self):
+        # Procs are left to the calculator, which knows which of them its
+        # model reads.
+        return (self.level, self.str, self.agi, self.ap, self.crit, self.hit, self.exp, self.haste, self.mastery,
+            self.mh.canonical_form(), self.oh.canonical_form(), self.ranged.canonical_form(), self.gear_buffs.canonical_form())
+
+    def wire_form(self):
+        # A compact, picklable form from_wire_form rebuilds us from.
+        return (self.str, self.agi, self.ap, self.crit, self.hit, self.exp, self.haste, self.mastery, self.mh.wire_form(),
+            self.oh.wire_form(), self.ranged.wire_form(), self.procs.wire_form(), self.gear_buffs.wire_form(), self.level)
+
+    @classmethod
+    def from_wire_form(cls, form):
+        values = list(form[:8])
+        mh, oh, ranged = [Weapon.from_wire_form(weapon) for weapon in form[8:11]]
+        procs_list = procs.ProcsList.from_wire_form(form[11])
+        gear_buffs = GearBuffs.from_wire_form(form[12])
+        return cls(*(values + [mh, oh, ranged, procs_list, gear_buffs, form[13]]))
+
     def _set_constants_for_level(self):
         try:
             self.melee_hit_rating_conversion = self.melee_hit_rating_conversion_values[self.level]
@@ -128,6 +148,25 @@ class Weapon(object):
             return False
         object.__getattribute__(self, name)
 
+    def canonical_form(self):
+        enchants = [enchant for enchant in sorted(self.allowed_melee_enchants) if getattr(self, enchant)]
+        return (self.type, self.speed, self.weapon_dps, tuple(enchants))
+
+    def wire_form(self):
+        enchant = None
+        for name in self.allowed_melee_enchants:
+            if getattr(self, name):
+                enchant = name
+        return (self.type, self.speed, self.weapon_dps, enchant)
+
+    @classmethod
+    def from_wire_form(cls, form):
+        weapon_type, speed, weapon_dps, enchant = form
+        weapon = cls(weapon_dps * speed, speed, weapon_type, enchant)
+        # Don't leave weapon_dps to the rounding of damage / speed.
+        weapon.weapon_dps = weapon_dps
+        return weapon
+
     def is_melee(self):
         return not self.type in frozenset(['gun', 'bow', 'crossbow', 'thrown'])
 
@@ -138,7 +177,7 @@ class Weapon(object):
         return self.speed * self.weapon_dps + self._normalization_speed * ap / 14.
 
 # Catch-all for non-proc gear based buffs (static or activated)
-class GearBuffs(object):
+class GearBuffs(flags.FlagSet):
     activated_boosts = {
         # Duration and cool down in seconds - name is mandatory for damage-on-use boosts
         'unsolvable_riddle':              {'stat': 'agi', 'value': 1605, 'duration': 20, 'cooldown': 120},
@@ -173,48 +212,49 @@ class GearBuffs(object):
     ]
 
     allowed_buffs = frozenset(other_gear_buffs + activated_boosts.keys())
+    registry_name = 'allowed_buffs'
 
     def __init__(self, *args):
         for arg in args:
             if arg in self.allowed_buffs:
                 setattr(self, arg, True)
 
-    def __getattr__(self, name):
-        # Any gear buff we haven't assigned a value to, we don't have.
-        if name in self.allowed_buffs:
-            return False
-        object.__getattribute__(self, name)
-
+    @flags.cached_per_state
     def metagem_crit_multiplier(self):
         if self.chaotic_metagem:
             return 1.03
         else:
             return 1
 
+    @flags.cached_per_state
     def rogue_t11_2pc_crit_bonus(self):
         if self.rogue_t11_2pc:
             return .05
         else:
             return 0
 
+    @flags.cached_per_state
     def rogue_t12_2pc_damage_bonus(self):
         if self.rogue_t12_2pc:
             return .06
         else:
             return 0
 
+    @flags.cached_per_state
     def rogue_t12_4pc_stat_bonus(self):
         if self.rogue_t12_4pc:
             return .25
         else:
             return 0
 
+    @flags.cached_per_state
     def rogue_t13_2pc_cost_multiplier(self):
         if self.rogue_t13_2pc:
             return 1 / 1.05
         else:
             return 1
 
+    @flags.cached_per_state
     def leather_specialization_multiplier(self):
         if self.leather_specialization:
             return 1.05
@@ -1,3 +1,5 @@
+import copy
+
 from shadowcraft.core import exceptions
 
 class InvalidTalentException(exceptions.InvalidInputException):
@@ -10,8 +12,16 @@ class TalentTree(object):
     # one of these directly is almost completely useless; always subclass and
     # define allowed_talents as appropriate for your tree before using.
 
-    # Allowed_talents is a dictionary of talent_name: max_value entries.
+    # Allowed_talents is a dictionary of talent_name: max_value entries, and
+    # talent_order lists them in the order they appear in talent strings,
+    # i.e. passing in '0333230113022110321' instead of a full dictionary of
+    # input values.
     allowed_talents = {}
+    talent_order = ()
+
+    # Set once a ClassTalents has compiled the tree's values; from then on
+    # talents are changed through it, so its copies can't go stale.
+    read_only = False
 
     def __getattr__(self, name):
         # If someone tries to access a talent that is defined for the tree but
@@ -21,14 +31,22 @@ class TalentTree(object):
             return 0
         object.__getattribute__(self, name)
 
-    def set_talent(self, talent_name, talent_value):
+    def __setattr__(self, name, value):
+        if self.read_only and name in self.allowed_talents:
+            raise InvalidTalentException(_('Talent {talent_name} is read only; set it on the class talents').format(talent_name=name))
+        object.__setattr__(self, name, value)
+
+    def validate_talent(self, talent_name, talent_value):
+        # Returns the value to store for talent_value, if it's allowed.
         if talent_name not in self.allowed_talents:
             raise InvalidTalentException(_('Invalid talent name {talent_name}').format(talent_name=talent_name))
         max_talent_value, talent_tier = self.allowed_talents[talent_name]
         if talent_value < 0 or talent_value > max_talent_value:
             raise InvalidTalentException(_('Invalid value {talent_value} for talent {talent_name}').format(talent_value=talent_value, talent_name=talent_name))
+        return int(talent_value)
 
-        setattr(self, talent_name, int(talent_value))
+    def set_talent(self, talent_name, talent_value):
+        setattr(self, talent_name, self.validate_talent(talent_name, talent_value))
 
     def __init__(self, talent_string = '', **kwargs):
         if not talent_string:
@@ -46,16 +64,20 @@ class TalentTree(object):
         return points
 
     def populate_talents_from_list(self, values_list):
-        # Replace this function with something that actually works when
-        # subclassing in order to allow the constructor to accept a compacted
-        # string input - i.e, passing in '0333230113022110321' instead of a
-        # full dictionary of input values.
+        for talent_name, value in zip(self.talent_order, values_list):
+            self.set_talent(talent_name, value)
 
-        # Again, this should probably fail more elegantly with an actual error
-        # message, but again, I'm being lazy.
-        assert False
+    def talent_string(self):
+        # The compacted string the constructor takes.
+        return ''.join([str(getattr(self, talent_name)) for talent_name in self.talent_order])
 
 class ClassTalents(object):
+    # Talent values are compiled into plain attributes when the object is
+    # built - self.ruthlessness is an ordinary attribute lookup - and the
+    # trees are made read only, so talents can only be changed here, which
+    # keeps the two in step.  To try out a different talent without touching
+    # these, use with_talent.
+
     # override in subclasses to return a list of three TalentTree classes
     # available to this class
     @classmethod
@@ -65,7 +87,6 @@ class ClassTalents(object):
     def __init__(self, string1, string2, string3):
         self.trees = list()
         self.spec = None
-        self.cachedAttrs = list()
 
         # Instantiate the three trees using the specified strings. While we're
         # at it, find the tree with the most talents to determine spec. Since
@@ -79,11 +100,16 @@ class ClassTalents(object):
                 self.spec = treeClass
             self.trees.append(tree)
 
-        # build up a dict of talents to trees for quicker access in __getattr__
+        self._compile_talents()
+
+    def _compile_talents(self):
+        # build up a dict of talents to trees, and copy every talent value over
         self.treeForTalent = dict()
         for tree in self.trees:
             for name in tree.allowed_talents:
                 self.treeForTalent[name] = tree
+                object.__setattr__(self, name, getattr(tree, name))
+            tree.read_only = True
 
     def is_specced(self, treeClass):
         return self.spec == treeClass
@@ -92,18 +118,48 @@ class ClassTalents(object):
         max_talent_value, talent_tier = self.treeForTalent[name].allowed_talents[name]
         return talent_tier
 
-    def reset_cache(self):
-        for name in self.cachedAttrs:
-            delattr(self, name)
-        del self.cachedAttrs[:]
-            
-    def __getattr__(self, name):
-        # If someone tries to access a talent defined on one of the trees,
-        # access it through that tree.
-        if name in self.treeForTalent:
-            self.cachedAttrs.append(name)
-            r = getattr(self.treeForTalent[name], name)            
-            setattr(self, name, r)
-            return r
-            
-        object.__getattribute__(self, name)
+    def canonical_form(self):
+        # The spec and the talents with points in them, however they were
+        # entered.
+        talents = [(name, getattr(self, name)) for name in self.treeForTalent if getattr(self, name)]
+        return (self.spec.__name__, tuple(sorted(talents)))
+
+    def wire_form(self):
+        # The talent strings of the trees and the index of the spec, which
+        # with_talent may have kept from before.
+        spec = None
+        if self.spec is not None:
+            spec = self.treeClasses().index(self.spec)
+        return tuple([tree.talent_string() for tree in self.trees] + [spec])
+
+    @classmethod
+    def from_wire_form(cls, form):
+        talents = cls(*form[:3])
+        if form[3] is not None:
+            talents.spec = cls.treeClasses()[form[3]]
+        return talents
+
+    def set_talent(self, name, value):
+        if name not in self.treeForTalent:
+            raise InvalidTalentException(_('Invalid talent name {talent_name}').format(talent_name=name))
+        setattr(self, name, value)
+
+    def with_talent(self, name, value):
+        # Returns a copy of these talents with name set to value.  The spec
+        # is kept as it is, as rankings want to know what a point is worth to
+        # the current spec.
+        talents = copy.copy(self)
+        talents.trees = [copy.copy(tree) for tree in self.trees]
+        talents._compile_talents()
+        talents.set_talent(name, value)
+        return talents
+
+    def __setattr__(self, name, value):
+        # Writing a talent writes it through to its (read only) tree, which
+        # validates it.  (Go through __dict__ so that objects that are still
+        # being built or unpickled don't recurse looking for the trees.)
+        tree = self.__dict__.get('treeForTalent', {}).get(name)
+        if tree is not None:
+            value = tree.validate_talent(name, value)
+            object.__setattr__(tree, name, value)
+        object.__setattr__(self, name, value)
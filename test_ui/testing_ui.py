@@ -767,9 +767,10 @@ class TestGUI(wx.Frame):
             self.error_area.SetLabel("")
             try:
                 calculator = AldrianasRogueDamageCalculator(my_stats, my_talents, my_glyphs, my_buffs, my_race, test_settings)
-                dps = calculator.get_dps()
-                ep_values = calculator.get_ep()
-                dps_breakdown = calculator.get_dps_breakdown()
+                report = calculator.get_report()
+                dps = report['dps']
+                ep_values = report['ep']
+                dps_breakdown = report['dps_breakdown']
 
             except exceptions.InvalidInputException as e:
                 self.error_area.SetLabel(str(e))
@@ -0,0 +1,40 @@
+import math
+import unittest
+from shadowcraft.calcs.dual_numbers import Dual
+from shadowcraft.calcs import dual_numbers
+
+class TestDual(unittest.TestCase):
+    def setUp(self):
+        self.x = Dual.variable(3., 0, 2)
+        self.y = Dual.variable(2., 1, 2)
+
+    def assertDualEqual(self, dual, value, gradient):
+        self.assertAlmostEqual(dual.value, value)
+        for a, b in zip(dual.gradient, gradient):
+            self.assertAlmostEqual(a, b)
+
+    def test_arithmetic(self):
+        self.assertDualEqual(self.x + self.y, 5., (1., 1.))
+        self.assertDualEqual(1 - self.x, -2., (-1., 0.))
+        self.assertDualEqual(self.x * self.y * 2, 12., (4., 6.))
+        self.assertDualEqual(self.x / self.y, 1.5, (.5, -.75))
+        self.assertDualEqual(6 / self.x, 2., (-2. / 3, 0.))
+        self.assertDualEqual(-self.x, -3., (-1., 0.))
+
+    def test_pow(self):
+        self.assertDualEqual(self.x ** 2, 9., (6., 0.))
+        self.assertDualEqual(2 ** self.y, 4., (0., 4 * math.log(2)))
+        self.assertDualEqual(self.x ** self.y, 9., (6., 9 * math.log(3)))
+
+    def test_comparisons(self):
+        self.assertTrue(self.y < self.x)
+        self.assertTrue(self.x > 2.5)
+        self.assertEqual(max(self.x, self.y, 0), self.x)
+        self.assertEqual(max(self.x, 4), 4)
+        self.assertFalse(Dual.variable(0., 0, 2))
+        self.assertEqual(float(self.x), 3.)
+
+    def test_helpers(self):
+        self.assertEqual(dual_numbers.value(self.x), 3.)
+        self.assertEqual(dual_numbers.value(5), 5)
+        self.assertEqual(dual_numbers.gradient(5, 2), (0., 0.))
@@ -0,0 +1,32 @@
+import math
+import unittest
+from shadowcraft.calcs import fixed_point
+
+class TestFixedPointSolvers(unittest.TestCase):
+    def image(self, guess):
+        # A small, coupled, monotone contraction - much like stats from procs
+        # feeding back into attack counts - with its fixed point at (1.1, .9625).
+        x, y = guess
+        return [.8 * math.sqrt(x + y + 1) - .3, .7 * x + .2 * y]
+
+    def solve(self, name):
+        solver = fixed_point.get_solver(name)
+        guess = [0., 0.]
+        for passes in xrange(1, 100):
+            image = self.image(guess)
+            if max([abs(a - b) for a, b in zip(image, guess)]) < 1e-12:
+                return guess, passes
+            guess = solver.next_guess(guess, image)
+        self.fail('%s did not converge' % name)
+
+    def test_solvers_agree(self):
+        plain_passes = self.solve('plain')[1]
+        for name in ('aitken', 'anderson'):
+            solution, passes = self.solve(name)
+            self.assertAlmostEqual(solution[0], 1.1, places=10)
+            self.assertAlmostEqual(solution[1], .9625, places=10)
+            self.assertTrue(passes < plain_passes)
+
+    def test_get_solver(self):
+        self.assertTrue(isinstance(fixed_point.get_solver('anderson'), fixed_point.AndersonAcceleration))
+        self.assertRaises(fixed_point.InvalidSolverException, fixed_point.get_solver, 'fake_solver')
@@ -1,6 +1,12 @@
+import multiprocessing.pool
+import sys
 import unittest
+from shadowcraft.calcs import telemetry
 from shadowcraft.calcs.rogue.Aldriana import AldrianasRogueDamageCalculator
+from shadowcraft.calcs.rogue.Aldriana import attack_rates
 from shadowcraft.calcs.rogue.Aldriana import settings
+from shadowcraft.core import caching
+from shadowcraft.core import exceptions
 
 from shadowcraft.objects import buffs
 from shadowcraft.objects import race
@@ -10,7 +16,7 @@ from shadowcraft.objects.rogue import rogue_talents
 from shadowcraft.objects.rogue import rogue_glyphs
 
 class TestAldrianasRogueDamageCalculator(unittest.TestCase):
-    def test_get_ep(self):
+    def make_calculator(self, **settings_kwargs):
         test_buffs = buffs.Buffs()
         test_mh = stats.Weapon(939.5, 1.8, 'dagger', 'landslide')
         test_oh = stats.Weapon(730.5, 1.4, 'dagger', 'landslide')
@@ -23,9 +29,12 @@ class TestAldrianasRogueDamageCalculator(unittest.TestCase):
         test_glyphs = rogue_glyphs.RogueGlyphs(*glyph_list)
         test_race = race.Race('night_elf')
         test_cycle = settings.AssassinationCycle()
-        test_settings = settings.Settings(test_cycle, response_time=1)
+        test_settings = settings.Settings(test_cycle, response_time=1, **settings_kwargs)
         test_level = 85
-        calculator = AldrianasRogueDamageCalculator(test_stats, test_talents, test_glyphs, test_buffs, test_race, test_settings, test_level)
+        return AldrianasRogueDamageCalculator(test_stats, test_talents, test_glyphs, test_buffs, test_race, test_settings, test_level)
+
+    def test_get_ep(self):
+        calculator = self.make_calculator()
         ep_values = calculator.get_ep()
         self.assertTrue(ep_values['agi'] < 4.0)
         self.assertTrue(ep_values['agi'] > 2.0)
@@ -33,3 +42,228 @@ class TestAldrianasRogueDamageCalculator(unittest.TestCase):
         self.assertTrue(ep_values['yellow_hit'] > 1.0)
         self.assertTrue(ep_values['crit'] < 2.0)
         self.assertTrue(ep_values['crit'] > 0.0)
+
+    def test_warm_start(self):
+        cold_ep = self.make_calculator().get_ep()
+        calculator = self.make_calculator(warm_start=True)
+        warm_ep = calculator.get_ep()
+        for stat in cold_ep:
+            self.assertAlmostEqual(cold_ep[stat], warm_ep[stat], places=5)
+        self.assertTrue(calculator.warm_starts)
+
+    def test_accelerated_solvers(self):
+        # Accelerated solvers must land on the same fixed point as plain
+        # iteration, not just somewhere the attack counts have settled.
+        plain_dps = self.make_calculator().get_dps()
+        for solver in ('aitken', 'anderson'):
+            dps = self.make_calculator(solver=solver).get_dps()
+            self.assertTrue(abs(dps - plain_dps) <= 1e-9 * plain_dps)
+
+    def test_accelerated_solvers_save_passes(self):
+        # Hurricane and the haste trinkets keep feeding back into the attack
+        # counts, which is where extrapolating pays off.
+        passes = {}
+        for solver in ('plain', 'aitken', 'anderson'):
+            calculator = self.make_calculator(solver=solver)
+            calculator.stats.mh = stats.Weapon(939.5, 1.8, 'dagger', 'hurricane')
+            calculator.stats.oh = stats.Weapon(730.5, 1.4, 'dagger', 'hurricane')
+            calculator.stats.procs = procs.ProcsList('heroic_prestors_talisman_of_machination', 'heroic_starcatcher_compass', 'heroic_the_hungerer', 'arrow_of_time', 'rogue_t11_4pc')
+            calculator.telemetry = telemetry.Telemetry()
+            calculator.get_dps()
+            passes[solver] = calculator.telemetry.iterations()
+        self.assertTrue(passes['aitken'] < passes['plain'])
+        self.assertTrue(passes['anderson'] < passes['plain'])
+
+    def test_telemetry(self):
+        calculator = self.make_calculator()
+        calculator.telemetry = telemetry.Telemetry()
+        calculator.get_dps()
+        report = calculator.telemetry.as_dict()
+        self.assertTrue(report['converged'])
+        self.assertEqual(len(report['solves']), 2)
+        self.assertTrue(report['iterations'] >= 2)
+        for solve in report['solves']:
+            for residual in solve['residuals'].values():
+                self.assertTrue(residual <= calculator.PRECISION_REQUIRED)
+        for stage in ('set_constants', 'attack_counts', 'proc_uptimes', 'get_damage_breakdown'):
+            self.assertTrue(stage in report['timings'])
+
+    def test_warm_start_saves_passes(self):
+        # Warm starting neighbouring gear sets must give the same results in
+        # fewer solver passes.
+        results = []
+        for warm_start in (False, True):
+            calculator = self.make_calculator(warm_start=warm_start)
+            calculator.telemetry = telemetry.Telemetry()
+            dps = []
+            for i in xrange(10):
+                calculator.stats.agi, calculator.stats.crit, calculator.stats.mastery = 4756 + 10 * i, 1022 + 5 * i, 1377 - 5 * i
+                dps.append(calculator.get_dps())
+            results.append((dps, calculator.telemetry.iterations()))
+        (cold_dps, cold_iterations), (warm_dps, warm_iterations) = results
+        for cold, warm in zip(cold_dps, warm_dps):
+            self.assertTrue(abs(cold - warm) <= 1e-9 * cold)
+        self.assertTrue(warm_iterations < cold_iterations)
+
+    def test_get_ep_analytic(self):
+        calculator = self.make_calculator()
+        ep_values = calculator.get_ep()
+        analytic_ep_values = calculator.get_ep(analytic=True)
+        for stat in ep_values:
+            self.assertAlmostEqual(ep_values[stat], analytic_ep_values[stat], places=2)
+        self.assertEqual(calculator.stats.agi, 4756)
+        self.assertFalse(calculator.calculating_ep)
+
+    def test_executor(self):
+        # Anything with a map method will do; this one runs the (pickled)
+        # tasks in process, which is enough to check they round trip.
+        class InProcessExecutor(object):
+            calls = 0
+
+            def map(self, function, iterable):
+                self.calls += 1
+                return map(function, iterable)
+
+        calculator = self.make_calculator()
+        executor = InProcessExecutor()
+        self.assertEqual(calculator.get_ep(), calculator.get_ep(executor=executor))
+        self.assertEqual(calculator.get_glyphs_ranking(), calculator.get_glyphs_ranking(executor=executor))
+        self.assertEqual(calculator.get_talents_ranking(), calculator.get_talents_ranking(executor=executor))
+        other = ['rogue_t12_2pc', 'darkmoon_card_hurricane', 'fake_proc']
+        self.assertEqual(calculator.get_other_ep(other), calculator.get_other_ep(other, executor=executor))
+        self.assertEqual(calculator.get_weapon_ep(dps=True), calculator.get_weapon_ep(dps=True, executor=executor))
+        calls = executor.calls
+        report = calculator.get_report(weapon_ep={'dps': True}, executor=executor)
+        self.assertEqual((report['mh_ep'], report['oh_ep']), calculator.get_weapon_ep(dps=True))
+        # One map for the EP and another for the weapons.
+        self.assertEqual(executor.calls - calls, 2)
+
+    def test_thread_executor(self):
+        # Threads share the combo point distribution cache; a tiny one keeps
+        # them evicting each other's entries, and switching threads every
+        # few bytecodes makes them interleave inside it.
+        expected = self.make_calculator().get_ep()
+        shared_cache = AldrianasRogueDamageCalculator.cp_distribution_cache
+        AldrianasRogueDamageCalculator.cp_distribution_cache = caching.LRUCache(2)
+        check_interval = sys.getcheckinterval()
+        sys.setcheckinterval(1)
+        pool = multiprocessing.pool.ThreadPool(4)
+        try:
+            for i in xrange(5):
+                self.assertEqual(self.make_calculator().get_ep(executor=pool), expected)
+        finally:
+            pool.terminate()
+            sys.setcheckinterval(check_interval)
+            AldrianasRogueDamageCalculator.cp_distribution_cache = shared_cache
+
+    def test_perturbations_leave_inputs_alone(self):
+        calculator = self.make_calculator()
+        original_stats, original_mh = calculator.stats, calculator.stats.mh
+        for perturbation in [('stat', 'agi'), ('weapon_speed', 'mh', 2.6), ('enchant', 'mh', None), ('proc', 'fluid_death')]:
+            calculator.apply_perturbation(perturbation)
+            self.assertFalse(calculator.stats is original_stats)
+            calculator.revert_perturbation(perturbation)
+        self.assertTrue(calculator.stats is original_stats and calculator.stats.mh is original_mh)
+        self.assertEqual((original_stats.agi, original_mh.speed), (4756, 1.8))
+        self.assertTrue(original_mh.landslide and original_stats.procs.fluid_death)
+        self.assertRaises(exceptions.InvalidInputException, calculator.apply_perturbation, ('enchant', 'ranged', 'landslide'))
+        self.assertTrue(calculator.stats is original_stats)
+
+    def test_perturbation_amounts(self):
+        calculator = self.make_calculator()
+        base = calculator.perturbed_dps(('baseline',))
+        for stat in ('agi', 'yellow_hit'):
+            self.assertEqual(calculator.perturbed_dps(('stat', stat, 1)), calculator.perturbed_dps(('stat', stat)))
+            gain = calculator.perturbed_dps(('stat', stat)) - base
+            self.assertAlmostEqual((calculator.perturbed_dps(('stat', stat, 10.)) - base) / gain, 10, places=1)
+        self.assertEqual(calculator.get_dps(), base)
+
+    def test_wire_form(self):
+        calculator = self.make_calculator()
+        calculator.stats.gear_buffs.mixology = True
+        calculator.buffs.agi_flask = True
+        form = calculator.wire_form()
+        rebuilt = AldrianasRogueDamageCalculator.from_wire_form(form)
+        self.assertEqual(rebuilt.wire_form(), form)
+        self.assertEqual(rebuilt.canonical_key(), calculator.canonical_key())
+        self.assertEqual(rebuilt.get_dps(), calculator.get_dps())
+
+    def test_snapshot(self):
+        calculator = self.make_calculator()
+        snapshot = calculator.snapshot()
+        self.assertRaises(AttributeError, setattr, snapshot, 'state', '')
+        perturbations = [('baseline',), ('stat', 'agi'), ('stat', 'yellow_hit'), ('glyph', 'vendetta'), ('enchant', 'oh', 'avalanche')]
+        expected = [calculator.perturbed_dps(perturbation) for perturbation in perturbations]
+        pool = multiprocessing.pool.ThreadPool(4)
+        try:
+            self.assertEqual(snapshot.get_perturbed_dps(perturbations * 4, pool), expected * 4)
+        finally:
+            pool.terminate()
+        self.assertEqual(snapshot.get_dps(), calculator.get_dps())
+        self.assertEqual(snapshot.calculator().get_dps(), calculator.get_dps())
+
+    def test_get_report(self):
+        calculator = self.make_calculator()
+        calculator.telemetry = telemetry.Telemetry()
+        report = calculator.get_report(other_ep=['rogue_t12_2pc'], talents_ranking=True, glyphs_ranking=['vendetta', 'backstab'])
+        report_solves = len(report['telemetry']['solves'])
+        calculator.telemetry.reset()
+        self.assertEqual(report['dps'], calculator.get_dps())
+        self.assertEqual(report['dps_breakdown'], calculator.get_dps_breakdown())
+        self.assertEqual(report['ep'], calculator.get_ep())
+        self.assertEqual(report['other_ep'], calculator.get_other_ep(['rogue_t12_2pc']))
+        self.assertEqual(report['talents_ranking'], calculator.get_talents_ranking())
+        self.assertEqual(report['glyphs_ranking'], calculator.get_glyphs_ranking(['vendetta', 'backstab']))
+        self.assertTrue(report_solves < len(calculator.telemetry.solves))
+        self.assertFalse('mh_ep' in report)
+
+    def test_get_cp_distribution_for_cycle(self):
+        calculator = self.make_calculator()
+        calculator.talents.ruthlessness = 0
+        cp_distribution, time_spent_at_cp = calculator.get_cp_distribution_for_cycle({1: 1.}, 5)
+        self.assertEqual(cp_distribution[(5, 5)], 1.)
+        self.assertEqual(sum(cp_distribution.values()), 1.)
+        for cps, expected in enumerate([0, 1, 1, 1, 1, 2]):
+            self.assertAlmostEqual(time_spent_at_cp[cps], expected / 6.)
+
+        cp_distribution, time_spent_at_cp = calculator.get_cp_distribution_for_cycle({2: .8, 3: .2}, 4)
+        self.assertAlmostEqual(cp_distribution[(4, 2)], .8 * .8)
+        self.assertAlmostEqual(cp_distribution[(5, 2)], .8 * .2 + .2)
+        self.assertAlmostEqual(sum(cp_distribution.values()), 1.)
+
+        # Returned values are copies, so callers can't corrupt the cache.
+        cp_distribution[(5, 2)] = 0
+        self.assertNotEqual(calculator.get_cp_distribution_for_cycle({2: .8, 3: .2}, 4)[0][(5, 2)], 0)
+
+    def test_get_procs_per_second(self):
+        calculator = self.make_calculator()
+        rates = attack_rates.AttackRates()
+        rates['mh_autoattack_hits'] = .5
+        rates['oh_autoattack_hits'] = .6
+        rates['mutilate'] = .25
+        rates['instant_poison'] = .4
+        landslide = calculator.stats.mh.landslide
+        landslide.mh_only = True
+        self.assertAlmostEqual(calculator.get_procs_per_second(landslide, rates, {}), (.5 + .25) * 1.8 / 60)
+        del landslide.mh_only
+        self.assertAlmostEqual(calculator.get_procs_per_second(landslide, rates, {}), (.5 + .25) * 1.8 / 60 + (.6 + .25) * 1.4 / 60)
+        # Compiled triggers don't outlive the get_dps they were made for.
+        calculator.get_dps()
+        self.assertEqual(calculator.proc_triggers, None)
+
+    def test_get_uptimes(self):
+        calculator = self.make_calculator()
+        # An icd proc, a stacking one in the closed form and two that ramp.
+        uptimes = calculator.get_uptimes([.1, .05, 2., .5], [15, 10, 20, 30], [45, 0, 0, 0], [1, 1, 5, 5])
+        self.assertAlmostEqual(uptimes[0], 15 / 55.)
+        P = 1 - .95 ** 10
+        self.assertAlmostEqual(uptimes[1], P * (1 - P) / .95 ** 10)
+        self.assertAlmostEqual(uptimes[2], 5 - 15 * .5 / 300)
+        self.assertAlmostEqual(uptimes[3], 5 - 15 * 2. / 300)
+
+        proc = calculator.stats.procs.fluid_death
+        rates = attack_rates.AttackRates()
+        rates['mh_autoattack_hits'] = .5
+        calculator.set_uptime(proc, rates, {})
+        procs_per_second = calculator.get_procs_per_second(proc, rates, {})
+        self.assertEqual(proc.uptime, calculator.get_uptimes([procs_per_second], [proc.duration], [proc.icd], [proc.max_stacks])[0])
@@ -0,0 +1,60 @@
+import unittest
+from shadowcraft.calcs.rogue.Aldriana.attack_rates import AttackRates
+from shadowcraft.calcs.rogue.Aldriana.attack_rates import TriggerVector
+
+class TestAttackRates(unittest.TestCase):
+    def setUp(self):
+        self.rates = AttackRates()
+        self.rates['mutilate'] = .5
+        self.rates['envenom'] = [0, 0, 0, 0, .1, .2]
+
+    def test_access(self):
+        self.assertEqual(self.rates['mutilate'], .5)
+        self.assertEqual(self.rates['envenom'], (0, 0, 0, 0, .1, .2))
+        self.assertTrue('mutilate' in self.rates)
+        self.assertFalse('backstab' in self.rates)
+        self.assertRaises(KeyError, self.rates.__getitem__, 'backstab')
+        self.assertRaises(ValueError, self.rates.__setitem__, 'eviscerate', [1, 2])
+        self.rates['mutilate'] += .25
+        self.assertEqual(self.rates['mutilate'], .75)
+        del self.rates['mutilate']
+        self.assertFalse('mutilate' in self.rates)
+        self.assertEqual(self.rates.keys(), ['envenom'])
+
+    def test_procs(self):
+        self.assertEqual(self.rates.setdefault('darkmoon_card_hurricane', 0), 0)
+        self.rates['darkmoon_card_hurricane'] += .1
+        self.assertEqual(self.rates['darkmoon_card_hurricane'], .1)
+        self.assertTrue('darkmoon_card_hurricane' in self.rates.keys())
+
+    def test_copy(self):
+        copy = self.rates.copy()
+        copy['mutilate'] = 1
+        self.assertEqual(self.rates['mutilate'], .5)
+
+    def test_distance(self):
+        other = self.rates.copy()
+        self.assertEqual(self.rates.distance(other), 0)
+        other['envenom'] = [0, 0, 0, 0, .1, .25]
+        self.assertAlmostEqual(self.rates.distance(other), .05)
+        # Procs don't count, but attacks missing from the old rates do.
+        other['some_proc'] = 1
+        self.assertAlmostEqual(self.rates.distance(other), .05)
+        self.rates['backstab'] = 0
+        self.assertEqual(self.rates.distance(other), float('inf'))
+
+
+class TestTriggerVector(unittest.TestCase):
+    def test_per_second(self):
+        rates = AttackRates()
+        rates['mutilate'] = .5
+        rates['envenom'] = [0, 0, 0, 0, .1, .2]
+        crit_rates = {'mutilate': .5, 'envenom': .25}
+        triggers = TriggerVector([('mutilate', None, 'mutilate'), ('envenom', 'envenom', 'envenom'), ('backstab', None, 'backstab')])
+        self.assertEqual(len(triggers), 3)
+        self.assertAlmostEqual(triggers.per_second(rates, crit_rates), .5 + .3 * .25)
+        # Conditional triggers only count when their condition has a rate.
+        triggers = TriggerVector([('mutilate', 'mutilate', 'hemorrhage_ticks')])
+        self.assertEqual(triggers.per_second(rates, crit_rates), 0)
+        rates['hemorrhage_ticks'] = 1
+        self.assertEqual(triggers.per_second(rates, crit_rates), .25)
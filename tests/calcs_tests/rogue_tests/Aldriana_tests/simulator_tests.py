@@ -0,0 +1,120 @@
+import multiprocessing.pool
+import unittest
+from shadowcraft.calcs.rogue.Aldriana import InputNotModeledException
+from shadowcraft.calcs.rogue.Aldriana import simulator
+from shadowcraft.objects.rogue import rogue_talents
+
+from calcs_tests.rogue_tests.Aldriana_tests import TestAldrianasRogueDamageCalculator
+
+class TestRogueSimulator(unittest.TestCase):
+    def make_simulator(self, iterations=40, seed=1):
+        calculator = TestAldrianasRogueDamageCalculator('test_get_ep').make_calculator()
+        return simulator.RogueSimulator(calculator.stats, calculator.talents, calculator.glyphs, calculator.buffs,
+            calculator.race, calculator.settings, calculator.level, iterations, seed)
+
+    def test_reproducible(self):
+        breakdown = self.make_simulator().get_dps_breakdown()
+        self.assertEqual(breakdown, self.make_simulator().get_dps_breakdown())
+        self.assertNotEqual(breakdown, self.make_simulator(seed=2).get_dps_breakdown())
+        sim = self.make_simulator()
+        self.assertEqual(breakdown, sim.snapshot().calculator().get_dps_breakdown())
+        self.assertNotEqual(sim.canonical_key(), self.make_simulator(seed=2).canonical_key())
+
+    def test_fights_are_independent(self):
+        sim = self.make_simulator(iterations=12)
+        fights = sim.simulate()
+        self.assertEqual(fights[7:], sim.run_fights(7, 12))
+        sim.FIGHTS_PER_TASK = 5
+        pool = multiprocessing.pool.ThreadPool(2)
+        try:
+            self.assertEqual(fights, sim.simulate(executor=pool))
+        finally:
+            pool.close()
+            pool.join()
+
+    def test_against_model(self):
+        sim = self.make_simulator(iterations=100)
+        model = TestAldrianasRogueDamageCalculator('test_get_ep').make_calculator()
+        dps, error = sim.get_dps_statistics()
+        self.assertAlmostEqual(dps, sim.get_dps(), places=6)
+        self.assertTrue(0 < error < .01 * dps)
+        self.assertTrue(abs(dps - model.get_dps()) < .05 * model.get_dps())
+        breakdown = sim.get_dps_breakdown()
+        for source in ('autoattack', 'mutilate', 'backstab', 'envenom', 'rupture', 'garrote', 'instant_poison', 'deadly_poison', 'venomous_wounds'):
+            self.assertTrue(breakdown[source] > 0)
+
+    def test_breakdown_against_model(self):
+        # How far each source's dps may be from the model's, as a fraction
+        # of it: within 5%, bar the gaps the simulator's module comment
+        # explains.
+        bounds = {
+            'autoattack': (-.05, .05),
+            'mutilate': (0, .08),
+            'backstab': (-.05, .05),
+            'deadly_poison': (-.05, .05),
+            'instant_poison': (-.05, .05),
+            'venomous_wounds': (-.05, .05),
+            'envenom': (-.05, .05),
+            'rupture': (-.05, .05),
+            'garrote': (-.1, .02)
+        }
+        breakdown = self.make_simulator(iterations=100).get_dps_breakdown()
+        model = TestAldrianasRogueDamageCalculator('test_get_ep').make_calculator().get_dps_breakdown()
+        self.assertEqual(sorted(breakdown), sorted(model))
+        for source, (low, high) in bounds.iteritems():
+            gap = breakdown[source] / model[source] - 1
+            self.assertTrue(low < gap < high, '{0} is {1:+.1%} off the model'.format(source, gap))
+
+    def test_simulated_ep(self):
+        sim = self.make_simulator(iterations=10)
+        sim.FIGHTS_PER_TASK = 4
+        ep_stats = ['agi', 'mastery']
+        ep, intervals = sim.get_simulated_ep(ep_stats, tolerance=0, max_iterations=20)
+        self.assertEqual(sorted(ep), ep_stats)
+        for stat in ep_stats:
+            low, high = intervals[stat]
+            self.assertTrue(low < ep[stat] < high)
+            self.assertAlmostEqual(ep[stat] - low, high - ep[stat])
+        self.assertTrue(ep['agi'] > ep['mastery'] > 0)
+        pool = multiprocessing.pool.ThreadPool(2)
+        try:
+            self.assertEqual((ep, intervals), sim.get_simulated_ep(ep_stats, tolerance=0, max_iterations=20, executor=pool))
+        finally:
+            pool.close()
+            pool.join()
+        # The first batch is enough at a loose enough tolerance.
+        loose = sim.get_simulated_ep(ep_stats, tolerance=10, max_iterations=20)
+        first_batch = sim.get_simulated_ep(ep_stats, tolerance=0, max_iterations=10)
+        self.assertEqual(loose, first_batch)
+        self.assertNotEqual(loose, (ep, intervals))
+        self.assertTrue(intervals['agi'][1] - intervals['agi'][0] < first_batch[1]['agi'][1] - first_batch[1]['agi'][0])
+        # And so is it once max_seconds have passed, with batches no bigger
+        # than EP_BATCH_SIZE by default.
+        sim.EP_BATCH_SIZE = 5
+        timed = sim.get_simulated_ep(ep_stats, tolerance=0, max_seconds=0)
+        self.assertEqual(timed, sim.get_simulated_ep(ep_stats, tolerance=0, max_iterations=5, max_seconds=None))
+
+    def test_paired_fights(self):
+        # Every kind of random decision has its own stream, so fights stay
+        # paired when a stat changes their timing, and twenty of them are
+        # enough to pin down EP values that do.
+        sim = self.make_simulator(iterations=20)
+        ep, intervals = sim.get_simulated_ep(['agi', 'crit'], tolerance=0, max_iterations=20)
+        for stat in ep:
+            low, high = intervals[stat]
+            self.assertTrue(high - low < .8)
+
+    def test_normal_quantile(self):
+        self.assertAlmostEqual(simulator.normal_quantile(.975), 1.96, places=3)
+        self.assertAlmostEqual(simulator.normal_quantile(.5), 0, places=3)
+        self.assertAlmostEqual(simulator.normal_quantile(.05), -1.645, places=3)
+
+    def test_not_modeled(self):
+        sim = self.make_simulator()
+        self.assertRaises(InputNotModeledException, sim.get_dps_gradient, ['agi'])
+        self.assertRaises(InputNotModeledException, sim.simulate, 0)
+        self.assertRaises(InputNotModeledException, sim.get_ep, ['agi'], analytic=True)
+        self.assertRaises(InputNotModeledException, sim.get_simulated_ep, ['agi'], batch_size=1)
+        self.assertRaises(InputNotModeledException, sim.get_simulated_ep, ['agi'], confidence=1)
+        sim.talents = rogue_talents.RogueTalents('0000000000000000000', '0020000000000000000', '2030030000000000000')
+        self.assertRaises(InputNotModeledException, sim.get_dps)
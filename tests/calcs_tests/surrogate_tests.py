@@ -0,0 +1,62 @@
+import random
+import unittest
+from shadowcraft.calcs import surrogate
+
+from calcs_tests.rogue_tests.Aldriana_tests import TestAldrianasRogueDamageCalculator
+
+class TestSurrogate(unittest.TestCase):
+    def setUp(self):
+        self.calculator = TestAldrianasRogueDamageCalculator('test_get_ep').make_calculator()
+        self.surrogate = surrogate.Surrogate(self.calculator)
+
+    def exact_dps(self, values):
+        columns = sorted(values)
+        return surrogate.get_dps(self.calculator, [[values[stat] for stat in columns]], columns)[0]
+
+    def test_rating_caps(self):
+        caps = self.calculator.get_rating_caps()
+        self.assertEqual(len(caps['hit']), 3)
+        one_hand_cap, spell_cap, dual_wield_cap = caps['hit']
+        for hit, expected in ((one_hand_cap - 1, False), (one_hand_cap, True)):
+            self.calculator.stats.hit = hit
+            self.assertEqual(self.calculator.melee_hit_chance(self.calculator.BASE_ONE_HAND_MISS_RATE, False, False, 'dagger') >= 1 - 1e-9, expected)
+        for hit, expected in ((spell_cap - 1, False), (spell_cap, True)):
+            self.calculator.stats.hit = hit
+            self.assertEqual(self.calculator.spell_hit_chance() >= 1 - 1e-9, expected)
+        for hit, expected in ((dual_wield_cap - 1, False), (dual_wield_cap, True)):
+            self.calculator.stats.hit = hit
+            self.assertEqual(self.calculator.melee_hit_chance(self.calculator.BASE_DW_MISS_RATE, False, False, 'dagger') >= 1 - 1e-9, expected)
+        self.assertTrue(caps['exp'])
+
+    def test_dps(self):
+        self.assertTrue(abs(self.surrogate.get_dps() - self.calculator.get_dps()) <= self.surrogate.error_bound)
+        self.assertTrue(0 < self.surrogate.error_bound < .002 * self.calculator.get_dps())
+        rng = random.Random(1)
+        stats = self.calculator.stats
+        for i in xrange(10):
+            values = {'agi': stats.agi + rng.uniform(-300, 300), 'hit': stats.hit + rng.uniform(-300, 300), 'mastery': stats.mastery + rng.uniform(-300, 300)}
+            low, high = self.surrogate.get_dps_interval(values)
+            self.assertTrue(low <= self.exact_dps(values) <= high)
+        self.assertEqual(self.surrogate.fits, 1)
+
+    def test_ep(self):
+        exact = self.calculator.get_ep(['agi', 'crit', 'haste', 'mastery'], analytic=True)
+        ep = self.surrogate.get_ep()
+        self.assertTrue(self.surrogate.ep_error < .02)
+        for stat in exact:
+            self.assertTrue(abs(ep[stat] - exact[stat]) <= self.surrogate.ep_error)
+        self.assertEqual(ep['ap'], 1)
+
+    def test_refit(self):
+        far = {'agi': self.calculator.stats.agi + 1000}
+        dps = self.surrogate.get_dps(far)
+        self.assertEqual(self.surrogate.fits, 2)
+        self.assertTrue(abs(dps - self.exact_dps(far)) <= self.surrogate.error_bound)
+        self.surrogate.get_dps()
+        self.surrogate.get_dps(far)
+        self.assertEqual(self.surrogate.fits, 2)
+        self.assertRaises(surrogate.SurrogateException, self.surrogate.get_dps, {'spirit': 100})
+        self.assertRaises(surrogate.SurrogateException, self.surrogate.get_ep, None, 'str')
+        self.assertRaises(surrogate.SurrogateException, surrogate.Surrogate, self.calculator, radius=0)
+        self.assertRaises(surrogate.SurrogateException, surrogate.Surrogate, self.calculator, columns=('agi', 'armor'))
+        self.assertFalse(self.calculator.settings.warm_start)
@@ -0,0 +1,75 @@
+import json
+import os
+import shutil
+import StringIO
+import tempfile
+import unittest
+from shadowcraft.core import batch
+from shadowcraft.core import caching
+from shadowcraft.core import jsoninput
+from core_tests.jsoninput_tests import character
+
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        combat = json.loads(json.dumps(character))
+        combat['id'] = 'combat'
+        combat['talents'] = ['0230000000000000000', '0332230310032012321', '0030000000000000000']
+        combat['settings'] = {'type': 'combat'}
+        combat['stats']['mh']['type'] = 'sword'
+        self.lines = [json.dumps(character), '', '{"race": "night_elf"', json.dumps(combat), json.dumps(character)]
+
+    def run_batch(self, writer_class, **kwargs):
+        output = StringIO.StringIO()
+        batch.run(self.lines, writer_class(output), **kwargs)
+        return output.getvalue().splitlines()
+
+    def test_jsonl(self):
+        results = [json.loads(line) for line in self.run_batch(batch.JSONLinesWriter)]
+        self.assertEqual([result['line'] for result in results], [1, 3, 4, 5])
+        self.assertTrue('error' in results[1])
+        self.assertEqual(results[2]['id'], 'combat')
+        self.assertAlmostEqual(results[0]['dps'], jsoninput.from_json(self.lines[0]).get_dps())
+        self.assertEqual(results[0], dict(results[3], line=1))
+        self.assertEqual([json.loads(line) for line in self.run_batch(batch.JSONLinesWriter, workers=2, max_pending=1)], results)
+
+    def test_unexpected_errors(self):
+        broken = json.loads(self.lines[0])
+        broken['settings']['duration'] = 0
+        self.lines.insert(1, json.dumps(broken))
+        results = [json.loads(line) for line in self.run_batch(batch.JSONLinesWriter)]
+        self.assertEqual([result['line'] for result in results], [1, 2, 4, 5, 6])
+        self.assertTrue('error' in results[1] and 'dps' not in results[1])
+        self.assertEqual(results[0], dict(results[4], line=1))
+
+    def test_csv(self):
+        rows = self.run_batch(batch.CSVWriter)
+        self.assertEqual(len(rows), 5)
+        self.assertTrue(rows[0].startswith('line,id,dps,ep_'))
+        self.assertTrue(rows[3].startswith('4,combat,'))
+
+    def test_store(self):
+        directory = tempfile.mkdtemp()
+        try:
+            store = caching.SQLiteStore(os.path.join(directory, 'results.db'), 'test')
+            self.run_batch(batch.JSONLinesWriter, store=store)
+            store.flush()
+            key = jsoninput.from_json(self.lines[0]).canonical_key()
+            self.assertEqual(store.get(key)['dps'], jsoninput.from_json(self.lines[0]).get_dps())
+            store.close()
+        finally:
+            shutil.rmtree(directory)
+
+    def test_store_in_workers(self):
+        # Workers must look results up at the store's model version, not the
+        # current one.
+        directory = tempfile.mkdtemp()
+        try:
+            store = caching.SQLiteStore(os.path.join(directory, 'results.db'), 'test')
+            key = jsoninput.from_json(self.lines[0]).canonical_key()
+            store.put(key, {'dps': 1., 'dps_breakdown': {}, 'ep': {}})
+            store.flush()
+            results = [json.loads(line) for line in self.run_batch(batch.JSONLinesWriter, workers=2, store=store)]
+            self.assertEqual([result['dps'] for result in results if result['line'] in (1, 5)], [1., 1.])
+            store.close()
+        finally:
+            shutil.rmtree(directory)
@@ -0,0 +1,160 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from shadowcraft.core.caching import Coalescer
+from shadowcraft.core.caching import LRUCache
+from shadowcraft.core.caching import ResultCache
+from shadowcraft.core.caching import ShelveStore
+from shadowcraft.core.caching import SQLiteStore
+from shadowcraft.core.caching import request_key
+
+class TestLRUCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = LRUCache(2)
+        self.cache.put('a', 1)
+        self.cache.put('b', 2)
+
+    def test_get(self):
+        self.assertEqual(self.cache.get('a'), 1)
+        self.assertEqual(self.cache.get('c'), None)
+        self.assertEqual(self.cache.get('c', 3), 3)
+        self.assertEqual(self.cache.hits, 1)
+        self.assertEqual(self.cache.misses, 2)
+
+    def test_eviction(self):
+        self.cache.get('a')
+        self.cache.put('c', 3)
+        self.assertTrue('a' in self.cache)
+        self.assertFalse('b' in self.cache)
+        self.assertEqual(len(self.cache), 2)
+        self.cache.put('a', 4)
+        self.cache.put('d', 5)
+        self.assertEqual(self.cache.get('a'), 4)
+        self.assertFalse('c' in self.cache)
+
+    def test_ttl(self):
+        now = [0]
+        cache = LRUCache(2, ttl=10, clock=lambda: now[0])
+        cache.put('a', 1)
+        now[0] = 9
+        self.assertEqual(cache.get('a'), 1)
+        now[0] = 10
+        self.assertEqual(cache.get('a'), None)
+        self.assertFalse('a' in cache)
+
+    def test_threads(self):
+        # Many threads hammering a small cache with more keys than it holds.
+        cache = LRUCache(8)
+        errors = []
+        def worker(offset):
+            try:
+                for i in xrange(2000):
+                    key = (i * 7 + offset) % 20
+                    if cache.get(key) is None:
+                        cache.put(key, key)
+            except Exception as e:
+                errors.append(e)
+        threads = [threading.Thread(target=worker, args=(offset,)) for offset in xrange(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(len(cache), 8)
+        self.assertEqual(cache.hits + cache.misses, 16000)
+
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'results')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_store(self):
+        store = ShelveStore(self.path)
+        cache = ResultCache(maxsize=1, store=store)
+        cache.put('a', {'dps': 1})
+        cache.put('b', {'dps': 2})
+        self.assertEqual(cache.memory.get('a'), None)
+        self.assertEqual(cache.get('a'), {'dps': 1})
+        store.close()
+        # The store outlives the cache in front of it.
+        store = ShelveStore(self.path)
+        self.assertEqual(ResultCache(store=store).get('b'), {'dps': 2})
+        store.close()
+
+    def test_sqlite_store(self):
+        store = SQLiteStore(self.path, 'v1', batch_size=2)
+        store.put('a', {'dps': 1.5})
+        self.assertEqual(store.get('a'), {'dps': 1.5})
+        self.assertEqual(store.get('b'), None)
+        store.close()
+        store = SQLiteStore(self.path, 'v1')
+        self.assertEqual(store.get('a'), {'dps': 1.5})
+        store.close()
+        # Results from another model version don't count.
+        store = SQLiteStore(self.path, 'v2')
+        self.assertEqual(store.get('a'), None)
+        store.put('a', {'dps': 2})
+        store.prune()
+        store.close()
+        store = SQLiteStore(self.path, 'v1')
+        self.assertEqual(store.get('a'), None)
+        store.close()
+
+    def test_request_key(self):
+        self.assertEqual(request_key({'a': 1, 'b': [1, 2]}), request_key({'b': [1, 2], 'a': 1}))
+        self.assertNotEqual(request_key({'a': 1, 'b': [1, 2]}), request_key({'a': 1, 'b': [2, 1]}))
+
+
+class TestCoalescer(unittest.TestCase):
+    def setUp(self):
+        self.coalescer = Coalescer()
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.calls = []
+
+    def compute(self, value):
+        self.calls.append(value)
+        self.started.set()
+        self.release.wait()
+        if isinstance(value, Exception):
+            raise value
+        return value
+
+    def run_concurrently(self, value):
+        results = []
+        def run():
+            try:
+                results.append(self.coalescer.run('key', self.compute, value))
+            except Exception as e:
+                results.append(e)
+        leader = threading.Thread(target=run)
+        leader.start()
+        self.started.wait()
+        followers = [threading.Thread(target=run) for i in range(3)]
+        for follower in followers:
+            follower.start()
+        while self.coalescer.coalesced < 3:
+            time.sleep(.001)
+        self.release.set()
+        for thread in [leader] + followers:
+            thread.join()
+        return results
+
+    def test_run(self):
+        self.assertEqual(self.run_concurrently(42), [42] * 4)
+        self.assertEqual(self.calls, [42])
+        self.assertEqual(self.coalescer.in_flight, {})
+        self.assertEqual(self.coalescer.run('key', self.compute, 1), 1)
+        self.assertEqual(self.calls, [42, 1])
+
+    def test_error(self):
+        error = ValueError('bad')
+        self.assertEqual(self.run_concurrently(error), [error] * 4)
+        self.assertEqual(len(self.calls), 1)
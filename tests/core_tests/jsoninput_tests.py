@@ -0,0 +1,72 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from shadowcraft.core import caching
+from shadowcraft.core import jsoninput
+
+character = {
+    'level': 85,
+    'race': 'night_elf',
+    'stats': {
+        'str': 20, 'agi': 4756, 'ap': 190, 'crit': 1022, 'hit': 1329, 'exp': 159, 'haste': 1291, 'mastery': 1713,
+        'gear_buffs': ['rogue_t11_2pc', 'leather_specialization', 'chaotic_metagem'],
+        'procs': ['fluid_death'],
+        'mh': {'type': 'dagger', 'speed': 1.8, 'damage': 939.5, 'enchant': 'landslide'},
+        'oh': {'type': 'dagger', 'speed': 1.4, 'damage': 730.5, 'enchant': 'landslide'},
+        'ranged': {'type': 'thrown', 'speed': 2.2, 'damage': 1371.5}
+    },
+    'buffs': ['stat_multiplier_buff', 'crit_chance_buff', 'all_damage_buff'],
+    'settings': {'type': 'assassination', 'response_time': 1},
+    'talents': ['0333230113022110321', '0020000000000000000', '2030030000000000000'],
+    'glyphs': ['backstab', 'mutilate', 'rupture']
+}
+
+class TestGetResults(unittest.TestCase):
+    def test_get_results(self):
+        cache = caching.ResultCache()
+        results = jsoninput.get_results(json.dumps(character), cache=cache)
+        self.assertAlmostEqual(results['dps'], sum(results['dps_breakdown'].values()))
+        self.assertEqual(results['dps'], jsoninput.from_json(json.dumps(character)).get_dps())
+
+        # The same character, written out differently, is a cache hit.
+        results['ep']['agi'] = 0
+        cached_results = jsoninput.get_results(json.dumps(character, indent=4), cache=cache)
+        self.assertEqual(cache.memory.hits, 1)
+        self.assertEqual(cached_results['dps'], results['dps'])
+        self.assertNotEqual(cached_results['ep']['agi'], 0)
+
+    def test_canonical_key(self):
+        key = jsoninput.from_json(json.dumps(character)).canonical_key()
+        equivalent = json.loads(json.dumps(character))
+        equivalent['buffs'].reverse()
+        equivalent['glyphs'].append('backstab')
+        equivalent['stats']['gear_buffs'].reverse()
+        equivalent['settings']['time_in_execute_range'] = .35
+        self.assertEqual(jsoninput.from_json(json.dumps(equivalent)).canonical_key(), key)
+        different = json.loads(json.dumps(character))
+        different['glyphs'].remove('backstab')
+        self.assertNotEqual(jsoninput.from_json(json.dumps(different)).canonical_key(), key)
+
+        cache = caching.ResultCache()
+        jsoninput.get_results(json.dumps(character), cache=cache)
+        jsoninput.get_results(json.dumps(equivalent), cache=cache)
+        self.assertEqual(cache.memory.hits, 1)
+
+    def test_persistent_cache(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'results.db')
+            cache = jsoninput.persistent_cache(path)
+            results = jsoninput.get_results(json.dumps(character), cache=cache)
+            cache.store.close()
+            cache = jsoninput.persistent_cache(path)
+            self.assertEqual(cache.store.get(jsoninput.from_json(json.dumps(character)).canonical_key()), results)
+            self.assertEqual(jsoninput.get_results(json.dumps(character), cache=cache), results)
+            cache.store.close()
+        finally:
+            shutil.rmtree(directory)
+
+    def test_invalid_input(self):
+        self.assertRaises(jsoninput.InvalidJSONException, jsoninput.get_results, json.dumps({'race': 'night_elf', 'level': 85}), cache=None)
@@ -0,0 +1,77 @@
+import json
+import threading
+import time
+import unittest
+import urllib2
+from shadowcraft.core import jsoninput
+from shadowcraft.core import service
+from core_tests.jsoninput_tests import character
+
+class TestService(unittest.TestCase):
+    def setUp(self):
+        self.body = json.dumps(character)
+        self.servers = []
+
+    def tearDown(self):
+        for server in self.servers:
+            server.shutdown()
+            server.server_close()
+
+    def start_server(self, **kwargs):
+        server = service.CalculationServer(('127.0.0.1', 0), workers=1, quiet=True, **kwargs)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.servers.append(server)
+        return server
+
+    def request(self, server, path, body=None):
+        url = 'http://127.0.0.1:{port}{path}'.format(port=server.server_address[1], path=path)
+        try:
+            response = urllib2.urlopen(url, body)
+        except urllib2.HTTPError as e:
+            response = e
+        return response.getcode(), json.loads(response.read())
+
+    def test_endpoints(self):
+        server = self.start_server()
+        self.assertEqual(self.request(server, '/health')[0], 200)
+        status, result = self.request(server, '/dps', self.body)
+        self.assertEqual(status, 200)
+        self.assertAlmostEqual(result['dps'], jsoninput.from_json(self.body).get_dps())
+        status, result = self.request(server, '/ep?stats=agi,haste', self.body)
+        self.assertEqual(sorted(result['ep'].keys()), ['agi', 'haste'])
+        status, result = self.request(server, '/weapon_ep?speeds=1.4,1.8', self.body)
+        self.assertEqual(status, 200)
+        self.assertTrue('mh_ep' in result and 'oh_ep' in result)
+
+    def test_errors(self):
+        server = self.start_server()
+        self.assertEqual(self.request(server, '/nothing', self.body)[0], 404)
+        self.assertEqual(self.request(server, '/dps', '{"race": "night_elf"')[0], 400)
+        self.assertEqual(self.request(server, '/dps', '{"race": "night_elf"}')[0], 400)
+        full_server = self.start_server(max_pending=1)
+        full_server.pending.acquire()
+        self.assertEqual(self.request(full_server, '/dps', self.body)[0], 503)
+        self.assertEqual(self.request(self.start_server(max_pending=0), '/dps', self.body)[0], 200)
+        self.assertEqual(self.request(self.start_server(request_timeout=0), '/talents_ranking', self.body)[0], 504)
+
+    def test_unexpected_errors(self):
+        server = self.start_server()
+        status, result = self.request(server, '/glyphs_ranking?glyphs=no_such_glyph', self.body)
+        self.assertEqual(status, 500)
+        self.assertTrue('no_such_glyph' in result['error'])
+        self.assertEqual(self.request(server, '/dps', self.body)[0], 200)
+
+    def test_abandoned_jobs_stay_pending(self):
+        # A job we stopped waiting for keeps its slot until it's done.
+        server = self.start_server(max_pending=1, request_timeout=0)
+        self.assertEqual(self.request(server, '/talents_ranking', self.body)[0], 504)
+        server.request_timeout = 30
+        self.assertEqual(self.request(server, '/dps', self.body)[0], 503)
+        deadline = time.time() + 30
+        status = 503
+        while status == 503 and time.time() < deadline:
+            time.sleep(.05)
+            status = self.request(server, '/dps', self.body)[0]
+        self.assertEqual(status, 200)
@@ -0,0 +1,37 @@
+import unittest
+from shadowcraft.objects import buffs
+from shadowcraft.objects.rogue import rogue_glyphs
+
+class TestFlagSet(unittest.TestCase):
+    def setUp(self):
+        self.glyphs = rogue_glyphs.RogueGlyphs('backstab', 'mutilate')
+
+    def test_mask(self):
+        self.assertEqual(self.glyphs.mask, self.glyphs.flag_bits['backstab'] | self.glyphs.flag_bits['mutilate'])
+        self.glyphs.backstab = False
+        self.assertFalse(self.glyphs.backstab)
+        self.assertEqual(self.glyphs.mask, self.glyphs.flag_bits['mutilate'])
+        self.glyphs.vendetta = True
+        self.assertTrue(self.glyphs.vendetta)
+
+    def test_equality(self):
+        other = rogue_glyphs.RogueGlyphs('mutilate', 'backstab')
+        self.assertEqual(self.glyphs, other)
+        self.assertEqual(hash(self.glyphs), hash(other))
+        other.rupture = True
+        self.assertNotEqual(self.glyphs, other)
+        self.assertEqual(len(set([self.glyphs, rogue_glyphs.RogueGlyphs('backstab', 'mutilate')])), 1)
+
+    def test_cached_per_state(self):
+        test_buffs = buffs.Buffs('all_damage_buff')
+        self.assertEqual(test_buffs.physical_damage_multiplier(), 1.03)
+        test_buffs.physical_vulnerability_debuff = True
+        self.assertEqual(test_buffs.physical_damage_multiplier(), 1.04 * 1.03)
+        test_buffs.physical_vulnerability_debuff = False
+        self.assertEqual(test_buffs.physical_damage_multiplier(), 1.03)
+        # The level is part of the state too.
+        test_buffs.str_and_agi_buff = True
+        self.assertEqual(test_buffs.buff_str(), 549)
+        test_buffs.level = 80
+        self.assertEqual(test_buffs.buff_str(), 155)
+        self.assertNotEqual(test_buffs, buffs.Buffs('all_damage_buff', 'str_and_agi_buff'))
@@ -25,6 +25,23 @@ class TestProcsList(unittest.TestCase):
         self.procsList = procs.ProcsList()
         self.assertEqual(len(self.procsList.get_all_damage_procs()), 0)
 
+    def test_equipped_proc_names(self):
+        self.assertEqual(set(self.procsList.equipped_proc_names), set(['darkmoon_card_hurricane', 'heroic_left_eye_of_rajh']))
+        self.procsList.set_proc('fluid_death')
+        self.assertTrue('fluid_death' in self.procsList.equipped_proc_names)
+        del self.procsList.fluid_death
+        self.assertFalse('fluid_death' in self.procsList.equipped_proc_names)
+        self.procsList.darkmoon_card_hurricane = False
+        self.assertEqual(self.procsList.equipped_proc_names, ('heroic_left_eye_of_rajh',))
+        # The order procs were equipped in doesn't matter.
+        reversed_list = procs.ProcsList('heroic_left_eye_of_rajh', 'darkmoon_card_hurricane')
+        self.assertEqual(reversed_list.equipped_proc_names, procs.ProcsList('darkmoon_card_hurricane', 'heroic_left_eye_of_rajh').equipped_proc_names)
+
+    def test_wire_form(self):
+        rebuilt = procs.ProcsList.from_wire_form(self.procsList.wire_form())
+        self.assertEqual(rebuilt.equipped_proc_names, self.procsList.equipped_proc_names)
+        self.assertEqual(procs.ProcsList().wire_form(), 0)
+
 
 class TestProc(unittest.TestCase):
     def setUp(self):
@@ -53,3 +53,37 @@ class TestRogueTalents(unittest.TestCase):
 
     def test_is_subtlety_rogue(self):
         self.assertFalse(self.talents.is_subtlety_rogue())
+
+    def test_set_talent(self):
+        self.talents.set_talent('vendetta', 0)
+        self.assertEqual(self.talents.vendetta, 0)
+        self.assertEqual(self.talents.treeForTalent['vendetta'].vendetta, 0)
+        self.talents.precision = 3
+        self.assertEqual(self.talents.treeForTalent['precision'].precision, 3)
+        self.assertRaises(talents.InvalidTalentException, self.talents.set_talent, 'precision', 4)
+        self.assertRaises(talents.InvalidTalentException, self.talents.set_talent, 'fake_talent', 1)
+
+    def test_read_only_trees(self):
+        # Only the class talents may change a tree they've compiled, or
+        # they'd be left with stale values.
+        tree = self.talents.treeForTalent['vendetta']
+        self.assertRaises(talents.InvalidTalentException, tree.set_talent, 'vendetta', 0)
+        self.assertRaises(talents.InvalidTalentException, setattr, tree, 'vendetta', 0)
+        self.assertEqual((tree.vendetta, self.talents.vendetta), (1, 1))
+        new_talents = self.talents.with_talent('vendetta', 0)
+        self.assertRaises(talents.InvalidTalentException, new_talents.treeForTalent['vendetta'].set_talent, 'vendetta', 1)
+        self.assertEqual(tree.vendetta, 1)
+
+    def test_wire_form(self):
+        new_talents = self.talents.with_talent('killing_spree', 1)
+        self.assertEqual(new_talents.trees[1].talent_string()[-1], '1')
+        rebuilt = rogue_talents.RogueTalents.from_wire_form(new_talents.wire_form())
+        self.assertEqual(rebuilt.canonical_form(), new_talents.canonical_form())
+        self.assertTrue(rebuilt.is_assassination_rogue())
+
+    def test_with_talent(self):
+        new_talents = self.talents.with_talent('killing_spree', 1)
+        self.assertEqual(new_talents.killing_spree, 1)
+        self.assertEqual(self.talents.killing_spree, 0)
+        self.assertEqual(self.talents.treeForTalent['killing_spree'].killing_spree, 0)
+        self.assertTrue(new_talents.is_assassination_rogue())
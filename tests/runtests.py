@@ -6,11 +6,21 @@ sys.path.append(path.abspath(path.join(path.dirname(__file__), '..')))
 
 from calcs_tests import TestDamageCalculator
 from calcs_tests.armor_mitigation_tests import TestArmorMitigation
+from calcs_tests.dual_numbers_tests import TestDual
+from calcs_tests.fixed_point_tests import TestFixedPointSolvers
 from calcs_tests.rogue_tests import TestRogueDamageCalculator
 from calcs_tests.rogue_tests import TestRogueDamageCalculatorLevels
 from calcs_tests.rogue_tests.Aldriana_tests import TestAldrianasRogueDamageCalculator
+from calcs_tests.rogue_tests.Aldriana_tests.attack_rates_tests import TestAttackRates, TestTriggerVector
+from calcs_tests.rogue_tests.Aldriana_tests.simulator_tests import TestRogueSimulator
+from calcs_tests.surrogate_tests import TestSurrogate
+from core_tests.batch_tests import TestBatch
+from core_tests.caching_tests import TestCoalescer, TestLRUCache, TestResultCache
 from core_tests.exceptions_tests import TestInvalidInputException
+from core_tests.jsoninput_tests import TestGetResults
+from core_tests.service_tests import TestService
 from objects_tests.buffs_tests import TestBuffsTrue, TestBuffsFalse, TestBuffsLevel
+from objects_tests.flags_tests import TestFlagSet
 from objects_tests.stats_tests import TestStats, TestWeapon, TestGearBuffs
 from objects_tests.procs_tests import TestProcsList, TestProc
 from objects_tests.race_tests import TestRace